@@ -1,20 +1,56 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from notifier import AlertNotifier
+from notifier import AlertNotifier, UnsupportedStoreError
+from alert_consumer import AlertTopicConsumer
+from writer import AlertQueueFull
+import atexit
 import logging
+import os
+import sys
+import threading
+import time
+
+# Shared top-level packages (profiling)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from profiling import register_profiling
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)
 
+# Opt-in /admin/profile (PROFILING_ENABLED)
+register_profiling(app)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Initialize alert notifier
-notifier = AlertNotifier()
+notifier = AlertNotifier(log_file=os.getenv('ALERT_LOG_FILE', 'fraud_alerts.json'))
+MAX_BATCH_SIZE = int(os.getenv('ALERT_BATCH_MAX', 10000))
+atexit.register(notifier.close)
 logger.info("✓ Alert Service initialized")
 
+# Optionally compact closed log segments in the background
+compact_interval = float(os.getenv('ALERT_COMPACT_INTERVAL', 0))
+if compact_interval > 0 and notifier.store_type == 'log':
+    def compact_periodically():
+        while True:
+            time.sleep(compact_interval)
+            try:
+                report = notifier.compact(min_age=compact_interval)
+                if report['segments']:
+                    logger.info(f"Compacted {report['segments']} alert segments ({report['alerts']} alerts)")
+            except Exception as e:
+                logger.error(f"Alert compaction error: {e}")
+    
+    threading.Thread(target=compact_periodically, daemon=True, name='alert-compaction').start()
+
+# Optionally ingest the alerts topic written by the Spark job
+if os.getenv('ALERT_TOPIC_INGEST', 'false').lower() in ('1', 'true', 'yes'):
+    topic_consumer = AlertTopicConsumer(notifier)
+    topic_consumer.start()
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """
@@ -22,7 +58,8 @@ def health_check():
     """
     return jsonify({
         'status': 'healthy',
-        'service': 'alert-service'
+        'service': 'alert-service',
+        'alert_queue': notifier.queue_stats()
     }), 200
 
 @app.route('/alert', methods=['POST'])
@@ -42,6 +79,21 @@ def create_alert():
         # Send alert
         alert = notifier.send_alert(transaction, prediction)
         
+        # Replayed transaction: the stored alert stands
+        if alert.get('duplicate'):
+            return jsonify({
+                'status': 'alert_duplicate',
+                'alert': alert
+            }), 200
+        
+        # Folded into an open incident: no separate notification
+        if 'coalesced_into' in alert:
+            return jsonify({
+                'status': 'alert_coalesced',
+                'incident_id': alert['coalesced_into'],
+                'alert': alert
+            }), 200
+        
         logger.warning(
             f"🚨 FRAUD ALERT: {alert['alert_id']} | "
             f"Transaction: {transaction['transaction_id']} | "
@@ -55,10 +107,107 @@ def create_alert():
             'alert': alert
         }), 200
     
+    except AlertQueueFull as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         logger.error(f"Alert creation error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def validate_alert_item(item):
+    """
+    Error message for a malformed {transaction, prediction} item, else None
+    """
+    if not isinstance(item, dict):
+        return 'item must be an object'
+    transaction = item.get('transaction')
+    prediction = item.get('prediction')
+    if not isinstance(transaction, dict) or not isinstance(prediction, dict):
+        return 'transaction and prediction are required'
+    for field in ('transaction_id', 'amount'):
+        if field not in transaction:
+            return f'transaction.{field} is required'
+    for field in ('fraud_probability', 'risk_level'):
+        if field not in prediction:
+            return f'prediction.{field} is required'
+    return None
+
+@app.route('/alerts/batch', methods=['POST'])
+def create_alerts_batch():
+    """
+    Create many fraud alerts in one request
+    
+    Body: {"alerts": [{"transaction": {...}, "prediction": {...}}, ...]}
+    
+    Valid items are stored with a single group commit; transaction_ids that
+    already have an alert (or repeat within the batch) are reported as
+    duplicate. Each item gets a status: created, duplicate or invalid.
+    """
+    try:
+        data = request.get_json(silent=True)
+        items = data.get('alerts') if isinstance(data, dict) else None
+        
+        if not isinstance(items, list):
+            return jsonify({'error': 'Expected {"alerts": [...]}'}), 400
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Batch exceeds {MAX_BATCH_SIZE} alerts'}), 413
+        
+        results = [None] * len(items)
+        valid_indexes = []
+        for i, item in enumerate(items):
+            error = validate_alert_item(item)
+            if error:
+                results[i] = {'index': i, 'status': 'invalid', 'error': error}
+            else:
+                valid_indexes.append(i)
+        
+        alerts = notifier.send_alerts([items[i] for i in valid_indexes])
+        
+        for i, alert in zip(valid_indexes, alerts):
+            transaction_id = items[i]['transaction']['transaction_id']
+            if alert is None:
+                results[i] = {'index': i, 'transaction_id': transaction_id, 'status': 'duplicate'}
+            else:
+                results[i] = {'index': i, 'transaction_id': transaction_id, 'status': 'created',
+                              'alert_id': alert['alert_id']}
+        
+        counts = {status: sum(1 for r in results if r['status'] == status)
+                  for status in ('created', 'duplicate', 'invalid')}
+        if counts['created']:
+            logger.warning(f"🚨 {counts['created']} FRAUD ALERTS created in batch "
+                           f"({counts['duplicate']} duplicate, {counts['invalid']} invalid)")
+        
+        return jsonify(dict(counts, results=results)), 200
+    
+    except AlertQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Batch alert error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/alerts/stream', methods=['GET'])
+def stream_alerts():
+    """
+    Server-Sent Events stream of new alerts and summary updates
+    
+    Starts with a 'snapshot' event (recent alerts and summary), then sends
+    an 'alerts' event per stored batch. Reconnecting clients resume from
+    the Last-Event-ID header (or ?last_event_id=).
+    """
+    if notifier.broadcaster.clients >= notifier.broadcaster.max_clients:
+        return jsonify({'error': 'Too many stream clients'}), 503
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    limit = request.args.get('limit', 10, type=int)
+    events = notifier.broadcaster.stream(
+        last_event_id=last_event_id,
+        snapshot=lambda: notifier.stream_snapshot(limit=limit)
+    )
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/alerts/recent', methods=['GET'])
 def get_recent_alerts():
     """
@@ -75,17 +224,75 @@ def get_recent_alerts():
 def get_alert_summary():
     """
     Get alert summary
+    
+    ?hours=N adds per-hour alert counts for the last N hours,
+    ?days=N per-day counts for the last N days
     """
     try:
         summary = notifier.get_alert_summary()
+        hours = request.args.get('hours', type=int)
+        if hours:
+            summary['hourly'] = notifier.get_hourly_counts(hours=hours)
+        days = request.args.get('days', type=int)
+        if days:
+            summary['daily'] = notifier.get_daily_counts(days=days)
         return jsonify(summary), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/alerts/history', methods=['GET'])
+def get_alert_history():
+    """
+    Alerts in a time range, including compacted archives
+    
+    Query params: since, until (ISO timestamps), user_id, merchant_id,
+    risk_level, limit
+    """
+    try:
+        alerts = notifier.get_history(
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            user_id=request.args.get('user_id'),
+            merchant_id=request.args.get('merchant_id'),
+            risk_level=request.args.get('risk_level'),
+            limit=request.args.get('limit', 1000, type=int)
+        )
+        return jsonify({'alerts': alerts, 'count': len(alerts)}), 200
+    except UnsupportedStoreError as e:
+        return jsonify({'error': str(e)}), 501
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/alerts/query', methods=['GET'])
+def query_alerts():
+    """
+    Filtered alerts, newest first, with keyset pagination
+    
+    Query params: user_id, merchant_id, risk_level, transaction_id, since,
+    until, min_probability, limit, cursor (next_cursor of the previous page)
+    """
+    try:
+        filters = {
+            key: request.args.get(key)
+            for key in ('user_id', 'merchant_id', 'risk_level', 'transaction_id', 'since', 'until')
+        }
+        alerts, next_cursor = notifier.query_alerts(
+            min_probability=request.args.get('min_probability', type=float),
+            cursor=request.args.get('cursor', type=int),
+            limit=request.args.get('limit', 100, type=int),
+            **filters
+        )
+        return jsonify({'alerts': alerts, 'count': len(alerts), 'next_cursor': next_cursor}), 200
+    except UnsupportedStoreError as e:
+        return jsonify({'error': str(e)}), 501
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
     print("=" * 60)
     print("🚨 ALERT SERVICE")
     print("=" * 60)
     print("✓ Service starting on http://localhost:5001")
     print("=" * 60)
-    app.run(host='0.0.0.0', port=5001, debug=False)
\ No newline at end of file
+    # threaded: each /alerts/stream subscriber holds a request thread
+    app.run(host='0.0.0.0', port=5001, debug=False, threaded=True)
\ No newline at end of file
@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+import threading
+
+from writer import AlertQueueFull
+
+logger = logging.getLogger(__name__)
+
+class AlertTopicConsumer(threading.Thread):
+    def __init__(self, notifier, bootstrap_servers=None, topic=None, batch_size=1000,
+                 dead_letter_path=None, retry_backoff=1.0, max_backoff=30.0):
+        """
+        Background ingester for the alerts topic written by the Spark job
+
+        Each poll is stored with one AlertNotifier.send_alerts call, so the
+        store is written once per batch of alerts instead of once per alert.
+        Records carry the same {transaction, prediction} body as POST /alert.
+
+        Errors never end the thread: a batch that fails is retried record by
+        record and records that still fail are appended to dead_letter_path
+        (default ALERT_DEAD_LETTER or <log_file>.dead-letter.jsonl); broker
+        errors and a full writer queue are retried with exponential backoff
+        from retry_backoff up to max_backoff seconds.
+        """
+        super().__init__(daemon=True, name='alert-topic-consumer')
+        self.notifier = notifier
+        self.bootstrap_servers = bootstrap_servers or os.getenv('KAFKA_BROKER', 'kafka:29092')
+        self.topic = topic or os.getenv('ALERTS_TOPIC', 'fraud-alerts')
+        self.batch_size = batch_size
+        self.dead_letter_path = dead_letter_path or os.getenv('ALERT_DEAD_LETTER') or \
+            os.path.splitext(notifier.log_file)[0] + '.dead-letter.jsonl'
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.stats = {'batches': 0, 'created': 0, 'duplicates': 0, 'dead_lettered': 0, 'errors': 0}
+        self._stop_event = threading.Event()
+
+    def _create_consumer(self):
+        # Imported here so the service starts without a broker client when
+        # topic ingestion is disabled
+        from kafka import KafkaConsumer
+
+        return KafkaConsumer(
+            self.topic,
+            bootstrap_servers=self.bootstrap_servers,
+            value_deserializer=lambda m: json.loads(m.decode('utf-8')),
+            auto_offset_reset='earliest',
+            enable_auto_commit=False,
+            group_id='fraud-alert-service'
+        )
+
+    def _send(self, items):
+        """
+        send_alerts + flush, waiting out a full writer queue
+        """
+        backoff = self.retry_backoff
+        while True:
+            try:
+                results = self.notifier.send_alerts(items)
+                self.notifier.flush()
+                return results
+            except AlertQueueFull:
+                if self._stop_event.is_set():
+                    raise
+                logger.warning(f"Alert queue full, retrying topic batch in {backoff:.1f}s")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def _dead_letter(self, item, error):
+        with open(self.dead_letter_path, 'a') as f:
+            f.write(json.dumps({'record': item, 'error': error}, default=str) + '\n')
+        self.stats['dead_lettered'] += 1
+
+    def store_batch(self, items):
+        """
+        Store one polled batch, isolating records that cannot be stored
+
+        Returns:
+            list aligned with items: the created alert, or None for
+            duplicates and dead-lettered records
+        """
+        try:
+            return self._send(items)
+        except AlertQueueFull:
+            raise
+        except Exception as e:
+            logger.error(f"Alert topic batch failed ({e}), storing {len(items)} records one by one")
+
+        results = []
+        for item in items:
+            try:
+                results.extend(self._send([item]))
+            except AlertQueueFull:
+                raise
+            except Exception as e:
+                logger.error(f"Dead-lettering alert record: {e!r}")
+                self._dead_letter(item, repr(e))
+                results.append(None)
+        return results
+
+    def run(self):
+        """
+        Poll the alerts topic and store each batch until stop() is called
+        """
+        consumer = None
+        backoff = self.retry_backoff
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    if consumer is None:
+                        consumer = self._create_consumer()
+                        logger.info(f"✓ Consuming alerts from topic '{self.topic}'")
+
+                    polled = consumer.poll(timeout_ms=1000, max_records=self.batch_size)
+                    items = [record.value for records in polled.values() for record in records]
+                    if items:
+                        dead_before = self.stats['dead_lettered']
+                        results = self.store_batch(items)
+                        # Commit only after the batch is stored (flushed past
+                        # the background writer); a redelivered batch is
+                        # skipped by transaction_id
+                        consumer.commit()
+
+                        created = sum(1 for r in results if r is not None)
+                        dead = self.stats['dead_lettered'] - dead_before
+                        self.stats['batches'] += 1
+                        self.stats['created'] += created
+                        self.stats['duplicates'] += len(items) - created - dead
+                        logger.info(f"Stored {created} alerts from topic ({len(items) - created - dead} "
+                                    f"duplicates, {dead} dead-lettered)")
+                    backoff = self.retry_backoff
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    logger.error(f"Alert topic consumer error, retrying in {backoff:.1f}s: {e}")
+                    self._stop_event.wait(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+        finally:
+            if consumer is not None:
+                consumer.close()
+
+    def stop(self):
+        """Ask the consumer loop to exit"""
+        self._stop_event.set()
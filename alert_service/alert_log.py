@@ -0,0 +1,231 @@
+import glob
+import json
+import os
+import threading
+import time
+
+SEGMENT_PREFIX = 'alerts-'
+SEGMENT_SUFFIX = '.jsonl'
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+def iter_segment(path):
+    """
+    Yield the alerts of one segment file
+
+    A torn trailing line (crash mid-write) is skipped.
+    """
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+class SegmentedAlertLog:
+    def __init__(self, directory, max_segment_bytes=64 * 1024 * 1024, max_segment_age=3600,
+                 fsync_policy='interval', fsync_interval=1.0):
+        """
+        Append-only alert log split into JSON-lines segments
+
+        Each append writes only the new lines to the active segment, so the
+        cost of storing an alert does not grow with the history. The active
+        segment is rolled once it exceeds max_segment_bytes or is older than
+        max_segment_age seconds (0 disables either limit).
+
+        fsync_policy:
+            always   - fsync after every append
+            interval - fsync at most every fsync_interval seconds
+            never    - leave flushing to the OS
+
+        Appends skip alerts whose transaction_id is already in the log, so a
+        replayed batch is stored once. The set of stored ids is read from
+        the segments on first use and covers what this process has seen in
+        them; alerts compacted away before a restart are not in it.
+        """
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy} (choose from {', '.join(FSYNC_POLICIES)})")
+
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._seq = 0
+        self._opened_at = 0.0
+        self._last_fsync = 0.0
+        # transaction_ids in the log, loaded lazily by _stored_ids()
+        self._ids = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._open_active_segment()
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{seq:08d}{SEGMENT_SUFFIX}")
+
+    def segments(self):
+        """
+        Segment paths, oldest first (the last one is the active segment)
+        """
+        return sorted(glob.glob(os.path.join(self.directory, f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")))
+
+    @property
+    def active_segment(self):
+        return self._segment_path(self._seq)
+
+    def _open_active_segment(self):
+        """
+        Reopen the newest segment for appending, or start the first one
+        """
+        existing = self.segments()
+        if existing:
+            name = os.path.basename(existing[-1])
+            self._seq = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+        else:
+            self._seq = 1
+
+        path = self._segment_path(self._seq)
+        self._file = open(path, 'ab')
+
+        # A crash may have left a torn last line; start on a fresh line so
+        # the next record is not glued onto it
+        if self._file.tell() > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self._file.write(b'\n')
+
+        self._opened_at = time.time()
+
+    def _should_roll(self):
+        size = self._file.tell()
+        if size == 0:
+            return False
+        if self.max_segment_bytes and size >= self.max_segment_bytes:
+            return True
+        if self.max_segment_age and time.time() - self._opened_at >= self.max_segment_age:
+            return True
+        return False
+
+    def _roll(self):
+        """Close the active segment and start the next one"""
+        self._fsync()
+        self._file.close()
+        self._seq += 1
+        self._file = open(self._segment_path(self._seq), 'ab')
+        self._opened_at = time.time()
+
+    def _fsync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_fsync = time.time()
+
+    def _stored_ids(self):
+        """transaction_ids already in the log; caller holds self._lock"""
+        if self._ids is None:
+            self._ids = {a.get('transaction_id') for a in self.iter_alerts()}
+            self._ids.discard(None)
+        return self._ids
+
+    def existing_ids(self, transaction_ids):
+        """The subset of transaction_ids already stored"""
+        with self._lock:
+            return self._stored_ids().intersection(transaction_ids)
+
+    def append(self, alerts, fsync=None):
+        """
+        Append alerts to the active segment in a single write
+
+        Alerts whose transaction_id is already stored (or repeated within
+        the batch) are skipped.
+
+        Args:
+            alerts: list of alert dicts
+            fsync: True/False to override the fsync policy for this write
+        """
+        if not alerts:
+            return
+
+        with self._lock:
+            stored = self._stored_ids()
+            fresh = []
+            for alert in alerts:
+                transaction_id = alert.get('transaction_id')
+                if transaction_id is not None:
+                    if transaction_id in stored:
+                        continue
+                    stored.add(transaction_id)
+                fresh.append(alert)
+            if not fresh:
+                return
+            data = ''.join(json.dumps(a, separators=(',', ':')) + '\n' for a in fresh).encode('utf-8')
+
+            if self._should_roll():
+                self._roll()
+
+            self._file.write(data)
+            self._file.flush()
+
+            if fsync is None:
+                fsync = (self.fsync_policy == 'always' or
+                         (self.fsync_policy == 'interval' and
+                          time.time() - self._last_fsync >= self.fsync_interval))
+            if fsync:
+                self._fsync()
+
+    def sync(self):
+        """Force buffered appends to disk"""
+        with self._lock:
+            self._fsync()
+
+    def iter_alerts(self, segments=None):
+        """
+        Yield stored alerts oldest first (optionally from given segments only)
+        """
+        for path in segments if segments is not None else self.segments():
+            try:
+                yield from iter_segment(path)
+            except FileNotFoundError:
+                # Removed by compaction while we were iterating
+                continue
+
+    def is_empty(self):
+        return all(os.path.getsize(p) == 0 for p in self.segments())
+
+    def migrate_legacy(self, legacy_path):
+        """
+        One-time import of a legacy JSON-array alert file
+
+        The alerts are appended to the log and the old file is renamed to
+        <legacy_path>.migrated, so the import never runs twice.
+
+        Returns:
+            number of alerts migrated
+        """
+        if not os.path.exists(legacy_path):
+            return 0
+
+        try:
+            with open(legacy_path, 'r') as f:
+                alerts = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Error reading legacy alert file {legacy_path}: {e}")
+            return 0
+
+        if not isinstance(alerts, list):
+            return 0
+
+        self.append(alerts, fsync=True)
+        os.replace(legacy_path, legacy_path + '.migrated')
+        print(f"✓ Migrated {len(alerts)} alerts from {legacy_path}")
+        return len(alerts)
+
+    def close(self):
+        with self._lock:
+            if self._file and not self._file.closed:
+                self._fsync()
+                self._file.close()
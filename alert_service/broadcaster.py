@@ -0,0 +1,119 @@
+from collections import deque
+import json
+import threading
+import time
+
+class AlertBroadcaster:
+    def __init__(self, history=1000, max_clients=500):
+        """
+        Fan out alert events to Server-Sent Events subscribers
+
+        Event ids are '<boot id>-<sequence>'. The last `history` events are
+        kept so a client reconnecting with Last-Event-ID gets exactly what
+        it missed; an id from another process run or older than the
+        history gets a fresh snapshot instead.
+
+        Subscribers block on one Condition and, when woken, send every event
+        after their cursor in one go, so a burst costs one wake-up per
+        client rather than one per alert.
+        """
+        self.boot_id = format(int(time.time() * 1000), 'x')
+        self.max_clients = max_clients
+        self._events = deque(maxlen=history)
+        self._seq = 0
+        self._clients = 0
+        self._cond = threading.Condition()
+
+    @property
+    def last_event_id(self):
+        with self._cond:
+            return f"{self.boot_id}-{self._seq}"
+
+    @property
+    def clients(self):
+        return self._clients
+
+    def publish(self, event, data):
+        """Append an event and wake the subscribers"""
+        payload = json.dumps(data, separators=(',', ':'))
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, event, payload))
+            self._cond.notify_all()
+
+    def _parse(self, event_id):
+        """Sequence number of an id from this run, else None"""
+        try:
+            boot_id, seq = str(event_id).rsplit('-', 1)
+            return int(seq) if boot_id == self.boot_id else None
+        except ValueError:
+            return None
+
+    def events_after(self, event_id):
+        """
+        Events after event_id, or None when they are no longer known
+        """
+        seq = self._parse(event_id)
+        with self._cond:
+            if seq is None or seq > self._seq:
+                return None
+            if seq < self._seq and (not self._events or self._events[0][0] > seq + 1):
+                return None
+            return [e for e in self._events if e[0] > seq]
+
+    def _format(self, seq, event, payload):
+        return f"id: {self.boot_id}-{seq}\nevent: {event}\ndata: {payload}\n\n"
+
+    def stream(self, last_event_id=None, snapshot=None, heartbeat=15.0):
+        """
+        SSE generator for one subscriber
+
+        Args:
+            last_event_id: resume point sent by the client, if any
+            snapshot: callable returning the data of a 'snapshot' event,
+                sent when there is nothing to resume from
+            heartbeat: seconds between keep-alive comments
+        """
+        with self._cond:
+            if self._clients >= self.max_clients:
+                raise RuntimeError(f"Too many stream clients ({self.max_clients})")
+            self._clients += 1
+
+        try:
+            yield "retry: 3000\n\n"
+
+            missed = self.events_after(last_event_id) if last_event_id else None
+            if missed is None:
+                with self._cond:
+                    seq = self._seq
+                data = snapshot() if snapshot else {}
+                yield self._format(seq, 'snapshot', json.dumps(data, separators=(',', ':')))
+            else:
+                for e in missed:
+                    yield self._format(*e)
+                seq = missed[-1][0] if missed else self._parse(last_event_id)
+
+            while True:
+                with self._cond:
+                    if self._seq == seq:
+                        self._cond.wait(heartbeat)
+                    if self._seq == seq:
+                        pending = None
+                    elif self._events and self._events[0][0] > seq + 1:
+                        # Fell behind the history: start over from a snapshot
+                        pending = 'snapshot'
+                        seq = self._seq
+                    else:
+                        pending = [e for e in self._events if e[0] > seq]
+                        seq = pending[-1][0]
+
+                if pending is None:
+                    yield ": keep-alive\n\n"
+                elif pending == 'snapshot':
+                    data = snapshot() if snapshot else {}
+                    yield self._format(seq, 'snapshot', json.dumps(data, separators=(',', ':')))
+                else:
+                    yield ''.join(self._format(*e) for e in pending)
+        finally:
+            with self._cond:
+                self._clients -= 1
@@ -0,0 +1,151 @@
+from collections import Counter, OrderedDict
+from datetime import datetime
+import time
+
+RISK_ORDER = {'LOW': 0, 'MEDIUM': 1, 'HIGH': 2}
+MAX_INCIDENT_TRANSACTIONS = 100
+# Key values that identify nobody (AlertNotifier fills a missing user_id
+# or merchant_id with 'UNKNOWN'); such alerts are never coalesced
+MISSING_KEYS = (None, '', 'UNKNOWN')
+
+def alert_counts(record, default_risk=None):
+    """
+    Alerts a stored record stands for, by risk level
+
+    An alert counts once; an incident counts the alerts folded into it
+    (its first alert was stored separately).
+    """
+    if record.get('type') != 'incident':
+        return Counter({record.get('risk_level', default_risk): 1})
+    if 'absorbed_risk_levels' in record:
+        return Counter(record['absorbed_risk_levels'])
+    return Counter({record.get('risk_level', default_risk): max(record.get('count', 1) - 1, 0)})
+
+class AlertCoalescer:
+    def __init__(self, window_seconds, key_field='user_id', max_open=10000):
+        """
+        Merge bursts of alerts for one user (or merchant) into incidents
+
+        The first alert for a key opens an incident and is stored as usual.
+        Alerts for the same key within window_seconds of that first alert
+        are folded into the incident instead of being stored. When the
+        window ends the incident is closed and, if it absorbed anything,
+        returned as one record carrying the count, total amount and max
+        probability. Absorbed alerts are therefore not visible (in recent
+        alerts, the stream or the counters) until their incident closes,
+        up to window_seconds later.
+
+        The first alert was already stored and counted, so an incident
+        record stands only for the alerts it absorbed: its 'amount' is
+        theirs ('total_amount' covers the whole incident) and
+        alert_counts() counts them by risk level.
+
+        Alerts without a key (missing, empty or 'UNKNOWN') are never folded
+        together: add() leaves them to be stored on their own.
+
+        Open incidents live in an OrderedDict in opening order, so expiry
+        pops from the front; at most max_open are kept, the oldest being
+        closed early when a new key arrives.
+        """
+        if key_field not in ('user_id', 'merchant_id'):
+            raise ValueError(f"Unknown coalescing key: {key_field} (choose from user_id, merchant_id)")
+
+        self.window_seconds = window_seconds
+        self.key_field = key_field
+        self.max_open = max_open
+        self._open = OrderedDict()
+
+    def __len__(self):
+        return len(self._open)
+
+    def add(self, alert, now=None):
+        """
+        Route one alert
+
+        Returns:
+            (incident_id or None, closed): incident_id is set when the alert
+            was folded into an open incident (and must not be stored);
+            closed is a list of incident records to store
+        """
+        now = time.time() if now is None else now
+        closed = self.expire(now)
+
+        key = alert.get(self.key_field)
+        if key in MISSING_KEYS:
+            return None, closed
+        incident = self._open.get(key)
+        if incident is not None:
+            incident['count'] += 1
+            incident['total_amount'] += float(alert.get('amount') or 0)
+            incident['absorbed_amount'] += float(alert.get('amount') or 0)
+            incident['absorbed_risk_levels'][alert['risk_level']] += 1
+            incident['max_probability'] = max(incident['max_probability'], alert['fraud_probability'])
+            if RISK_ORDER.get(alert['risk_level'], 0) > RISK_ORDER.get(incident['risk_level'], 0):
+                incident['risk_level'] = alert['risk_level']
+            incident['last_seen'] = alert['timestamp']
+            if len(incident['transaction_ids']) < MAX_INCIDENT_TRANSACTIONS:
+                incident['transaction_ids'].append(alert['transaction_id'])
+            return incident['incident_id'], closed
+
+        self._open[key] = {
+            'incident_id': f"INCIDENT_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}",
+            'key': key,
+            'opened_at': now,
+            'first_alert_id': alert['alert_id'],
+            'first_seen': alert['timestamp'],
+            'last_seen': alert['timestamp'],
+            'user_id': alert.get('user_id'),
+            'merchant_id': alert.get('merchant_id'),
+            'count': 1,
+            'total_amount': float(alert.get('amount') or 0),
+            'absorbed_amount': 0.0,
+            'absorbed_risk_levels': Counter(),
+            'max_probability': alert['fraud_probability'],
+            'risk_level': alert['risk_level'],
+            'transaction_ids': [alert['transaction_id']],
+        }
+        while len(self._open) > self.max_open:
+            closed.extend(self._close(self._open.popitem(last=False)[1]))
+        return None, closed
+
+    def expire(self, now=None):
+        """Close incidents whose window has ended"""
+        now = time.time() if now is None else now
+        closed = []
+        while self._open:
+            incident = next(iter(self._open.values()))
+            if now - incident['opened_at'] < self.window_seconds:
+                break
+            closed.extend(self._close(self._open.popitem(last=False)[1]))
+        return closed
+
+    def close_all(self):
+        closed = []
+        while self._open:
+            closed.extend(self._close(self._open.popitem(last=False)[1]))
+        return closed
+
+    def _close(self, incident):
+        """Incident record to store, or nothing when no alert was folded in"""
+        if incident['count'] < 2:
+            return []
+        return [{
+            'alert_id': incident['incident_id'],
+            'type': 'incident',
+            'timestamp': datetime.now().isoformat(),
+            'transaction_id': incident['incident_id'],
+            'incident_key': self.key_field,
+            'user_id': incident['user_id'],
+            'merchant_id': incident['merchant_id'],
+            'first_alert_id': incident['first_alert_id'],
+            'first_seen': incident['first_seen'],
+            'last_seen': incident['last_seen'],
+            'count': incident['count'],
+            'amount': incident['absorbed_amount'],
+            'total_amount': incident['total_amount'],
+            'absorbed_risk_levels': dict(incident['absorbed_risk_levels']),
+            'fraud_probability': incident['max_probability'],
+            'max_probability': incident['max_probability'],
+            'risk_level': incident['risk_level'],
+            'transaction_ids': incident['transaction_ids'],
+        }]
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Alert log compaction
+
+Closed segments of the alert log (every segment but the active one) are
+rewritten as gzip JSON-lines archives partitioned by alert time:
+
+    <log_dir>/archive/date=2024-01-31/hour=14/alerts-00000012.jsonl.gz
+
+and folded into one rollup file per day:
+
+    <log_dir>/rollups/date=2024-01-31.json
+
+holding the day's and each hour's counts by risk level plus the top users
+and merchants. The notifier rebuilds its summary from the rollups and only
+replays segments that are not compacted yet, and seeds its recent-alert
+buffer and dedupe window from newest_archived(). Archived partitions are
+read back on demand by iter_archived().
+
+Each rollup records the segments folded into it, so a compaction that
+stops half way can simply be run again.
+"""
+import os
+import sys
+import json
+import glob
+import gzip
+import time
+import argparse
+from collections import Counter, defaultdict
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from alert_log import iter_segment
+from coalescer import alert_counts
+
+ARCHIVE_DIR = 'archive'
+ROLLUP_DIR = 'rollups'
+ROLLUP_TOP_K = 1000
+
+
+def _partition(timestamp):
+    """('2024-01-31', '14') from an ISO timestamp"""
+    timestamp = str(timestamp or '')
+    if len(timestamp) >= 13 and timestamp[10] == 'T':
+        return timestamp[:10], timestamp[11:13]
+    return 'unknown', '00'
+
+
+def _write_atomic(path, write):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _rollup_path(log_dir, date):
+    return os.path.join(log_dir, ROLLUP_DIR, f"date={date}.json")
+
+
+def _empty_rollup(date):
+    return {'date': date, 'total': 0, 'risk_levels': {}, 'hours': {},
+            'users': {}, 'merchants': {}, 'segments': []}
+
+
+def load_rollups(log_dir, since_date=None):
+    """Daily rollups, oldest first"""
+    rollups = []
+    for path in sorted(glob.glob(os.path.join(log_dir, ROLLUP_DIR, 'date=*.json'))):
+        date = os.path.basename(path)[len('date='):-len('.json')]
+        if since_date and date < since_date:
+            continue
+        with open(path, 'r') as f:
+            rollups.append(json.load(f))
+    return rollups
+
+
+def compacted_segments(log_dir):
+    """Names of segments already folded into the rollups"""
+    names = set()
+    for rollup in load_rollups(log_dir):
+        names.update(rollup['segments'])
+    return names
+
+
+def _top(counter, k):
+    return dict(counter.most_common(k))
+
+
+def compact_segment(path, log_dir, top_k=ROLLUP_TOP_K):
+    """
+    Archive one closed segment and fold it into the daily rollups
+
+    Returns the number of alerts compacted.
+    """
+    name = os.path.basename(path)
+    seq = name[:-len('.jsonl')]
+
+    partitions = defaultdict(list)
+    for alert in iter_segment(path):
+        partitions[_partition(alert.get('timestamp'))].append(alert)
+
+    # Archives are named after the segment, so a rerun overwrites them
+    for (date, hour), alerts in partitions.items():
+        archive_path = os.path.join(log_dir, ARCHIVE_DIR, f"date={date}", f"hour={hour}", f"{seq}.jsonl.gz")
+
+        def write(tmp, alerts=alerts):
+            with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+                for alert in alerts:
+                    f.write(json.dumps(alert, separators=(',', ':')) + '\n')
+
+        _write_atomic(archive_path, write)
+
+    by_date = defaultdict(list)
+    for (date, hour), alerts in partitions.items():
+        by_date[date].append((hour, alerts))
+
+    for date, hours in by_date.items():
+        rollup_path = _rollup_path(log_dir, date)
+        if os.path.exists(rollup_path):
+            with open(rollup_path, 'r') as f:
+                rollup = json.load(f)
+        else:
+            rollup = _empty_rollup(date)
+
+        if name in rollup['segments']:
+            continue
+
+        risk_levels = Counter(rollup['risk_levels'])
+        users = Counter(rollup['users'])
+        merchants = Counter(rollup['merchants'])
+        for hour, alerts in hours:
+            bucket = rollup['hours'].setdefault(hour, {'total': 0, 'risk_levels': {}})
+            hour_risk = Counter(bucket['risk_levels'])
+            hour_total = 0
+            for alert in alerts:
+                # Incident records count the alerts they absorbed
+                counts = alert_counts(alert, default_risk='UNKNOWN')
+                n = sum(counts.values())
+                risk_levels.update(counts)
+                hour_risk.update(counts)
+                users[alert.get('user_id', 'UNKNOWN')] += n
+                merchants[alert.get('merchant_id', 'UNKNOWN')] += n
+                hour_total += n
+            bucket['total'] += hour_total
+            bucket['risk_levels'] = dict(hour_risk)
+            rollup['total'] += hour_total
+
+        rollup['hours'] = dict(sorted(rollup['hours'].items()))
+        rollup['risk_levels'] = dict(risk_levels)
+        # Beyond the top K, user and merchant counts are approximate
+        rollup['users'] = _top(users, top_k)
+        rollup['merchants'] = _top(merchants, top_k)
+        rollup['segments'].append(name)
+
+        def write(tmp, rollup=rollup):
+            with open(tmp, 'w') as f:
+                json.dump(rollup, f)
+
+        _write_atomic(rollup_path, write)
+
+    os.remove(path)
+    return sum(len(alerts) for alerts in partitions.values())
+
+
+def compact(log_dir, min_age=0, top_k=ROLLUP_TOP_K):
+    """
+    Compact every closed segment last modified at least min_age seconds ago
+
+    Returns a report dict.
+    """
+    segments = sorted(glob.glob(os.path.join(log_dir, 'alerts-*.jsonl')))
+    now = time.time()
+    report = {'segments': 0, 'alerts': 0, 'bytes_in': 0}
+
+    # The newest segment is the one being appended to
+    for path in segments[:-1]:
+        if now - os.path.getmtime(path) < min_age:
+            continue
+        report['bytes_in'] += os.path.getsize(path)
+        report['alerts'] += compact_segment(path, log_dir, top_k)
+        report['segments'] += 1
+
+    return report
+
+
+def archive_partitions(log_dir, since=None, until=None):
+    """
+    Archive files whose date/hour partition overlaps [since, until)
+
+    since/until are ISO timestamps; only their date and hour are used.
+    """
+    since_key = _partition(since) if since else None
+    until_key = _partition(until) if until else None
+    paths = []
+    for path in sorted(glob.glob(os.path.join(log_dir, ARCHIVE_DIR, 'date=*', 'hour=*', '*.jsonl.gz'))):
+        hour_dir = os.path.dirname(path)
+        key = (os.path.basename(os.path.dirname(hour_dir))[len('date='):],
+               os.path.basename(hour_dir)[len('hour='):])
+        if since_key and key < since_key:
+            continue
+        if until_key and key > until_key:
+            continue
+        paths.append(path)
+    return paths
+
+
+def iter_archived(log_dir, since=None, until=None):
+    """Yield archived alerts in [since, until), opening only matching partitions"""
+    for path in archive_partitions(log_dir, since, until):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                alert = json.loads(line)
+                timestamp = alert.get('timestamp', '')
+                if since and timestamp < since:
+                    continue
+                if until and timestamp >= until:
+                    continue
+                yield alert
+
+
+def newest_archived(log_dir, limit):
+    """
+    The newest `limit` archived alerts, oldest first
+
+    Partitions are opened newest first and only until `limit` alerts have
+    been read.
+    """
+    chunks = []
+    n = 0
+    for path in reversed(archive_partitions(log_dir)):
+        if n >= limit:
+            break
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            alerts = [json.loads(line) for line in f if line.strip()]
+        chunks.append(alerts)
+        n += len(alerts)
+    alerts = [alert for chunk in reversed(chunks) for alert in chunk]
+    return alerts[-limit:] if limit > 0 else []
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact closed alert log segments')
+    parser.add_argument('--log-dir', default=os.getenv('ALERT_LOG_DIR', os.path.join(current_dir, 'fraud_alerts')))
+    parser.add_argument('--min-age', type=float, default=0,
+                        help='Only compact segments untouched for this many seconds')
+    parser.add_argument('--top-k', type=int, default=ROLLUP_TOP_K,
+                        help='Users/merchants kept per daily rollup')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🗜️  ALERT LOG COMPACTION")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    report = compact(args.log_dir, args.min_age, args.top_k)
+    print(f"✓ Compacted {report['segments']} segments ({report['alerts']} alerts, "
+          f"{report['bytes_in'] / 1024:.0f} KB) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,37 +1,298 @@
+from collections import Counter, OrderedDict, deque
+from itertools import islice
 from datetime import datetime
-import json
 import os
+import threading
+
+from alert_log import SegmentedAlertLog
+from sqlite_store import SQLiteAlertStore
+from writer import AlertWriter
+from coalescer import AlertCoalescer, alert_counts
+import compaction
+from broadcaster import AlertBroadcaster
+
+class UnsupportedStoreError(Exception):
+    """Raised when a read needs a different alert store (ALERT_STORE)"""
 
 class AlertNotifier:
-    def __init__(self, log_file='fraud_alerts.json'):  # Changed: relative path
+    def __init__(self, log_file='fraud_alerts.json', log_dir=None, store=None, async_writes=None):  # Changed: relative path
         """
         Initialize alert notifier
+        
+        By default alerts are appended to a segmented JSON-lines log (see
+        alert_log.py) in log_dir, which defaults to log_file without its
+        extension. store='sqlite' keeps them in an indexed SQLite database
+        instead (see sqlite_store.py), which also enables query_alerts().
+        An existing JSON-array log_file is migrated into either store once.
+        
+        With async_writes (the default) request threads only enqueue alerts;
+        a background AlertWriter (see writer.py) batches them into the store.
+        
+        Env:
+            ALERT_STORE: log | sqlite (default log)
+            ALERT_DB: SQLite database path (default log_file with .db)
+            ALERT_DB_POOL_SIZE: pooled SQLite connections (default 8)
+            ALERT_LOG_DIR: override log_dir
+            ALERT_SEGMENT_MAX_BYTES: roll segments at this size (default 64 MB)
+            ALERT_SEGMENT_MAX_AGE: roll segments after this many seconds (default 3600)
+            ALERT_FSYNC: always | interval | never (default interval)
+            ALERT_DEDUPE_WINDOW: recent transaction_ids remembered for dedupe
+            ALERT_RECENT_BUFFER: newest alerts kept in memory (default 1000)
+            ALERT_HOURLY_BUCKETS: hours of per-hour counts kept (default 720)
+            ALERT_ASYNC_WRITES: write through the background writer (default true)
+            ALERT_QUEUE_MAX: pending writes before back-pressure (default 10000)
+            ALERT_QUEUE_POLICY: block | reject | spill when the queue is full
+            ALERT_QUEUE_BLOCK_TIMEOUT: seconds the block policy waits for room
+                before raising AlertQueueFull (default 30, 0 waits forever)
+            ALERT_WRITE_RETRIES: retries of a failed background write before
+                its batch goes to the spill file (default 3)
+            ALERT_WRITE_BATCH: max alerts per background write (default 1000)
+            ALERT_COALESCE_WINDOW: seconds to merge alerts per key into one
+                incident (default 0, disabled)
+            ALERT_COALESCE_KEY: user_id | merchant_id (default user_id)
+            ALERT_COALESCE_MAX_OPEN: open incidents kept (default 10000)
+            ALERT_STREAM_HISTORY: events kept for stream resume (default 1000)
+            ALERT_STREAM_MAX_CLIENTS: concurrent stream subscribers (default 500)
         """
         # Use absolute path relative to this file
         current_dir = os.path.dirname(os.path.abspath(__file__))
         self.log_file = os.path.join(current_dir, log_file)
-        self._ensure_log_file_exists()
+        self.log_dir = log_dir or os.getenv('ALERT_LOG_DIR') or os.path.splitext(self.log_file)[0]
+        
+        self.store_type = store or os.getenv('ALERT_STORE', 'log')
+        
+        if self.store_type == 'sqlite':
+            self.db_path = os.getenv('ALERT_DB') or os.path.splitext(self.log_file)[0] + '.db'
+            self.store = SQLiteAlertStore(self.db_path)
+        elif self.store_type == 'log':
+            self.store = SegmentedAlertLog(
+                self.log_dir,
+                max_segment_bytes=int(os.getenv('ALERT_SEGMENT_MAX_BYTES', 64 * 1024 * 1024)),
+                max_segment_age=float(os.getenv('ALERT_SEGMENT_MAX_AGE', 3600)),
+                fsync_policy=os.getenv('ALERT_FSYNC', 'interval')
+            )
+        else:
+            raise ValueError(f"Unknown alert store: {self.store_type} (choose from log, sqlite)")
+        self.store.migrate_legacy(self.log_file)
+        
+        if async_writes is None:
+            async_writes = os.getenv('ALERT_ASYNC_WRITES', 'true').lower() in ('1', 'true', 'yes')
+        self.writer = None
+        if async_writes:
+            self.writer = AlertWriter(
+                self.store,
+                max_queue=int(os.getenv('ALERT_QUEUE_MAX', 10000)),
+                policy=os.getenv('ALERT_QUEUE_POLICY', 'block'),
+                spill_path=os.path.splitext(self.log_file)[0] + '.spill.jsonl',
+                batch_size=int(os.getenv('ALERT_WRITE_BATCH', 1000)),
+                block_timeout=float(os.getenv('ALERT_QUEUE_BLOCK_TIMEOUT', 30)) or None,
+                write_retries=int(os.getenv('ALERT_WRITE_RETRIES', 3))
+            )
+            # Alerts spilled by a previous process belong in the counters too
+            self.writer.flush()
+        
+        # Bounded set of recent transaction_ids for idempotent bulk ingest
+        self._lock = threading.Lock()
+        self._dedupe_window = int(os.getenv('ALERT_DEDUPE_WINDOW', 100000))
+        self._seen_ids = OrderedDict()
+        # transaction_ids claimed by a send in progress (see _claim), so a
+        # concurrent duplicate is skipped while the lock is released
+        self._pending_ids = set()
+        
+        # Newest alerts and running counters so reads never touch the log
+        self._recent = deque(maxlen=int(os.getenv('ALERT_RECENT_BUFFER', 1000)))
+        self._risk_counts = Counter()
+        self._hourly_counts = OrderedDict()
+        self._hourly_buckets = int(os.getenv('ALERT_HOURLY_BUCKETS', 720))
+        self._total = 0
+        
+        # Compacted history comes from the daily rollups (see compaction.py);
+        # only segments not folded into them yet are replayed
+        self._compaction_lock = threading.Lock()
+        if self.store_type == 'log':
+            compacted = compaction.compacted_segments(self.log_dir)
+            for rollup in compaction.load_rollups(self.log_dir):
+                self._index_rollup(rollup)
+            # The rollups hold the counts; the newest archived alerts still
+            # seed the ring buffer and the dedupe window
+            seed = max(self._recent.maxlen, self._dedupe_window)
+            for alert in compaction.newest_archived(self.log_dir, seed):
+                self._remember(alert['transaction_id'])
+                self._recent.append(alert)
+            alerts = self.store.iter_alerts(
+                [p for p in self.store.segments() if os.path.basename(p) not in compacted]
+            )
+            for alert in alerts:
+                self._index(alert)
+        else:
+            self._load_sqlite_counters()
+        
+        # Every stored record is pushed to /alerts/stream subscribers
+        self.broadcaster = AlertBroadcaster(
+            history=int(os.getenv('ALERT_STREAM_HISTORY', 1000)),
+            max_clients=int(os.getenv('ALERT_STREAM_MAX_CLIENTS', 500))
+        )
+        
+        # Optional burst coalescing for send_alert; a sweeper closes
+        # incidents whose window ended without further alerts
+        self.coalescer = None
+        self._sweeper_stop = threading.Event()
+        window = float(os.getenv('ALERT_COALESCE_WINDOW', 0))
+        if window > 0:
+            self.coalescer = AlertCoalescer(
+                window,
+                key_field=os.getenv('ALERT_COALESCE_KEY', 'user_id'),
+                max_open=int(os.getenv('ALERT_COALESCE_MAX_OPEN', 10000))
+            )
+            threading.Thread(target=self._sweep_incidents, daemon=True, name='alert-coalescer').start()
     
-    def _ensure_log_file_exists(self):
+    def _sweep_incidents(self):
+        while not self._sweeper_stop.wait(min(self.coalescer.window_seconds, 5)):
+            with self._lock:
+                expired = self.coalescer.expire()
+            try:
+                self._store_records(expired)
+            except Exception as e:
+                print(f"Error storing {len(expired)} expired incidents: {e}")
+    
+    def _store_records(self, records):
+        """
+        Persist, then index and broadcast records
+        
+        Called without self._lock: a block-policy writer may wait for queue
+        room, and other requests must not queue up behind it on the lock.
+        Records are indexed only once persisting succeeded, so a rejected
+        batch can be sent again.
         """
-        Create log file if it doesn't exist
+        if not records:
+            return
+        self._persist(records)
+        with self._lock:
+            delta = Counter()
+            for record in records:
+                self._index(record)
+                delta.update(alert_counts(record))
+            self.broadcaster.publish('alerts', {
+                'alerts': records,
+                'delta': {
+                    'total_alerts': sum(delta.values()),
+                    'high_risk': delta['HIGH'],
+                    'medium_risk': delta['MEDIUM'],
+                    'low_risk': delta['LOW']
+                },
+                'summary': self._summary()
+            })
+    
+    def _index(self, alert):
+        """
+        Update dedupe window, ring buffer and counters for a stored alert
+        
+        Incident records count only the alerts they absorbed.
         """
-        # Create directory if it doesn't exist
-        log_dir = os.path.dirname(self.log_file)
-        if log_dir and not os.path.exists(log_dir):
-            os.makedirs(log_dir, exist_ok=True)
+        self._remember(alert['transaction_id'])
+        self._recent.append(alert)
+        counts = alert_counts(alert)
+        n = sum(counts.values())
+        self._total += n
+        self._risk_counts.update(counts)
         
-        # Create file if it doesn't exist
-        if not os.path.exists(self.log_file):
-            with open(self.log_file, 'w') as f:
-                json.dump([], f)
-            print(f"✓ Created log file: {self.log_file}")
+        # Hour bucket, e.g. '2024-01-31T14'
+        hour = str(alert.get('timestamp', ''))[:13]
+        if hour not in self._hourly_counts:
+            self._hourly_counts[hour] = 0
+            while len(self._hourly_counts) > self._hourly_buckets:
+                self._hourly_counts.popitem(last=False)
+        self._hourly_counts[hour] += n
     
-    def send_alert(self, transaction, prediction):
+    def _index_rollup(self, rollup):
         """
-        Send fraud alert (currently logs to file)
+        Add a compacted day's counts to the running counters
+        """
+        self._total += rollup['total']
+        self._risk_counts.update(rollup['risk_levels'])
+        for hour, bucket in rollup['hours'].items():
+            self._hourly_counts[f"{rollup['date']}T{hour}"] = bucket['total']
+        while len(self._hourly_counts) > self._hourly_buckets:
+            self._hourly_counts.popitem(last=False)
+    
+    def _load_sqlite_counters(self):
+        """
+        Counters from SQL aggregates and only the newest rows decoded, so
+        startup does not grow with the number of stored alerts
+        """
+        self._risk_counts = Counter(self.store.risk_level_counts())
+        self._hourly_counts = OrderedDict(self.store.hourly_counts(self._hourly_buckets))
+        # Each incident row was counted once; it stands for its absorbed alerts
+        for incident in self.store.incidents():
+            counts = alert_counts(incident)
+            self._risk_counts[incident.get('risk_level')] -= 1
+            self._risk_counts.update(counts)
+            hour = str(incident.get('timestamp', ''))[:13]
+            if hour in self._hourly_counts:
+                self._hourly_counts[hour] += sum(counts.values()) - 1
+        self._total = sum(self._risk_counts.values())
+        
+        for transaction_id in self.store.newest_transaction_ids(self._dedupe_window):
+            self._remember(transaction_id)
+        self._recent.extend(self.store.newest(self._recent.maxlen))
+    
+    def _remember(self, transaction_id):
+        self._seen_ids[transaction_id] = None
+        self._seen_ids.move_to_end(transaction_id)
+        if len(self._seen_ids) > self._dedupe_window:
+            self._seen_ids.popitem(last=False)
+    
+    def _claim(self, transaction_ids):
+        """
+        Reserve the transaction_ids that have no stored alert yet
+        
+        The dedupe window answers for recent ids; the rest are checked
+        against the store, which also covers ids older than the window and
+        from before a restart. Claimed ids are held in _pending_ids until
+        _release(), so a concurrent duplicate is skipped.
+        
+        Returns:
+            set of claimed transaction_ids
+        """
+        with self._lock:
+            claimed = {t for t in transaction_ids if t not in self._seen_ids and t not in self._pending_ids}
+            self._pending_ids.update(claimed)
+        try:
+            stored = self.store.existing_ids(claimed) if claimed else set()
+        except Exception:
+            self._release(claimed)
+            raise
+        if stored:
+            with self._lock:
+                self._pending_ids.difference_update(stored)
+                for transaction_id in stored:
+                    self._remember(transaction_id)
+        return claimed - stored
+    
+    def _release(self, claimed):
+        with self._lock:
+            self._pending_ids.difference_update(claimed)
+    
+    def _persist(self, alerts):
+        """
+        Hand alerts to the background writer, or write them directly
+        
+        Raises AlertQueueFull when the writer's queue is full and its policy
+        is reject (or block timed out).
+        """
+        if self.writer:
+            self.writer.submit(alerts)
+            return
+        try:
+            self.store.append(alerts)
+        except Exception as e:
+            print(f"Error logging alerts: {e}")
+    
+    def _build_alert(self, transaction, prediction):
+        """
+        Build the alert record for a scored transaction
         """
-        alert = {
+        return {
             'alert_id': f"ALERT_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}",
             'timestamp': datetime.now().isoformat(),
             'transaction_id': transaction['transaction_id'],
@@ -52,63 +313,215 @@ class AlertNotifier:
                 }
             }
         }
+    
+    def send_alert(self, transaction, prediction):
+        """
+        Send fraud alert (currently logs to file)
+        
+        With coalescing enabled an alert for a key that already has an open
+        incident is not stored; it is returned with 'coalesced_into' set to
+        the incident id. An alert for a transaction_id that already has one
+        is not stored either and is returned with 'duplicate' set.
+        """
+        alert = self._build_alert(transaction, prediction)
+        claimed = self._claim([alert['transaction_id']])
+        if not claimed:
+            return dict(alert, duplicate=True)
         
-        # Log to file
-        self._log_alert(alert)
+        try:
+            if self.coalescer is not None:
+                with self._lock:
+                    incident_id, closed = self.coalescer.add(alert)
+                self._store_records(closed)
+                if incident_id:
+                    return dict(alert, coalesced_into=incident_id)
+            
+            # Log to file
+            self._log_alert(alert)
+        finally:
+            self._release(claimed)
         
         return alert
     
-    def _log_alert(self, alert):
+    def send_alerts(self, items):
         """
-        Log alert to JSON file
+        Send many fraud alerts with a single write
+        
+        Args:
+            items: list of {'transaction': ..., 'prediction': ...} dicts
+            
+        Returns:
+            list aligned with items: the created alert, or None when an
+            alert for that transaction_id already exists
         """
+        claimed = self._claim([item['transaction']['transaction_id'] for item in items])
+        results = []
+        batch_ids = set()
+        for item in items:
+            transaction = item['transaction']
+            transaction_id = transaction['transaction_id']
+            if transaction_id not in claimed or transaction_id in batch_ids:
+                results.append(None)
+                continue
+            batch_ids.add(transaction_id)
+            results.append(self._build_alert(transaction, item['prediction']))
+        
         try:
-            # Read existing alerts
-            with open(self.log_file, 'r') as f:
-                alerts = json.load(f)
-            
-            # Append new alert
-            alerts.append(alert)
-            
-            # Write back
-            with open(self.log_file, 'w') as f:
-                json.dump(alerts, f, indent=2)
+            self._store_records([a for a in results if a is not None])
+        finally:
+            self._release(claimed)
         
-        except Exception as e:
-            print(f"Error logging alert: {e}")
+        return results
+    
+    def _log_alert(self, alert):
+        """
+        Append alert to the alert store
+        """
+        self._store_records([alert])
     
     def get_recent_alerts(self, limit=10):
         """
-        Get recent alerts
+        Get recent alerts (oldest first), served from the ring buffer
+        
+        Only a limit larger than the buffer falls back to reading the store
+        (archives included).
         """
         try:
-            with open(self.log_file, 'r') as f:
-                alerts = json.load(f)
-            return alerts[-limit:]
+            with self._lock:
+                if limit <= len(self._recent) or self._total == len(self._recent):
+                    return list(islice(reversed(self._recent), limit))[::-1]
+            if self.store_type != 'log':
+                return list(deque(self.store.iter_alerts(), maxlen=limit))
+            with self._compaction_lock:
+                live = list(deque(self.store.iter_alerts(), maxlen=limit))
+                if len(live) < limit:
+                    live = compaction.newest_archived(self.log_dir, limit - len(live)) + live
+            return live[-limit:]
         except:
             return []
     
+    def _summary(self):
+        if not self._total:
+            return {'total_alerts': 0}
+        
+        return {
+            'total_alerts': self._total,
+            'high_risk': self._risk_counts['HIGH'],
+            'medium_risk': self._risk_counts['MEDIUM'],
+            'low_risk': self._risk_counts['LOW']
+        }
+    
     def get_alert_summary(self):
         """
-        Get summary statistics of alerts
+        Get summary statistics of alerts from the running counters
         """
-        try:
-            with open(self.log_file, 'r') as f:
-                alerts = json.load(f)
-            
-            if not alerts:
-                return {'total_alerts': 0}
-            
-            total = len(alerts)
-            high_risk = sum(1 for a in alerts if a['risk_level'] == 'HIGH')
-            medium_risk = sum(1 for a in alerts if a['risk_level'] == 'MEDIUM')
-            low_risk = sum(1 for a in alerts if a['risk_level'] == 'LOW')
-            
-            return {
-                'total_alerts': total,
-                'high_risk': high_risk,
-                'medium_risk': medium_risk,
-                'low_risk': low_risk
-            }
-        except:
-            return {'total_alerts': 0}
\ No newline at end of file
+        with self._lock:
+            return self._summary()
+    
+    def stream_snapshot(self, limit=10):
+        """
+        Initial state for a stream subscriber: recent alerts and summary
+        """
+        return {'alerts': self.get_recent_alerts(limit=limit), 'summary': self.get_alert_summary()}
+    
+    def get_hourly_counts(self, hours=24):
+        """
+        Alert counts for the most recent hour buckets, oldest first
+        """
+        with self._lock:
+            buckets = list(self._hourly_counts.items())
+        return [{'hour': hour, 'alerts': count} for hour, count in buckets[-hours:]]
+    
+    def get_daily_counts(self, days=30):
+        """
+        Alert counts per day from the hour buckets, oldest first
+        """
+        daily = OrderedDict()
+        with self._lock:
+            for hour, count in self._hourly_counts.items():
+                day = hour[:10]
+                daily[day] = daily.get(day, 0) + count
+        return [{'date': day, 'alerts': count} for day, count in list(daily.items())[-days:]]
+    
+    def get_history(self, since=None, until=None, user_id=None, merchant_id=None,
+                    risk_level=None, limit=1000):
+        """
+        Alerts in [since, until) from archived partitions and live segments
+        
+        Only archive partitions overlapping the time range are opened. The
+        compaction lock is held throughout, so no segment moves from the
+        live log into the archives between the two reads.
+        """
+        if self.store_type != 'log':
+            raise UnsupportedStoreError("Alert history reads the segment log store; use /alerts/query with ALERT_STORE=sqlite")
+        
+        self.flush()
+        results = []
+        with self._compaction_lock:
+            live = self.store.iter_alerts(self.store.segments())
+            for source in (compaction.iter_archived(self.log_dir, since, until), live):
+                for alert in source:
+                    timestamp = alert.get('timestamp', '')
+                    if (since and timestamp < since) or (until and timestamp >= until):
+                        continue
+                    if user_id and alert.get('user_id') != user_id:
+                        continue
+                    if merchant_id and alert.get('merchant_id') != merchant_id:
+                        continue
+                    if risk_level and alert.get('risk_level') != risk_level:
+                        continue
+                    results.append(alert)
+                    if len(results) >= limit:
+                        return results
+        return results
+    
+    def compact(self, min_age=0):
+        """
+        Compact closed log segments (see compaction.py) under the lock
+        get_history() reads with
+        """
+        with self._compaction_lock:
+            return compaction.compact(self.log_dir, min_age=min_age)
+    
+    def supports_query(self):
+        return hasattr(self.store, 'query')
+    
+    def query_alerts(self, **filters):
+        """
+        Filtered, paginated alerts (SQLite store only)
+        
+        Returns:
+            (alerts, next_cursor), see SQLiteAlertStore.query
+        """
+        if not self.supports_query():
+            raise UnsupportedStoreError("Alert queries require ALERT_STORE=sqlite")
+        return self.store.query(**filters)
+    
+    def queue_stats(self):
+        """
+        Background writer queue depth and counters (None when writing synchronously)
+        """
+        if not self.writer:
+            return None
+        return dict(self.writer.stats, depth=self.writer.depth(),
+                    capacity=self.writer.max_queue, policy=self.writer.policy)
+    
+    def flush(self):
+        """
+        Wait until every queued alert is in the store
+        """
+        if self.writer:
+            self.writer.flush()
+    
+    def close(self):
+        """
+        Close open incidents, drain the writer queue and close the alert store
+        """
+        if self.coalescer is not None:
+            self._sweeper_stop.set()
+            with self._lock:
+                closed = self.coalescer.close_all()
+            self._store_records(closed)
+        if self.writer:
+            self.writer.close()
+        self.store.close()
\ No newline at end of file
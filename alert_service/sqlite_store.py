@@ -0,0 +1,297 @@
+from contextlib import contextmanager
+import json
+import os
+import queue
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    alert_id TEXT,
+    timestamp TEXT,
+    transaction_id TEXT,
+    user_id TEXT,
+    merchant_id TEXT,
+    amount REAL,
+    fraud_probability REAL,
+    risk_level TEXT,
+    payload TEXT NOT NULL,
+    record_type TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp);
+CREATE INDEX IF NOT EXISTS idx_alerts_risk_level ON alerts (risk_level, id);
+CREATE INDEX IF NOT EXISTS idx_alerts_user_id ON alerts (user_id, id);
+CREATE INDEX IF NOT EXISTS idx_alerts_merchant_id ON alerts (merchant_id, id);
+"""
+
+# Replayed batches must not be stored twice; databases from before the
+# unique index are deduplicated (first copy kept) when it is created
+TRANSACTION_ID_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_alerts_transaction_id_unique ON alerts (transaction_id)"
+
+# record_type is NULL for alerts and 'incident' for coalesced incidents;
+# added after the first release, so older databases get it on open
+RECORD_TYPE_INDEX = "CREATE INDEX IF NOT EXISTS idx_alerts_record_type ON alerts (record_type)"
+
+INSERT_SQL = """
+INSERT OR IGNORE INTO alerts (alert_id, timestamp, transaction_id, user_id, merchant_id,
+                    amount, fraud_probability, risk_level, payload, record_type)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+EXISTING_IDS_CHUNK = 500
+EXISTING_IDS_SQL = (f"SELECT transaction_id FROM alerts WHERE transaction_id IN "
+                    f"({','.join('?' * EXISTING_IDS_CHUNK)})")
+
+# Equality filters map straight onto an indexed column; the (column, id)
+# indexes let SQLite walk a filter in id order without sorting
+EQUALITY_FILTERS = ('user_id', 'merchant_id', 'risk_level', 'transaction_id')
+MAX_QUERY_LIMIT = 1000
+
+class SQLiteAlertStore:
+    def __init__(self, db_path, synchronous='NORMAL', pool_size=None):
+        """
+        Alert store backed by an indexed SQLite database
+
+        Uses WAL mode so readers never block the writer. Every statement is
+        a constant parameterised string, which sqlite3 keeps prepared in its
+        per-connection statement cache. Connections come from a pool of at
+        most pool_size (default ALERT_DB_POOL_SIZE or 8), borrowed for one
+        statement at a time, so short-lived request threads never leave
+        connections behind; writes are serialised with a lock.
+
+        Same append/existing_ids/iter_alerts/migrate_legacy/close interface
+        as SegmentedAlertLog, plus query() for filtered, paginated reads.
+        """
+        self.db_path = db_path
+        self.synchronous = synchronous
+        self.pool_size = max(1, int(pool_size or os.getenv('ALERT_DB_POOL_SIZE', 8)))
+        self._write_lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._idle = queue.LifoQueue()
+        self._connections = []
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(alerts)')}
+            if 'record_type' not in columns:
+                conn.execute('ALTER TABLE alerts ADD COLUMN record_type TEXT')
+                conn.execute("UPDATE alerts SET record_type = 'incident' WHERE alert_id LIKE 'INCIDENT!_%' ESCAPE '!'")
+            conn.execute(RECORD_TYPE_INDEX)
+            indexes = {row[1] for row in conn.execute('PRAGMA index_list(alerts)')}
+            if 'idx_alerts_transaction_id_unique' not in indexes:
+                conn.execute('DELETE FROM alerts WHERE transaction_id IS NOT NULL AND id NOT IN '
+                             '(SELECT MIN(id) FROM alerts WHERE transaction_id IS NOT NULL GROUP BY transaction_id)')
+                conn.execute(TRANSACTION_ID_INDEX)
+                conn.execute('DROP INDEX IF EXISTS idx_alerts_transaction_id')
+            conn.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """
+        Borrow a pooled connection, opening one while below pool_size and
+        otherwise waiting for one to be returned
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._pool_lock:
+                if len(self._connections) < self.pool_size:
+                    conn = self._connect()
+                    self._connections.append(conn)
+            if conn is None:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @staticmethod
+    def _row(alert):
+        return (
+            alert.get('alert_id'),
+            alert.get('timestamp'),
+            alert.get('transaction_id'),
+            alert.get('user_id'),
+            alert.get('merchant_id'),
+            alert.get('amount'),
+            alert.get('fraud_probability'),
+            alert.get('risk_level'),
+            json.dumps(alert, separators=(',', ':')),
+            alert.get('type'),
+        )
+
+    def existing_ids(self, transaction_ids):
+        """The subset of transaction_ids already stored"""
+        transaction_ids = list(transaction_ids)
+        found = set()
+        for start in range(0, len(transaction_ids), EXISTING_IDS_CHUNK):
+            chunk = transaction_ids[start:start + EXISTING_IDS_CHUNK]
+            # Padded with NULLs (which match nothing) so the statement text
+            # stays constant and cached
+            chunk += [None] * (EXISTING_IDS_CHUNK - len(chunk))
+            with self._connection() as conn:
+                found.update(row[0] for row in conn.execute(EXISTING_IDS_SQL, chunk))
+        return found
+
+    def append(self, alerts, fsync=None):
+        """
+        Insert alerts in one transaction; transaction_ids already stored
+        are ignored by the unique index
+        """
+        if not alerts:
+            return
+
+        rows = [self._row(a) for a in alerts]
+        with self._write_lock, self._connection() as conn:
+            with conn:
+                conn.executemany(INSERT_SQL, rows)
+
+    def iter_alerts(self, batch_size=10000):
+        """
+        Yield stored alerts oldest first
+        """
+        last_id = 0
+        while True:
+            # The connection goes back to the pool between pages
+            with self._connection() as conn:
+                rows = conn.execute(
+                    'SELECT id, payload FROM alerts WHERE id > ? ORDER BY id LIMIT ?',
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for _, payload in rows:
+                yield json.loads(payload)
+            last_id = rows[-1][0]
+
+    def query(self, user_id=None, merchant_id=None, risk_level=None, transaction_id=None,
+              since=None, until=None, min_probability=None, cursor=None, limit=100):
+        """
+        Filtered alerts, newest first, with keyset pagination
+
+        Args:
+            since/until: ISO timestamps bounding the alert time
+            cursor: next_cursor from the previous page
+            limit: page size (capped at MAX_QUERY_LIMIT)
+
+        Returns:
+            (alerts, next_cursor); next_cursor is None on the last page
+        """
+        limit = max(1, min(int(limit), MAX_QUERY_LIMIT))
+        filters = {
+            'user_id': user_id,
+            'merchant_id': merchant_id,
+            'risk_level': risk_level,
+            'transaction_id': transaction_id,
+        }
+
+        clauses = []
+        params = []
+        for column in EQUALITY_FILTERS:
+            if filters[column] is not None:
+                clauses.append(f'{column} = ?')
+                params.append(filters[column])
+        if since is not None:
+            clauses.append('timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('timestamp < ?')
+            params.append(until)
+        if min_probability is not None:
+            clauses.append('fraud_probability >= ?')
+            params.append(float(min_probability))
+        if cursor is not None:
+            clauses.append('id < ?')
+            params.append(int(cursor))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        sql = f'SELECT id, payload FROM alerts {where} ORDER BY id DESC LIMIT ?'
+        with self._connection() as conn:
+            rows = conn.execute(sql, params + [limit + 1]).fetchall()
+
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [json.loads(payload) for _, payload in rows[:limit]], next_cursor
+
+    def count(self):
+        with self._connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM alerts').fetchone()[0]
+
+    def risk_level_counts(self):
+        """Stored records per risk level (counted on the risk_level index)"""
+        with self._connection() as conn:
+            return dict(conn.execute('SELECT risk_level, COUNT(*) FROM alerts GROUP BY risk_level').fetchall())
+
+    def hourly_counts(self, limit):
+        """(hour, records) for the newest `limit` hours, oldest first, e.g. ('2024-01-31T14', 12)"""
+        with self._connection() as conn:
+            rows = conn.execute(
+                'SELECT substr(timestamp, 1, 13) AS hour, COUNT(*) FROM alerts '
+                'GROUP BY hour ORDER BY hour DESC LIMIT ?', (limit,)
+            ).fetchall()
+        return rows[::-1]
+
+    def newest(self, limit):
+        """The newest `limit` alerts, oldest first"""
+        with self._connection() as conn:
+            rows = conn.execute('SELECT payload FROM alerts ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return [json.loads(payload) for payload, in reversed(rows)]
+
+    def newest_transaction_ids(self, limit):
+        """transaction_ids of the newest `limit` records, oldest first"""
+        with self._connection() as conn:
+            rows = conn.execute('SELECT transaction_id FROM alerts ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return [transaction_id for transaction_id, in reversed(rows)]
+
+    def incidents(self):
+        """Stored incident records, oldest first"""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT payload FROM alerts WHERE record_type = 'incident' ORDER BY id"
+            ).fetchall()
+        return [json.loads(payload) for payload, in rows]
+
+    def migrate_legacy(self, legacy_path):
+        """
+        One-time import of a legacy JSON-array alert file
+
+        The old file is renamed to <legacy_path>.migrated afterwards.
+
+        Returns:
+            number of alerts migrated
+        """
+        if not os.path.exists(legacy_path):
+            return 0
+
+        try:
+            with open(legacy_path, 'r') as f:
+                alerts = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Error reading legacy alert file {legacy_path}: {e}")
+            return 0
+
+        if not isinstance(alerts, list):
+            return 0
+
+        self.append(alerts)
+        os.replace(legacy_path, legacy_path + '.migrated')
+        print(f"✓ Migrated {len(alerts)} alerts from {legacy_path}")
+        return len(alerts)
+
+    def close(self):
+        with self._pool_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            self._idle = queue.LifoQueue()
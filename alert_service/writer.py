@@ -0,0 +1,184 @@
+import json
+import os
+import queue
+import threading
+import time
+
+BACKPRESSURE_POLICIES = ('block', 'reject', 'spill')
+
+class AlertQueueFull(Exception):
+    """Raised by AlertWriter.submit when the queue is full under the reject policy"""
+
+class AlertWriter:
+    def __init__(self, store, max_queue=10000, policy='block', spill_path=None,
+                 batch_size=1000, block_timeout=None, write_retries=3, retry_backoff=0.5):
+        """
+        Single background thread persisting alerts for the request threads
+
+        submit() only enqueues; the writer drains whatever is queued (up to
+        batch_size alerts) into one store.append, so under load many alerts
+        share one write and one fsync.
+
+        When the queue is full, policy decides what submit does:
+            block  - wait for room (block_timeout seconds, then AlertQueueFull)
+            reject - raise AlertQueueFull at once
+            spill  - append the alerts to spill_path; the writer replays the
+                     spill file into the store once the queue has drained
+
+        A failed store.append is retried write_retries times (backoff
+        doubling from retry_backoff seconds); a batch that still fails is
+        appended to spill_path and replayed with it. Only without a
+        spill_path are failed batches counted as errors and dropped.
+        """
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown back-pressure policy: {policy} (choose from {', '.join(BACKPRESSURE_POLICIES)})")
+        if policy == 'spill' and not spill_path:
+            raise ValueError("spill policy needs a spill_path")
+
+        self.store = store
+        self.policy = policy
+        self.spill_path = spill_path
+        self.batch_size = batch_size
+        self.block_timeout = block_timeout
+        self.max_queue = max_queue
+        self.write_retries = write_retries
+        self.retry_backoff = retry_backoff
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stop = object()
+        self._stats = {'written': 0, 'batches': 0, 'rejected': 0, 'spilled': 0, 'retries': 0, 'errors': 0}
+
+        self._thread = threading.Thread(target=self._run, daemon=True, name='alert-writer')
+        self._thread.start()
+
+    @property
+    def stats(self):
+        """Copy of the counters"""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for name, n in deltas.items():
+                self._stats[name] += n
+
+    def submit(self, alerts):
+        """
+        Queue a list of alerts for persistence
+        """
+        if not alerts:
+            return
+        try:
+            if self.policy == 'block':
+                self._queue.put(alerts, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(alerts)
+        except queue.Full:
+            if self.policy == 'spill':
+                self._spill(alerts)
+                return
+            self._count(rejected=len(alerts))
+            raise AlertQueueFull(f"Alert queue full ({self.max_queue} pending writes)")
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _spill(self, alerts):
+        data = ''.join(json.dumps(a, separators=(',', ':')) + '\n' for a in alerts)
+        with self._spill_lock:
+            with open(self.spill_path, 'a') as f:
+                f.write(data)
+        self._count(spilled=len(alerts))
+
+    def _replay_spill(self):
+        """Move spilled alerts into the store, then truncate the spill file"""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return
+            alerts = []
+            with open(self.spill_path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        try:
+                            alerts.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            continue
+            # A replay that fails leaves the file for the next attempt
+            if alerts and not self._append(alerts):
+                return
+            os.remove(self.spill_path)
+
+    def _append(self, alerts):
+        """store.append with retries; False when every attempt failed"""
+        backoff = self.retry_backoff
+        for attempt in range(self.write_retries + 1):
+            try:
+                self.store.append(alerts)
+                self._count(written=len(alerts), batches=1)
+                return True
+            except Exception as e:
+                if attempt == self.write_retries:
+                    print(f"Error writing {len(alerts)} alerts: {e}")
+                    return False
+                self._count(retries=1)
+                time.sleep(backoff)
+                backoff *= 2
+
+    def _write(self, alerts):
+        if self._append(alerts):
+            return
+        if self.spill_path:
+            self._spill(alerts)
+        else:
+            self._count(errors=len(alerts))
+
+    def _run(self):
+        # Spill left over from a previous process goes first
+        self._replay_spill()
+
+        while True:
+            item = self._queue.get()
+            if item is self._stop:
+                self._queue.task_done()
+                self._replay_spill()
+                return
+
+            batch = list(item)
+            taken = 1
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is self._stop:
+                    stop = True
+                    break
+                batch.extend(item)
+
+            self._write(batch)
+            for _ in range(taken):
+                self._queue.task_done()
+
+            if stop:
+                self._replay_spill()
+                return
+            if self._queue.empty():
+                self._replay_spill()
+
+    def flush(self):
+        """Block until everything queued or spilled so far has been written"""
+        self._queue.join()
+        self._replay_spill()
+
+    def close(self, timeout=30):
+        """Drain the queue (and spill file) and stop the writer thread"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(self._stop)
+        self._thread.join(timeout)
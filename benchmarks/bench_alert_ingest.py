@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Alerts/sec through POST /alert versus POST /alerts/batch
+
+Starts the alert service in-process on a scratch log, then sends the same
+number of alerts one request per alert and in batches of each given size.
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+
+import requests
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, os.path.join(parent_dir, 'alert_service'))
+
+
+def make_items(prefix, n):
+    return [
+        {
+            'transaction': {
+                'transaction_id': f"{prefix}{i:08d}",
+                'user_id': f"U{i % 5000:05d}",
+                'merchant_id': f"M{i % 500:04d}",
+                'amount': 100.0 + i % 900,
+                'transaction_type': 'online',
+            },
+            'prediction': {'fraud_probability': 0.9, 'risk_level': 'HIGH'}
+        }
+        for i in range(n)
+    ]
+
+
+def bench_single(base_url, n):
+    session = requests.Session()
+    items = make_items('S', n)
+    start = time.perf_counter()
+    for item in items:
+        session.post(f"{base_url}/alert", json=item, timeout=30).raise_for_status()
+    return n / (time.perf_counter() - start)
+
+
+def bench_batch(base_url, n, batch_size):
+    session = requests.Session()
+    items = make_items(f"B{batch_size}_", n)
+    start = time.perf_counter()
+    for i in range(0, n, batch_size):
+        response = session.post(f"{base_url}/alerts/batch", json={'alerts': items[i:i + batch_size]}, timeout=60)
+        response.raise_for_status()
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Alert ingestion benchmark')
+    parser.add_argument('--alerts', type=int, default=5000)
+    parser.add_argument('--batch-sizes', default='100,1000,5000')
+    parser.add_argument('--port', type=int, default=5101)
+    parser.add_argument('--fsync', default='interval', choices=['always', 'interval', 'never'])
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='alert_ingest_')
+    os.environ['ALERT_LOG_FILE'] = os.path.join(scratch, 'alerts.json')
+    os.environ['ALERT_FSYNC'] = args.fsync
+
+    from werkzeug.serving import make_server
+    import alert_app
+    alert_app.logger.setLevel(logging.ERROR)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    server = make_server('127.0.0.1', args.port, alert_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        print("=" * 60)
+        print(f"📈 ALERT INGEST ({args.alerts} alerts, fsync={args.fsync})")
+        print("=" * 60)
+        single = bench_single(base_url, args.alerts)
+        print(f"{'POST /alert':<28} {single:10.0f} alerts/sec")
+        for batch_size in [int(b) for b in args.batch_sizes.split(',')]:
+            rate = bench_batch(base_url, args.alerts, batch_size)
+            print(f"{'POST /alerts/batch x' + str(batch_size):<28} {rate:10.0f} alerts/sec "
+                  f"({rate / single:.1f}x)")
+    finally:
+        server.shutdown()
+        alert_app.notifier.close()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Query latency of the SQLite alert store at 10M stored alerts
+
+Fills a database with synthetic alerts (skipped when it already holds
+enough rows), then times each /alerts/query filter shape, including deep
+keyset pagination, and reports p50/p99 latency per shape.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, os.path.join(parent_dir, 'alert_service'))
+
+from sqlite_store import SQLiteAlertStore
+
+RISK_LEVELS = ('LOW', 'MEDIUM', 'HIGH')
+
+
+def fill(store, rows, users, merchants, chunk_size=100000):
+    """Append synthetic alerts one minute-ish apart"""
+    start_time = datetime(2024, 1, 1)
+    existing = store.count()
+    rng = random.Random(existing)
+    for start in range(existing, rows, chunk_size):
+        n = min(chunk_size, rows - start)
+        alerts = []
+        for i in range(start, start + n):
+            alerts.append({
+                'alert_id': f"ALERT_{i:010d}",
+                'timestamp': (start_time + timedelta(seconds=i * 3)).isoformat(),
+                'transaction_id': f"TXN{i:010d}",
+                'user_id': f"U{rng.randrange(users):07d}",
+                'merchant_id': f"M{rng.randrange(merchants):05d}",
+                'amount': round(rng.uniform(1, 5000), 2),
+                'fraud_probability': round(rng.random(), 4),
+                'risk_level': rng.choice(RISK_LEVELS),
+            })
+        store.append(alerts)
+        print(f"  inserted {start + n}/{rows} alerts")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def time_queries(name, make_query, repeats):
+    latencies = []
+    returned = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        alerts = make_query()
+        latencies.append((time.perf_counter() - start) * 1000)
+        returned += len(alerts)
+    print(f"{name:<24} p50 {percentile(latencies, 0.5):8.2f} ms | p99 {percentile(latencies, 0.99):8.2f} ms "
+          f"| avg rows {returned / repeats:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Alert query benchmark')
+    parser.add_argument('--rows', type=int, default=10000000)
+    parser.add_argument('--db', default='/tmp/bench_alerts.db')
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--merchants', type=int, default=50000)
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    store = SQLiteAlertStore(args.db, synchronous='OFF')
+    if store.count() < args.rows:
+        print(f"Filling {args.db} to {args.rows} alerts...")
+        fill(store, args.rows, args.users, args.merchants)
+    total = store.count()
+    start_time = datetime(2024, 1, 1)
+    rng = random.Random(42)
+
+    def user():
+        return store.query(user_id=f"U{rng.randrange(args.users):07d}", limit=args.limit)[0]
+
+    def merchant():
+        return store.query(merchant_id=f"M{rng.randrange(args.merchants):05d}", limit=args.limit)[0]
+
+    def risk():
+        return store.query(risk_level=rng.choice(RISK_LEVELS), limit=args.limit)[0]
+
+    def transaction():
+        return store.query(transaction_id=f"TXN{rng.randrange(total):010d}", limit=args.limit)[0]
+
+    def time_range():
+        since = start_time + timedelta(seconds=rng.randrange(total) * 3)
+        return store.query(since=since.isoformat(), until=(since + timedelta(hours=1)).isoformat(),
+                           limit=args.limit)[0]
+
+    def deep_pages():
+        # Ten consecutive pages of one risk level
+        cursor = None
+        alerts = []
+        for _ in range(10):
+            alerts, cursor = store.query(risk_level='HIGH', cursor=cursor, limit=args.limit)
+        return alerts
+
+    print("\n" + "=" * 60)
+    print(f"📈 ALERT QUERIES ({total} alerts, limit {args.limit})")
+    print("=" * 60)
+    time_queries('user_id', user, args.repeats)
+    time_queries('merchant_id', merchant, args.repeats)
+    time_queries('risk_level', risk, args.repeats)
+    time_queries('transaction_id', transaction, args.repeats)
+    time_queries('1h time range', time_range, args.repeats)
+    time_queries('10 pages (risk_level)', deep_pages, max(args.repeats // 10, 1))
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Throughput scaling of partition-parallel scoring workers
+
+Runs kafka_streaming.scoring_workers.ScoringWorker without a broker: the
+transactions are bucketed by user_id into in-memory partitions and each
+worker process scores the partitions it would be assigned. Buckets use
+zlib.crc32, not the murmur2 hash Kafka's default partitioner applies to the
+producer's keys, so a user lands on a different partition than in Kafka;
+only the per-user grouping and the spread across partitions match.
+"""
+import os
+import sys
+import time
+import zlib
+import argparse
+import multiprocessing
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+sys.path.insert(0, os.path.join(parent_dir, 'data'))
+
+from generate_data import generate_transactions
+from kafka_streaming.scoring_workers import ScoringWorker, assign_partitions
+
+
+def partition_records(records, num_partitions):
+    """Bucket records by a stable hash (crc32) of user_id"""
+    partitions = [[] for _ in range(num_partitions)]
+    for record in records:
+        key = str(record['user_id']).encode('utf-8')
+        partitions[zlib.crc32(key) % num_partitions].append(record)
+    return partitions
+
+
+def _bench_worker(worker_id, records, batch_size, start_event, results):
+    worker = ScoringWorker(worker_id, [])
+    worker.load_models()
+    start_event.wait()
+
+    start = time.perf_counter()
+    for i in range(0, len(records), batch_size):
+        worker.score_batch(records[i:i + batch_size])
+    results.put((worker_id, len(records), time.perf_counter() - start))
+
+
+def run_case(partitions, num_workers, batch_size):
+    subsets = assign_partitions(range(len(partitions)), num_workers)
+    start_event = multiprocessing.Event()
+    results = multiprocessing.Queue()
+
+    processes = []
+    for worker_id, subset in enumerate(subsets):
+        records = [r for p in subset for r in partitions[p]]
+        process = multiprocessing.Process(
+            target=_bench_worker,
+            args=(worker_id, records, batch_size, start_event, results)
+        )
+        process.start()
+        processes.append(process)
+
+    # Give every worker time to load the model before the clock starts
+    time.sleep(2.0)
+    start_event.set()
+
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    rows = sum(n for _, n, _ in outcomes)
+    wall = max(elapsed for _, _, elapsed in outcomes)
+    return rows, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Partitioned scoring scaling benchmark')
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--partitions', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    df = generate_transactions(n_samples=args.rows, fraud_ratio=0.02)
+    records = df.drop(columns=['timestamp']).to_dict('records')
+
+    print("=" * 60)
+    print("📈 PARTITIONED SCORING SCALING")
+    print("=" * 60)
+    print(f"Rows: {len(records)} | CPUs: {os.cpu_count()} | Batch size: {args.batch_size}")
+    print()
+    print(f"{'partitions':>10} {'workers':>8} {'rows/sec':>12} {'speedup':>8}")
+
+    baseline = None
+    for num_partitions in args.partitions:
+        partitions = partition_records(records, num_partitions)
+        for num_workers in args.workers:
+            if num_workers > num_partitions:
+                continue
+            rows, wall = run_case(partitions, num_workers, args.batch_size)
+            throughput = rows / wall
+            baseline = baseline or throughput
+            print(f"{num_partitions:>10} {num_workers:>8} {throughput:>12.0f} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Throughput of the scoring stage with and without the rule pre-filter
+
+Scores the same generated transactions with scoring.score_frame, once
+model-only and once with rules.json ahead of the model, and reports the
+short-circuit ratio, both throughputs and how many rule decisions
+disagree with what the model would have said.
+"""
+import os
+import sys
+import time
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, os.path.join(parent_dir, 'ml_model'))
+sys.path.insert(0, os.path.join(parent_dir, 'data'))
+sys.path.insert(0, parent_dir)
+
+import joblib
+
+from generate_data import generate_transactions
+from rules import RuleEngine, DEFAULT_RULES_PATH
+from spark_processing.scoring import score_frame
+
+
+def best_of(fn, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rule pre-filter throughput')
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--rules', default=DEFAULT_RULES_PATH)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    model = joblib.load(os.path.join(parent_dir, 'ml_model', 'fraud_model.pkl'))
+    fe = joblib.load(os.path.join(parent_dir, 'ml_model', 'feature_engineer.pkl'))
+    if getattr(model, 'n_jobs', None) not in (None, 1):
+        model.n_jobs = 1
+    rules = RuleEngine.from_file(args.rules)
+    df = generate_transactions(n_samples=args.rows).drop(columns=['is_fraud'])
+
+    model_time, model_only = best_of(lambda: score_frame(df.copy(), model, fe), args.repeats)
+    rules_time, with_rules = best_of(lambda: score_frame(df.copy(), model, fe, rules), args.repeats)
+
+    decided = with_rules['decision_rule'].notna()
+    disagree = (with_rules['is_fraud'] != model_only['is_fraud']) & decided
+
+    print("=" * 60)
+    print(f"📏 RULE PRE-FILTER ({args.rows} rows, {len(rules)} rules)")
+    print("=" * 60)
+    print(f"Short-circuit ratio: {decided.mean() * 100:.1f}%")
+    for name, count in with_rules.loc[decided, 'decision_rule'].value_counts().items():
+        print(f"   {name:<30} {count}")
+    print(f"Model only:          {args.rows / model_time:12,.0f} rows/s")
+    print(f"Rules + model:       {args.rows / rules_time:12,.0f} rows/s  ({model_time / rules_time:.2f}x)")
+    print(f"Rule decisions the model would flag differently: {int(disagree.sum())}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Throughput and batch latency of the Spark scoring stage per preset
+
+Kafka is replaced by Spark's ``rate-micro-batch`` source, which emits a
+fixed number of rows per micro-batch exactly like a Kafka source capped by
+maxOffsetsPerTrigger. Rows are turned into synthetic transactions and run
+through the same scoring.predict_iter as the streaming job, into a noop sink.
+
+With --velocity the per-account velocity stage runs in front of scoring and
+the state store size (rows and memory) is reported as well.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, os.path.join(parent_dir, 'spark_processing'))
+
+os.environ.setdefault('MODEL_PATH', os.path.join(parent_dir, 'ml_model', 'fraud_model.pkl'))
+os.environ.setdefault('FE_PATH', os.path.join(parent_dir, 'ml_model', 'feature_engineer.pkl'))
+
+from pyspark.sql.functions import expr
+
+import scoring
+from spark_job import create_spark_session, add_velocity_features, with_prediction_fields
+from streaming_config import PRESETS, resolve_streaming_config, resolve_velocity_config
+
+
+def synthetic_transactions(spark, rows_per_batch, num_partitions, num_accounts=10000):
+    """Stand-in for the Kafka source: fixed-size batches of fake transactions"""
+    rate = spark.readStream.format("rate-micro-batch") \
+        .option("rowsPerBatch", rows_per_batch) \
+        .option("numPartitions", num_partitions) \
+        .load()
+
+    base = rate.select(
+        expr("concat('TXN', cast(value as string))").alias("transaction_id"),
+        expr("timestamp").alias("event_time"),
+        expr("round(rand() * 500 + 1, 2)").alias("amount"),
+        expr("rand() * 180 - 90").alias("latitude"),
+        expr("rand() * 360 - 180").alias("longitude"),
+        expr("cast(rand() * 24 as int)").alias("hour"),
+        expr("cast(rand() * 7 as int)").alias("day_of_week"),
+        expr("element_at(array('online', 'in-store', 'atm'), cast(rand() * 3 as int) + 1)").alias("transaction_type"),
+        expr(f"concat('A', cast(cast(rand() * {num_accounts} as int) as string))").alias("from_account"),
+        expr(f"concat('A', cast(cast(rand() * {num_accounts} as int) as string))").alias("to_account"),
+    )
+
+    return base.select(
+        "transaction_id", "amount", "latitude", "longitude", "hour", "day_of_week",
+        expr("cast(day_of_week >= 5 as int)").alias("is_weekend"),
+        expr("cast(hour >= 22 or hour <= 6 as int)").alias("is_night"),
+        "transaction_type",
+        expr("log1p(amount)").alias("amount_log"),
+        "from_account", "to_account",
+        expr("concat('U', substring(from_account, 2))").alias("user_id"),
+        expr("concat('M', substring(to_account, 2))").alias("merchant_id"),
+        "event_time",
+    )
+
+
+def summarize(progress):
+    """Rows/sec and batch latency from a query's recent progress"""
+    batches = [p for p in progress if p['numInputRows'] > 0]
+    if not batches:
+        return None
+
+    rows = sum(p['numInputRows'] for p in batches)
+    busy_ms = sum(p['durationMs'].get('triggerExecution', 0) for p in batches)
+    latencies = np.array([p['durationMs'].get('triggerExecution', 0) for p in batches])
+
+    stats = {
+        'batches': len(batches),
+        'rows': rows,
+        'rows_per_sec': rows / (busy_ms / 1000.0) if busy_ms else 0.0,
+        'latency_p50_ms': float(np.percentile(latencies, 50)),
+        'latency_p95_ms': float(np.percentile(latencies, 95)),
+    }
+
+    state = batches[-1].get('stateOperators', [])
+    if state:
+        stats['state_rows'] = sum(op.get('numRowsTotal', 0) for op in state)
+        stats['state_memory_mb'] = sum(op.get('memoryUsedBytes', 0) for op in state) / 1e6
+    return stats
+
+
+def run_preset(spark, name, duration, default_rows_per_batch, num_partitions, velocity_config=None):
+    config = resolve_streaming_config(preset=name, env={})
+
+    arrow_batch = config['arrow_max_records_per_batch']
+    if arrow_batch:
+        spark.conf.set("spark.sql.execution.arrow.maxRecordsPerBatch", str(arrow_batch))
+    else:
+        spark.conf.unset("spark.sql.execution.arrow.maxRecordsPerBatch")
+
+    rows_per_batch = config['max_offsets_per_trigger'] or default_rows_per_batch
+    stream = synthetic_transactions(spark, rows_per_batch, num_partitions)
+    if velocity_config:
+        stream = add_velocity_features(stream, velocity_config)
+    scored = stream.mapInPandas(scoring.predict_iter, schema=with_prediction_fields(stream.schema))
+
+    writer = scored.writeStream.format("noop").outputMode("append") \
+        .option("checkpointLocation", tempfile.mkdtemp(prefix=f"bench-{name}-"))
+    if config['trigger_interval']:
+        writer = writer.trigger(processingTime=config['trigger_interval'])
+
+    query = writer.start()
+    time.sleep(duration)
+    query.stop()
+
+    return summarize(query.recentProgress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Spark scoring preset benchmark')
+    parser.add_argument('--presets', nargs='+', default=list(PRESETS))
+    parser.add_argument('--duration', type=float, default=60.0,
+                        help='Seconds to run each preset')
+    parser.add_argument('--rows-per-batch', type=int, default=50000,
+                        help='Rows per micro-batch when a preset does not cap offsets')
+    parser.add_argument('--partitions', type=int, default=4,
+                        help='Partitions of the stand-in source')
+    parser.add_argument('--master', default='local[*]')
+    parser.add_argument('--velocity', action='store_true',
+                        help='Run the per-account velocity stage before scoring')
+    args = parser.parse_args()
+
+    os.environ.setdefault('PYSPARK_SUBMIT_ARGS', f'--master {args.master} pyspark-shell')
+    spark = create_spark_session(app_name="FraudScoringPresetBenchmark", packages=None)
+
+    print("=" * 60)
+    print("📈 SPARK SCORING PRESETS")
+    print("=" * 60)
+    velocity_config = resolve_velocity_config(env={}) if args.velocity else None
+    header = f"{'preset':>16} {'batches':>8} {'rows':>10} {'rows/sec':>10} {'p50 ms':>8} {'p95 ms':>8}"
+    if velocity_config:
+        header += f" {'state rows':>11} {'state MB':>9}"
+    print(header)
+
+    for name in args.presets:
+        stats = run_preset(spark, name, args.duration, args.rows_per_batch, args.partitions, velocity_config)
+        if stats is None:
+            print(f"{name:>16} {'no completed batches':>48}")
+            continue
+        line = (f"{name:>16} {stats['batches']:>8} {stats['rows']:>10} {stats['rows_per_sec']:>10.0f} "
+                f"{stats['latency_p50_ms']:>8.0f} {stats['latency_p95_ms']:>8.0f}")
+        if velocity_config:
+            line += f" {stats.get('state_rows', 0):>11} {stats.get('state_memory_mb', 0.0):>9.1f}"
+        print(line)
+
+    spark.stop()
+
+
+if __name__ == '__main__':
+    main()
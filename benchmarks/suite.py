@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Repository-wide benchmark suite with regression tracking
+
+    python benchmarks/suite.py run --output results.json [--quick] [--only alert]
+    python benchmarks/suite.py compare baseline.json results.json [--threshold 0.15]
+
+`run` times each case (median of several repeats after a warm-up) and saves
+per-operation timings together with environment metadata. `compare` lines
+up two result files and exits non-zero when a case's median got slower than
+the threshold allows.
+
+Cases whose dependencies are missing (e.g. kafka-python, trained model
+artifacts) are recorded as skipped rather than failing the run.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+from importlib import metadata
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+sys.path.insert(0, os.path.join(parent_dir, 'ml_model'))
+sys.path.insert(0, os.path.join(parent_dir, 'data'))
+sys.path.insert(0, os.path.join(parent_dir, 'alert_service'))
+
+DEFAULT_THRESHOLD = 0.15
+
+
+class Skip(Exception):
+    """A case cannot run in this environment"""
+
+
+def measure(fn, ops=1, repeats=5, warmup=1):
+    """
+    Time fn() `repeats` times after `warmup` calls; each call performs `ops`
+    operations. Returns per-operation statistics in seconds.
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) / ops)
+    median = statistics.median(samples)
+    return {
+        'median_s': median,
+        'min_s': min(samples),
+        'mean_s': statistics.mean(samples),
+        'ops_per_sec': 1.0 / median if median else None,
+        'repeats': repeats,
+        'ops_per_repeat': ops,
+    }
+
+
+def sample_transactions(n):
+    from generate_data import generate_transactions
+    df = generate_transactions(n_samples=n)
+    return df.drop(columns=['is_fraud']).to_dict('records'), df
+
+
+def bench_generate_transactions(quick):
+    from generate_data import generate_transactions
+    n = 2000 if quick else 10000
+    return {f'generate_transactions[{n}]': measure(lambda: generate_transactions(n_samples=n), ops=n, repeats=3)}
+
+
+def bench_feature_transform(quick):
+    from feature_engineering import FeatureEngineer
+    _, df = sample_transactions(10000)
+    fe = FeatureEngineer()
+    fe.fit_transform(df)
+
+    results = {}
+    for size in ((100, 1000, 10000) if quick else (100, 1000, 10000, 100000)):
+        frame = df.sample(n=size, replace=True, random_state=0).reset_index(drop=True)
+        results[f'feature_transform[{size}]'] = measure(lambda: fe.transform(frame), ops=size)
+    return results
+
+
+def _ml_app():
+    try:
+        import ml_service.app as ml_app
+    except Exception as e:
+        raise Skip(f"ml_service unavailable: {e}")
+    app = ml_app.create_app()
+    if not ml_app.models_loaded:
+        raise Skip("model artifacts not found (run ml_model/model_training.py)")
+    return ml_app, app
+
+
+def bench_predict(quick):
+    ml_app, app = _ml_app()
+    transactions, _ = sample_transactions(200)
+    client = app.test_client()
+    n = 50 if quick else 200
+    batch = transactions[:100]
+
+    def predict_direct():
+        for txn in transactions[:n]:
+            ml_app.predict_fraud(txn)
+
+    def predict_http():
+        for txn in transactions[:n]:
+            client.post('/predict', json=txn)
+
+    def batch_http():
+        client.post('/batch-predict', json=batch)
+
+    return {
+        'predict_fraud': measure(predict_direct, ops=n),
+        'http_predict': measure(predict_http, ops=n),
+        'http_batch_predict[100]': measure(batch_http, ops=len(batch)),
+    }
+
+
+def bench_alert_notifier(quick):
+    from alert_log import SegmentedAlertLog
+    from notifier import AlertNotifier
+
+    results = {}
+    transaction = {'user_id': 'U1', 'merchant_id': 'M1', 'amount': 250.0, 'transaction_type': 'online'}
+    prediction = {'fraud_probability': 0.9, 'risk_level': 'HIGH'}
+
+    for history in ((1000, 10000) if quick else (1000, 10000, 100000)):
+        scratch = tempfile.mkdtemp(prefix='bench_alerts_')
+        try:
+            log = SegmentedAlertLog(os.path.join(scratch, 'alerts'), fsync_policy='never')
+            log.append([
+                {'alert_id': f'A{i}', 'timestamp': '2024-01-01T00:00:00', 'transaction_id': f'H{i}',
+                 'user_id': f'U{i % 1000}', 'merchant_id': 'M1', 'amount': 10.0,
+                 'fraud_probability': 0.8, 'risk_level': 'HIGH'}
+                for i in range(history)
+            ])
+            log.close()
+
+            log_file = os.path.join(scratch, 'alerts.json')
+
+            def startup():
+                AlertNotifier(log_file=log_file).close()
+
+            results[f'alert_notifier_startup[{history}]'] = measure(startup, repeats=3 if quick else 5)
+            notifier = AlertNotifier(log_file=log_file)
+
+            counter = iter(range(10 ** 9))
+            n = 200
+
+            def send():
+                for _ in range(n):
+                    notifier.send_alert(dict(transaction, transaction_id=f'N{next(counter)}'), prediction)
+                notifier.flush()
+
+            def summary():
+                for _ in range(1000):
+                    notifier.get_alert_summary()
+
+            results[f'send_alert[history={history}]'] = measure(send, ops=n)
+            results[f'get_alert_summary[history={history}]'] = measure(summary, ops=1000)
+            notifier.close()
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+def bench_producer_serialization(quick):
+    try:
+        from kafka_streaming.producer import row_to_transaction, serialize_value
+    except ImportError as e:
+        raise Skip(f"kafka-python not installed: {e}")
+
+    import pandas as pd
+    rows = pd.read_csv(os.path.join(parent_dir, 'data', 'sample_transactions.csv')).to_dict('records')
+    rows = rows[:1000]
+
+    def serialize():
+        for row in rows:
+            transaction = row_to_transaction(row)
+            str(transaction.get('user_id')).encode('utf-8')
+            serialize_value(transaction)
+
+    return {f'producer_serialize[{len(rows)}]': measure(serialize, ops=len(rows))}
+
+
+CASES = {
+    'generate': bench_generate_transactions,
+    'features': bench_feature_transform,
+    'predict': bench_predict,
+    'alert': bench_alert_notifier,
+    'producer': bench_producer_serialization,
+}
+
+
+def environment():
+    """Metadata needed to judge whether two result files are comparable"""
+    def version(package):
+        try:
+            return metadata.version(package)
+        except metadata.PackageNotFoundError:
+            return None
+
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=parent_dir,
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        commit = None
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'packages': {m: version(m) for m in ('numpy', 'pandas', 'scikit-learn', 'flask', 'kafka-python')},
+    }
+
+
+def run(args):
+    results = {}
+    skipped = {}
+    selected = args.only.split(',') if args.only else list(CASES)
+
+    print("=" * 60)
+    print(f"⏱️  BENCHMARK SUITE ({'quick' if args.quick else 'full'})")
+    print("=" * 60)
+    for name in selected:
+        try:
+            case_results = CASES[name](args.quick)
+        except Skip as e:
+            skipped[name] = str(e)
+            print(f"⏭️  {name}: skipped ({e})")
+            continue
+        for case, stats in case_results.items():
+            results[case] = stats
+            print(f"{case:<40} {stats['median_s'] * 1e6:12.1f} µs/op")
+
+    report = {'environment': environment(), 'quick': args.quick, 'results': results, 'skipped': skipped}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results saved to {args.output}")
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Rows of (case, baseline median, current median, ratio, verdict)
+
+    verdict is 'regression' when current is slower than baseline by more
+    than threshold, 'improvement' when faster by more than threshold.
+    """
+    rows = []
+    for case in sorted(set(baseline['results']) & set(current['results'])):
+        before = baseline['results'][case]['median_s']
+        after = current['results'][case]['median_s']
+        ratio = after / before if before else float('inf')
+        if ratio > 1 + threshold:
+            verdict = 'regression'
+        elif ratio < 1 - threshold:
+            verdict = 'improvement'
+        else:
+            verdict = 'ok'
+        rows.append((case, before, after, ratio, verdict))
+    return rows
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    base_env, cur_env = baseline['environment'], current['environment']
+    for key in ('python', 'machine', 'cpu_count'):
+        if base_env.get(key) != cur_env.get(key):
+            print(f"⚠️  Environments differ in {key}: {base_env.get(key)} vs {cur_env.get(key)}")
+
+    rows = compare_results(baseline, current, args.threshold)
+    print(f"{'case':<40} {'baseline':>12} {'current':>12} {'ratio':>7}")
+    for case, before, after, ratio, verdict in rows:
+        marker = {'regression': '❌', 'improvement': '✅', 'ok': ''}[verdict]
+        print(f"{case:<40} {before * 1e6:10.1f}µs {after * 1e6:10.1f}µs {ratio:7.2f} {marker}")
+
+    regressions = [row for row in rows if row[4] == 'regression']
+    missing = sorted(set(baseline['results']) - set(current['results']))
+    if missing:
+        print(f"⚠️  Not in current run: {', '.join(missing)}")
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"\n✓ No regressions beyond {args.threshold:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark suite')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help='Run the benchmarks')
+    run_parser.add_argument('--output', default='benchmark_results.json')
+    run_parser.add_argument('--quick', action='store_true', help='Smaller sizes for a fast check')
+    run_parser.add_argument('--only', default=None, help=f"Comma-separated subset of: {', '.join(CASES)}")
+
+    compare_parser = sub.add_parser('compare', help='Compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help='Allowed slowdown as a fraction (default 0.15)')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    main()
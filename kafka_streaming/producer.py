@@ -6,19 +6,56 @@ import time
 import random
 from datetime import datetime
 
+def serialize_value(value):
+    """Kafka value serializer: JSON bytes"""
+    return json.dumps(value).encode('utf-8')
+
+def row_to_transaction(row):
+    """CSV row (dict) to a JSON-safe transaction dict"""
+    # Convert numpy types to Python types
+    return {k: float(v) if isinstance(v, (float, int)) else str(v)
+            for k, v in row.items()}
+
 class TransactionProducer:
-    def __init__(self, bootstrap_servers=None, topic='transactions'):
+    def __init__(self, bootstrap_servers=None, topic='transactions', key_field=None):
+        """
+        Initialize Kafka producer
+
+        Records are keyed by ``key_field`` (``PRODUCER_KEY_FIELD``, default
+        ``user_id``) so all transactions of a user land on one partition.
+        Pass an empty string to send unkeyed records.
+        """
         self.topic = topic
         bootstrap_servers = bootstrap_servers or os.getenv('KAFKA_BROKER', 'kafka:29092')
+        if key_field is None:
+            key_field = os.getenv('PRODUCER_KEY_FIELD', 'user_id')
+        self.key_field = key_field or None
         self.producer = KafkaProducer(
             bootstrap_servers=bootstrap_servers,
-            value_serializer=lambda v: json.dumps(v).encode('utf-8')
+            key_serializer=lambda k: k.encode('utf-8') if k is not None else None,
+            value_serializer=serialize_value
         )
-        print(f"✓ Kafka Producer initialized (topic: {topic}, broker: {bootstrap_servers})")
+        self.num_partitions = self.partition_count()
+        print(f"✓ Kafka Producer initialized (topic: {topic}, broker: {bootstrap_servers}, "
+              f"key: {self.key_field or 'none'}, partitions: {self.num_partitions or 'unknown'})")
+
+    def partition_count(self):
+        """Number of partitions of the topic (0 if metadata is unavailable)"""
+        partitions = self.producer.partitions_for(self.topic)
+        return len(partitions) if partitions else 0
+
+    def record_key(self, transaction):
+        """Partitioning key for a transaction, or None when unkeyed"""
+        if not self.key_field:
+            return None
+        value = transaction.get(self.key_field)
+        if value is None:
+            return None
+        return str(value)
 
     def send_transaction(self, transaction):
         """Send a transaction to Kafka"""
-        self.producer.send(self.topic, value=transaction)
+        self.producer.send(self.topic, key=self.record_key(transaction), value=transaction)
         self.producer.flush()
         
     def send_transactions_from_file(self, file_path, delay=2.0, loop=True):
@@ -32,10 +69,7 @@ class TransactionProducer:
         count = 0
         while True:
             for idx, row in df.iterrows():
-                transaction = row.to_dict()
-                # Convert numpy types to Python types
-                transaction = {k: float(v) if isinstance(v, (float, int)) else str(v) 
-                             for k, v in transaction.items()}
+                transaction = row_to_transaction(row.to_dict())
                 
                 self.send_transaction(transaction)
                 count += 1
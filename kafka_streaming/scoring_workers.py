@@ -0,0 +1,311 @@
+"""
+Partition-parallel scoring workers
+
+The producer keys transactions by user_id, so every transaction of a user
+lands on the same partition. Each worker process owns a fixed subset of the
+topic's partitions, which means per-user state can live in a plain dict
+inside that worker - no locks and no shared store.
+
+A worker never exits on a bad record or a broker error: a batch that fails
+to score is rescored one record at a time, records that still fail are
+appended to a dead-letter file, and polling carries on.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import joblib
+
+# feature_engineer.pkl references the ml_model modules by their bare name
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, os.path.join(parent_dir, 'ml_model'))
+
+from risk import FRAUD_THRESHOLD, risk_levels
+
+DEFAULT_MODEL_PATH = os.path.join(parent_dir, 'ml_model', 'fraud_model.pkl')
+DEFAULT_FE_PATH = os.path.join(parent_dir, 'ml_model', 'feature_engineer.pkl')
+DEFAULT_DEAD_LETTER_PATH = 'scoring_dead_letter.jsonl'
+
+logger = logging.getLogger(__name__)
+
+
+def assign_partitions(partitions, num_workers):
+    """
+    Split partition ids round-robin into at most ``num_workers`` subsets
+
+    There are never more subsets than partitions, since an idle worker
+    would own no users.
+    """
+    partitions = sorted(partitions)
+    num_workers = max(1, min(num_workers, len(partitions)))
+    return [partitions[i::num_workers] for i in range(num_workers)]
+
+
+class ScoringWorker:
+    def __init__(self, worker_id, partitions, bootstrap_servers=None,
+                 topic='transactions', output_topic='predictions',
+                 model_path=None, fe_path=None, batch_size=500,
+                 max_tracked_users=100000, dead_letter_path=None,
+                 retry_backoff=1.0, max_backoff=30.0):
+        """
+        Initialize a scoring worker for a fixed set of partitions
+
+        Records that cannot be scored go to dead_letter_path (default
+        SCORING_DEAD_LETTER or scoring_dead_letter.jsonl); other errors in
+        the poll loop are retried with exponential backoff from
+        retry_backoff up to max_backoff seconds.
+        """
+        self.worker_id = worker_id
+        self.partitions = list(partitions)
+        self.bootstrap_servers = bootstrap_servers or os.getenv('KAFKA_BROKER', 'kafka:29092')
+        self.topic = topic
+        self.output_topic = output_topic
+        self.model_path = model_path or os.getenv('MODEL_PATH', DEFAULT_MODEL_PATH)
+        self.fe_path = fe_path or os.getenv('FE_PATH', DEFAULT_FE_PATH)
+        self.batch_size = batch_size
+        self.max_tracked_users = max_tracked_users
+        self.dead_letter_path = dead_letter_path or os.getenv('SCORING_DEAD_LETTER', DEFAULT_DEAD_LETTER_PATH)
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.stats = {'scored': 0, 'dead_lettered': 0, 'errors': 0}
+
+        self.model = None
+        self.feature_engineer = None
+        # user_id -> [transaction count, total amount], least recently seen first
+        self.user_state = OrderedDict()
+
+    def load_models(self):
+        """Load model and feature engineer into this process"""
+        self.model = joblib.load(self.model_path)
+        self.feature_engineer = joblib.load(self.fe_path)
+        # One worker per core: let the processes provide the parallelism
+        # instead of every forest fanning out over all cores.
+        if hasattr(self.model, 'n_jobs'):
+            self.model.n_jobs = 1
+
+    def update_user_state(self, user_ids, amounts):
+        """
+        Update per-user running totals and return them for each row
+        """
+        counts = np.empty(len(user_ids), dtype=np.int64)
+        totals = np.empty(len(user_ids), dtype=np.float64)
+        state = self.user_state
+
+        for i, (user_id, amount) in enumerate(zip(user_ids, amounts)):
+            entry = state.get(user_id)
+            if entry is None:
+                entry = state[user_id] = [0, 0.0]
+            else:
+                state.move_to_end(user_id)
+            entry[0] += 1
+            entry[1] += amount
+            counts[i] = entry[0]
+            totals[i] = entry[1]
+
+        while len(state) > self.max_tracked_users:
+            state.popitem(last=False)
+
+        return counts, totals
+
+    def score_batch(self, transactions):
+        """
+        Score a list of transaction dicts
+
+        Returns one result dict per transaction, in input order.
+        """
+        if not transactions:
+            return []
+
+        df = pd.DataFrame(transactions)
+        X = self.feature_engineer.transform(df)
+        probs = self.model.predict_proba(X)[:, 1]
+        risk = risk_levels(probs)
+
+        user_ids = df['user_id'].astype(str).tolist() if 'user_id' in df else ['UNKNOWN'] * len(df)
+        counts, totals = self.update_user_state(user_ids, df['amount'].astype(float).tolist())
+
+        transaction_ids = df['transaction_id'].tolist() if 'transaction_id' in df else ['UNKNOWN'] * len(df)
+
+        return [
+            {
+                'transaction_id': transaction_ids[i],
+                'user_id': user_ids[i],
+                'fraud_probability': float(probs[i]),
+                'is_fraud': bool(probs[i] > FRAUD_THRESHOLD),
+                'risk_level': str(risk[i]),
+                'user_txn_count': int(counts[i]),
+                'user_amount_total': float(totals[i]),
+                'worker_id': self.worker_id
+            }
+            for i in range(len(df))
+        ]
+
+    def _dead_letter(self, record, error):
+        with open(self.dead_letter_path, 'a') as f:
+            f.write(json.dumps({'worker_id': self.worker_id, 'record': record, 'error': error},
+                               default=str) + '\n')
+        self.stats['dead_lettered'] += 1
+
+    def score_records(self, transactions):
+        """
+        score_batch that isolates bad records
+
+        A batch that fails (missing column, unseen transaction_type, ...)
+        is scored again one record at a time; records that still fail are
+        dead-lettered and left out of the results.
+        """
+        try:
+            results = self.score_batch(transactions)
+            self.stats['scored'] += len(results)
+            return results
+        except Exception as e:
+            logger.warning(f"Worker {self.worker_id}: batch of {len(transactions)} failed ({e!r}), "
+                           f"scoring records one by one")
+
+        results = []
+        for transaction in transactions:
+            try:
+                results.extend(self.score_batch([transaction]))
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id}: dead-lettering record: {e!r}")
+                self._dead_letter(transaction, repr(e))
+        self.stats['scored'] += len(results)
+        return results
+
+    def run(self, max_messages=None):
+        """
+        Consume the assigned partitions and publish scored results
+        """
+        # Imported here so the launcher and benchmarks can use this module
+        # without a broker client installed.
+        from kafka import KafkaConsumer, KafkaProducer, TopicPartition
+
+        self.load_models()
+
+        consumer = KafkaConsumer(
+            bootstrap_servers=self.bootstrap_servers,
+            value_deserializer=lambda m: json.loads(m.decode('utf-8')),
+            auto_offset_reset='earliest',
+            enable_auto_commit=True,
+            group_id='fraud-scoring-workers'
+        )
+        consumer.assign([TopicPartition(self.topic, p) for p in self.partitions])
+
+        producer = KafkaProducer(
+            bootstrap_servers=self.bootstrap_servers,
+            key_serializer=lambda k: k.encode('utf-8'),
+            value_serializer=lambda v: json.dumps(v).encode('utf-8')
+        )
+
+        print(f"✓ Worker {self.worker_id} scoring partitions {self.partitions}")
+
+        count = 0
+        backoff = self.retry_backoff
+        try:
+            while max_messages is None or count < max_messages:
+                try:
+                    polled = consumer.poll(timeout_ms=1000, max_records=self.batch_size)
+                    transactions = [record.value for records in polled.values() for record in records]
+                    if not transactions:
+                        continue
+
+                    for result in self.score_records(transactions):
+                        producer.send(self.output_topic, key=result['user_id'], value=result)
+                    producer.flush()
+                    count += len(transactions)
+                    backoff = self.retry_backoff
+                except Exception:
+                    # Keep the partitions owned: nothing else would score them
+                    self.stats['errors'] += 1
+                    logger.exception(f"Worker {self.worker_id} error, retrying in {backoff:.1f}s")
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+
+        except KeyboardInterrupt:
+            pass
+        finally:
+            consumer.close()
+            producer.close()
+            print(f"✓ Worker {self.worker_id} stopped after {count} transactions")
+
+
+def _run_worker(worker_id, partitions, kwargs):
+    ScoringWorker(worker_id, partitions, **kwargs).run()
+
+
+def topic_partitions(bootstrap_servers, topic):
+    """Look up the partition ids of a topic"""
+    from kafka import KafkaConsumer
+
+    consumer = KafkaConsumer(bootstrap_servers=bootstrap_servers)
+    try:
+        partitions = consumer.partitions_for_topic(topic)
+    finally:
+        consumer.close()
+
+    if not partitions:
+        raise RuntimeError(f"Topic not found or has no partitions: {topic}")
+    return sorted(partitions)
+
+
+def launch_workers(num_workers=None, bootstrap_servers=None, topic='transactions', **kwargs):
+    """
+    Start one scoring process per partition subset and wait for them
+    """
+    bootstrap_servers = bootstrap_servers or os.getenv('KAFKA_BROKER', 'kafka:29092')
+    partitions = topic_partitions(bootstrap_servers, topic)
+    num_workers = num_workers or os.cpu_count() or 1
+    subsets = assign_partitions(partitions, num_workers)
+
+    print(f"🚀 Launching {len(subsets)} scoring workers for {len(partitions)} partitions")
+
+    kwargs.update(bootstrap_servers=bootstrap_servers, topic=topic)
+    processes = [
+        multiprocessing.Process(target=_run_worker, args=(i, subset, kwargs), daemon=True)
+        for i, subset in enumerate(subsets)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("\n⚠️  Launcher interrupted, stopping workers")
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Partition-parallel scoring workers')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--topic', default='transactions',
+                        help='Input topic')
+    parser.add_argument('--output-topic', default='predictions',
+                        help='Topic for scored results')
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='Max records scored per poll')
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("⚙️  PARTITIONED SCORING WORKERS")
+    print("=" * 60)
+
+    launch_workers(
+        num_workers=args.workers,
+        topic=args.topic,
+        output_topic=args.output_topic,
+        batch_size=args.batch_size
+    )
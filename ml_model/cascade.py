@@ -0,0 +1,153 @@
+"""
+Two-stage cascade scoring
+
+Stage one is a logistic regression on the same scaled features as the
+forest. It is calibrated on held-out calibration data so that at least
+`target_recall` of the fraud cases score at or above its clear threshold.
+Rows below the threshold are cleared with the stage-one probability, capped
+just under the MEDIUM boundary so a cleared row is always reported LOW;
+only the rest are escalated to the full forest.
+
+The stage-one artifact (cascade_stage1.pkl) is a plain dict, so loading it
+does not depend on this module; Cascade wraps it with the forest behind a
+predict_proba() of the same shape, which makes it a drop-in replacement
+for the model in ml_service and the Spark scoring stage.
+"""
+import threading
+import time
+
+import numpy as np
+
+from risk import FRAUD_THRESHOLD, RISK_THRESHOLDS
+
+DEFAULT_TARGET_RECALL = 0.995
+
+# Highest probability a cleared row is reported with (still LOW)
+CLEARED_MAX_PROBABILITY = float(np.nextafter(RISK_THRESHOLDS[0], 0.0))
+
+
+def calibrate_threshold(probabilities, y, target_recall=DEFAULT_TARGET_RECALL):
+    """
+    Highest threshold keeping at least target_recall of the positives at or
+    above it (never above FRAUD_THRESHOLD, so cleared rows are never flagged)
+    """
+    positives = np.sort(np.asarray(probabilities)[np.asarray(y) == 1])
+    if len(positives) == 0:
+        return 0.0
+    allowed_misses = int(np.floor((1.0 - target_recall) * len(positives) + 1e-9))
+    return float(min(positives[allowed_misses], FRAUD_THRESHOLD))
+
+
+def train_stage1(X_train, y_train, X_cal, y_cal, target_recall=DEFAULT_TARGET_RECALL):
+    """
+    Fit the stage-one model and calibrate its clear threshold on X_cal,
+    which must not be the data the cascade is evaluated on
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    model = LogisticRegression(max_iter=1000)
+    model.fit(X_train, y_train)
+    threshold = calibrate_threshold(model.predict_proba(X_cal)[:, 1], y_cal, target_recall)
+    return {'model': model, 'clear_threshold': threshold, 'target_recall': target_recall}
+
+
+class Cascade:
+    def __init__(self, stage1, model):
+        """
+        Args:
+            stage1: artifact from train_stage1()
+            model: the full model rows are escalated to
+        """
+        self.stage1 = stage1['model']
+        self.clear_threshold = stage1['clear_threshold']
+        self.target_recall = stage1.get('target_recall')
+        self.model = model
+        self._lock = threading.Lock()
+        self._rows = 0
+        self._escalated = 0
+
+    def __getattr__(self, name):
+        # Everything else (n_jobs, classes_, ...) comes from the full model.
+        # copy/pickle probe attributes before __init__ has run, so a missing
+        # model must surface as AttributeError rather than KeyError
+        try:
+            model = self.__dict__['model']
+        except KeyError:
+            raise AttributeError(name) from None
+        return getattr(model, name)
+
+    def escalate(self, X):
+        """Stage-one probabilities and the mask of rows needing the full model"""
+        p1 = self.stage1.predict_proba(X)[:, 1]
+        return p1, p1 >= self.clear_threshold
+
+    def predict_proba(self, X):
+        p1, escalate = self.escalate(X)
+        probabilities = np.minimum(p1, CLEARED_MAX_PROBABILITY)
+        if escalate.any():
+            probabilities[escalate] = self.model.predict_proba(X[escalate])[:, 1]
+        with self._lock:
+            self._rows += len(p1)
+            self._escalated += int(escalate.sum())
+        return np.column_stack([1.0 - probabilities, probabilities])
+
+    def stats(self):
+        with self._lock:
+            rows, escalated = self._rows, self._escalated
+        return {
+            'rows': rows,
+            'escalated': escalated,
+            'escalation_rate': round(escalated / rows, 4) if rows else 0.0,
+            'clear_threshold': self.clear_threshold,
+            'target_recall': self.target_recall,
+        }
+
+
+def _recall(predicted, y):
+    positives = y == 1
+    return float(predicted[positives].mean()) if positives.any() else 0.0
+
+
+def cascade_report(stage1, model, X, y, repeats=3):
+    """
+    Recall of the forest alone and of the cascade, the escalation rate and
+    the throughput multiplier of the cascade over the forest on X
+    """
+    y = np.asarray(y)
+    cascade = Cascade(stage1, model)
+
+    def best_time(fn):
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    full_time, full_proba = best_time(lambda: model.predict_proba(X)[:, 1])
+    cascade_time, cascade_proba = best_time(lambda: cascade.predict_proba(X)[:, 1])
+    _, escalate = cascade.escalate(X)
+
+    full_recall = _recall(full_proba > FRAUD_THRESHOLD, y)
+    cascade_recall = _recall(cascade_proba > FRAUD_THRESHOLD, y)
+    return {
+        'rows': len(y),
+        'clear_threshold': stage1['clear_threshold'],
+        'stage1_recall': _recall(escalate, y),
+        'full_recall': full_recall,
+        'cascade_recall': cascade_recall,
+        'recall_loss': full_recall - cascade_recall,
+        'escalation_rate': float(escalate.mean()),
+        'throughput_multiplier': full_time / cascade_time if cascade_time else None,
+    }
+
+
+def print_cascade_report(report):
+    print(f"   Clear threshold:       {report['clear_threshold']:.4f}")
+    print(f"   Stage-1 fraud recall:  {report['stage1_recall'] * 100:.2f}%")
+    print(f"   Forest recall:         {report['full_recall'] * 100:.2f}%")
+    print(f"   Cascade recall:        {report['cascade_recall'] * 100:.2f}% "
+          f"(loss {report['recall_loss'] * 100:.2f} pts)")
+    print(f"   Escalation rate:       {report['escalation_rate'] * 100:.2f}%")
+    print(f"   Throughput multiplier: {report['throughput_multiplier']:.2f}x")
@@ -7,7 +7,9 @@ from sklearn.metrics import (
 )
 import matplotlib.pyplot as plt
 import seaborn as sns
+import os
 from feature_engineering import FeatureEngineer
+from cascade import cascade_report, print_cascade_report
 
 def evaluate_model():
     """
@@ -58,6 +60,12 @@ def evaluate_model():
     }).sort_values('importance', ascending=False)
     print(feature_importance.head(10))
     
+    # Cascade
+    stage1_path = 'ml_model/cascade_stage1.pkl'
+    if os.path.exists(stage1_path):
+        print("\n9️⃣ Cascade (stage one + forest):")
+        print_cascade_report(cascade_report(joblib.load(stage1_path), model, X_test, y_test))
+    
     print("\n" + "=" * 60)
     print("✅ EVALUATION COMPLETE")
     print("=" * 60)
@@ -7,13 +7,39 @@ from sklearn.preprocessing import StandardScaler, LabelEncoder
 import joblib
 import os
 
+GEO_FEATURES = ['geo_fraud_rate', 'geo_log_count']
+
+
 class FeatureEngineer:
     """Feature engineering for fraud detection"""
     
-    def __init__(self):
+    def __init__(self, geo_index=None):
+        """
+        Args:
+            geo_index: optional GeoRiskIndex; adds the smoothed fraud rate
+                and transaction count around each location as features
+        """
         self.scaler = StandardScaler()
         self.label_encoders = {}
         self.feature_columns = None
+        self.geo_index = geo_index
+    
+    def _add_geo_features(self, df, labels=None):
+        """
+        Vectorized geo index lookup; pickles from before the index have no
+        geo_index attribute. With labels (training rows the index was built
+        from) the lookup is leave-one-out.
+        """
+        geo_index = getattr(self, 'geo_index', None)
+        if geo_index is None:
+            return
+        lat, lon = df['latitude'].to_numpy(), df['longitude'].to_numpy()
+        if labels is not None:
+            rates, counts = geo_index.lookup_training(lat, lon, labels)
+        else:
+            rates, counts = geo_index.lookup(lat, lon)
+        df['geo_fraud_rate'] = rates
+        df['geo_log_count'] = np.log1p(counts)
         
     def fit_transform(self, df):
         """
@@ -35,12 +61,16 @@ class FeatureEngineer:
             df[col + '_encoded'] = le.fit_transform(df[col])
             self.label_encoders[col] = le
         
+        self._add_geo_features(df, labels=df['is_fraud'].to_numpy())
+        
         # Select features for model
         self.feature_columns = [
             'amount', 'amount_log', 'latitude', 'longitude',
             'hour', 'day_of_week', 'is_weekend', 'is_night',
             'transaction_type_encoded'
         ]
+        if self.geo_index is not None:
+            self.feature_columns += GEO_FEATURES
         
         X = df[self.feature_columns].values
         
@@ -65,6 +95,8 @@ class FeatureEngineer:
         for col, le in self.label_encoders.items():
             df[col + '_encoded'] = le.transform(df[col])
         
+        self._add_geo_features(df)
+        
         X = df[self.feature_columns].values
         X_scaled = self.scaler.transform(X)
         
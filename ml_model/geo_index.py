@@ -0,0 +1,109 @@
+"""
+Precomputed geospatial fraud risk index
+
+Training transactions are bucketed into a fixed latitude/longitude grid
+(cell_degrees on a side). Counts and fraud counts are summed over each
+cell's neighbourhood (radius cells in every direction, wrapping around in
+longitude) and turned into a smoothed fraud rate:
+
+    rate = (frauds + strength * prior) / (count + strength)
+
+where prior is the overall fraud rate, so sparse cells fall back to it.
+Rates and counts are two small arrays pickled with the FeatureEngineer
+that uses them (feature_engineer.pkl is the only copy); a lookup is a
+couple of integer operations per row, vectorized over a batch.
+"""
+import numpy as np
+
+
+def _neighbourhood_sum(grid, radius):
+    """Sum of each cell's (2r+1) x (2r+1) neighbourhood, longitude wrapping"""
+    if radius <= 0:
+        return grid.copy()
+    padded = np.pad(grid, ((radius, radius), (0, 0)), mode='constant')
+    total = np.zeros_like(grid)
+    n_lat = grid.shape[0]
+    for d_lat in range(-radius, radius + 1):
+        rows = padded[radius + d_lat:radius + d_lat + n_lat]
+        for d_lon in range(-radius, radius + 1):
+            total += np.roll(rows, d_lon, axis=1)
+    return total
+
+
+class GeoRiskIndex:
+    def __init__(self, rates, counts, cell_degrees, prior, frauds=None, strength=20.0):
+        """
+        Args:
+            rates: (n_lat, n_lon) smoothed fraud rate per cell
+            counts: (n_lat, n_lon) transactions in each cell's neighbourhood
+            cell_degrees: grid cell size
+            prior: overall fraud rate, returned for invalid coordinates
+            frauds: neighbourhood fraud counts, kept by build() for
+                leave-one-out lookups of the training rows
+        """
+        self.rates = np.asarray(rates, dtype=np.float32)
+        self.counts = np.asarray(counts, dtype=np.int32)
+        self.cell_degrees = float(cell_degrees)
+        self.prior = float(prior)
+        self.frauds = frauds
+        self.strength = float(strength)
+
+    @classmethod
+    def build(cls, latitudes, longitudes, labels, cell_degrees=2.0, radius=1, strength=20.0):
+        """Index from training coordinates and fraud labels"""
+        n_lat = int(np.ceil(180.0 / cell_degrees))
+        n_lon = int(np.ceil(360.0 / cell_degrees))
+        labels = np.asarray(labels, dtype=np.float64)
+        prior = float(labels.mean()) if len(labels) else 0.0
+
+        index = cls(np.zeros((n_lat, n_lon)), np.zeros((n_lat, n_lon)), cell_degrees, prior, strength=strength)
+        cells, valid = index.cells(latitudes, longitudes)
+        counts = np.bincount(cells[valid], minlength=n_lat * n_lon).reshape(n_lat, n_lon)
+        frauds = np.bincount(cells[valid], weights=labels[valid], minlength=n_lat * n_lon).reshape(n_lat, n_lon)
+
+        counts = _neighbourhood_sum(counts.astype(np.float64), radius)
+        frauds = _neighbourhood_sum(frauds, radius)
+        index.rates = ((frauds + strength * prior) / (counts + strength)).astype(np.float32)
+        index.counts = counts.astype(np.int32)
+        index.frauds = frauds.astype(np.float32)
+        return index
+
+    def cells(self, latitudes, longitudes):
+        """Flat cell number of each point and a mask of valid coordinates"""
+        lat = np.asarray(latitudes, dtype=np.float64)
+        lon = np.asarray(longitudes, dtype=np.float64)
+        n_lat, n_lon = self.rates.shape
+        valid = np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90)
+        row = np.clip(((np.nan_to_num(lat) + 90.0) // self.cell_degrees).astype(np.int64), 0, n_lat - 1)
+        col = (((np.nan_to_num(lon) + 180.0) // self.cell_degrees).astype(np.int64)) % n_lon
+        return row * n_lon + col, valid
+
+    def lookup(self, latitudes, longitudes):
+        """(smoothed fraud rate, neighbourhood count) arrays for the points"""
+        cells, valid = self.cells(np.atleast_1d(latitudes), np.atleast_1d(longitudes))
+        rates = np.where(valid, self.rates.ravel()[cells], self.prior)
+        counts = np.where(valid, self.counts.ravel()[cells], 0)
+        return rates, counts
+
+    def lookup_training(self, latitudes, longitudes, labels):
+        """
+        Leave-one-out lookup for the rows the index was built from
+
+        Each row's own transaction is taken out of its neighbourhood, so a
+        model trained on these features cannot learn a row's label from the
+        rate it contributed to.
+        """
+        if self.frauds is None:
+            raise ValueError("Leave-one-out lookups need an index from build()")
+        cells, valid = self.cells(latitudes, longitudes)
+        labels = np.asarray(labels, dtype=np.float64)
+        counts = self.counts.ravel()[cells] - 1.0
+        frauds = self.frauds.ravel()[cells] - labels
+        rates = (frauds + self.strength * self.prior) / (counts + self.strength)
+        return np.where(valid, rates, self.prior), np.where(valid, counts, 0)
+
+    def __getstate__(self):
+        # The serving lookup table only; fraud counts are a training aid
+        state = dict(self.__dict__)
+        state['frauds'] = None
+        return state
@@ -14,11 +14,20 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from feature_engineering import FeatureEngineer
+from cascade import DEFAULT_TARGET_RECALL, train_stage1, cascade_report, print_cascade_report
+from geo_index import GeoRiskIndex
 
 
-def train_model():
+def train_model(target_recall=DEFAULT_TARGET_RECALL, geo_index=False):
     """
     Train fraud detection model
+    
+    Also trains the cascade's stage-one model. Its threshold is calibrated
+    on a calibration set split off the training data to keep target_recall
+    of the fraud cases for the forest; the validation set only reports it.
+    With geo_index, a geospatial risk index built from the training split
+    only adds location fraud-rate features; the calibration and validation
+    splits are transformed with it like serving traffic.
     """
     print("=" * 60)
     print("🧠 FRAUD DETECTION MODEL TRAINING")
@@ -39,23 +48,36 @@ def train_model():
     print(f"   Total transactions: {len(df)}")
     print(f"   Fraud cases: {df['is_fraud'].sum()} ({df['is_fraud'].mean()*100:.2f}%)")
     
+    # Split data first, so nothing fitted below sees the validation labels
+    print("\n2️⃣ Splitting data...")
+    df_train, df_val = train_test_split(
+        df, test_size=0.2, random_state=42, stratify=df['is_fraud']
+    )
+    # Held out from both models so the cascade threshold is not fitted to
+    # the rows it is reported on
+    df_train, df_cal = train_test_split(
+        df_train, test_size=0.2, random_state=42, stratify=df_train['is_fraud']
+    )
+    print(f"   Training set: {len(df_train)}")
+    print(f"   Calibration set: {len(df_cal)}")
+    print(f"   Validation set: {len(df_val)}")
+    
     # Feature engineering
-    print("\n2️⃣ Engineering features...")
-    fe = FeatureEngineer()
-    X, y = fe.fit_transform(df)
+    print("\n3️⃣ Engineering features...")
+    index = None
+    if geo_index:
+        # Training rows see leave-one-out rates (see FeatureEngineer.fit_transform)
+        index = GeoRiskIndex.build(df_train['latitude'], df_train['longitude'], df_train['is_fraud'])
+        print(f"   ✓ Geo risk index ({index.rates.shape[0]} x {index.rates.shape[1]} cells)")
+    fe = FeatureEngineer(geo_index=index)
+    X_train, y_train = fe.fit_transform(df_train)
+    X_cal, y_cal = fe.transform(df_cal), df_cal['is_fraud'].values
+    X_val, y_val = fe.transform(df_val), df_val['is_fraud'].values
     
     # Save feature engineer
     fe_path = os.path.join(os.path.dirname(__file__), 'feature_engineer.pkl')
     fe.save(fe_path)
     
-    # Split data
-    print("\n3️⃣ Splitting data...")
-    X_train, X_val, y_train, y_val = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
-    print(f"   Training set: {len(X_train)}")
-    print(f"   Validation set: {len(X_val)}")
-    
     # Handle class imbalance with SMOTE
     print("\n4️⃣ Handling class imbalance (SMOTE)...")
     smote = SMOTE(random_state=42)
@@ -91,6 +113,14 @@ def train_model():
     print(classification_report(y_val, y_val_pred, target_names=['Normal', 'Fraud']))
     print(f"   ROC-AUC Score: {roc_auc_score(y_val, y_val_proba):.4f}")
     
+    # Cascade stage one
+    print(f"\n8️⃣ Training cascade stage one (target recall {target_recall})...")
+    stage1 = train_stage1(X_train_balanced, y_train_balanced, X_cal, y_cal, target_recall)
+    stage1_path = os.path.join(os.path.dirname(__file__), 'cascade_stage1.pkl')
+    joblib.dump(stage1, stage1_path)
+    print(f"   ✓ Stage one saved to {stage1_path}")
+    print_cascade_report(cascade_report(stage1, model, X_val, y_val))
+    
     print("\n" + "=" * 60)
     print("✅ TRAINING COMPLETE")
     print("=" * 60)
@@ -99,5 +129,14 @@ def train_model():
 
 
 if __name__ == "__main__":
-    success = train_model()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Train the fraud model')
+    parser.add_argument('--target-recall', type=float, default=DEFAULT_TARGET_RECALL,
+                        help='Share of fraud cases cascade stage one must escalate')
+    parser.add_argument('--geo-index', action='store_true',
+                        help='Add geospatial fraud-rate features from a grid index')
+    args = parser.parse_args()
+    
+    success = train_model(args.target_recall, args.geo_index)
     sys.exit(0 if success else 1)
\ No newline at end of file
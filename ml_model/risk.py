@@ -0,0 +1,28 @@
+"""
+Risk level thresholds shared by the scoring services
+"""
+from bisect import bisect_right
+
+import numpy as np
+
+# Probability above which a transaction is flagged as fraud
+FRAUD_THRESHOLD = 0.5
+
+# LOW < 0.3 <= MEDIUM < 0.7 <= HIGH
+RISK_THRESHOLDS = (0.3, 0.7)
+RISK_LABELS = ('LOW', 'MEDIUM', 'HIGH')
+
+_thresholds = np.array(RISK_THRESHOLDS)
+_labels = np.array(RISK_LABELS)
+
+
+def risk_levels(probabilities):
+    """
+    Vectorized risk labels for an array of fraud probabilities
+    """
+    return _labels[np.searchsorted(_thresholds, np.asarray(probabilities), side='right')]
+
+
+def risk_level(probability):
+    """Risk label for a single fraud probability"""
+    return RISK_LABELS[bisect_right(RISK_THRESHOLDS, probability)]
@@ -0,0 +1,148 @@
+"""
+Declarative pre-filter rules evaluated before the ML model
+
+Rules live in a JSON file (rules.json next to this module by default):
+
+    {"rules": [
+        {"name": "tiny_in_store_daytime", "fraud_probability": 0.0,
+         "when": [["transaction_type", "==", "in-store"],
+                  ["amount", "<", 25],
+                  ["is_night", "==", 0]]}
+    ]}
+
+Each rule is a conjunction of [field, op, value] conditions and compiles to
+a function returning a boolean NumPy mask over a whole DataFrame, so a
+batch is matched with a handful of vectorized comparisons. Rules are
+checked in file order and the first match decides; rows no rule matches go
+to the model.
+
+The pre-filter is opt-in (RULES_ENABLED=true): a rule overrides the model
+for every row it matches, so enabling it changes scores.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules.json')
+
+OPS = {
+    '==': np.equal,
+    '!=': np.not_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    'in': lambda column, values: np.isin(column, values),
+    'not_in': lambda column, values: ~np.isin(column, values),
+}
+
+
+def _compile_condition(condition):
+    try:
+        field, op, value = condition
+    except (TypeError, ValueError):
+        raise ValueError(f"Condition must be [field, op, value]: {condition!r}")
+    if op not in OPS:
+        raise ValueError(f"Unknown operator '{op}' (choose from {', '.join(OPS)})")
+    if op in ('in', 'not_in') and not isinstance(value, list):
+        raise ValueError(f"'{op}' needs a list value: {condition!r}")
+    compare = OPS[op]
+
+    def mask(df):
+        column = df[field].to_numpy()
+        if isinstance(value, str) or (isinstance(value, list) and any(isinstance(v, str) for v in value)):
+            column = column.astype(str)
+        return np.asarray(compare(column, value), dtype=bool)
+
+    return field, mask
+
+
+class Rule:
+    def __init__(self, name, fraud_probability, when):
+        if not when:
+            raise ValueError(f"Rule '{name}' has no conditions")
+        if not 0.0 <= float(fraud_probability) <= 1.0:
+            raise ValueError(f"Rule '{name}': fraud_probability must be in [0, 1]")
+        self.name = name
+        self.fraud_probability = float(fraud_probability)
+        self.when = when
+        compiled = [_compile_condition(c) for c in when]
+        self.fields = {field for field, _ in compiled}
+        self._masks = [mask for _, mask in compiled]
+
+    def mask(self, df):
+        result = self._masks[0](df)
+        for mask in self._masks[1:]:
+            result &= mask(df)
+        return result
+
+
+class RuleEngine:
+    def __init__(self, rules):
+        """
+        Args:
+            rules: list of {'name', 'fraud_probability', 'when'} dicts
+        """
+        self.rules = [Rule(r['name'], r['fraud_probability'], r['when']) for r in rules]
+        self.probabilities = np.array([r.fraud_probability for r in self.rules], dtype=float)
+        self.names = np.array([r.name for r in self.rules] + [None], dtype=object)
+        self._lock = threading.Lock()
+        self._evaluated = 0
+        self._matched = np.zeros(len(self.rules), dtype=np.int64)
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_RULES_PATH):
+        with open(path, 'r') as f:
+            return cls(json.load(f)['rules'])
+
+    def __len__(self):
+        return len(self.rules)
+
+    def evaluate(self, df):
+        """
+        Index of the first matching rule for every row, -1 where none matches
+        """
+        decided = np.full(len(df), -1, dtype=np.int64)
+        if len(df) == 0:
+            return decided
+        for i, rule in enumerate(self.rules):
+            if not rule.fields.issubset(df.columns):
+                continue
+            open_rows = decided == -1
+            if not open_rows.any():
+                break
+            decided[open_rows & rule.mask(df)] = i
+
+        counts = np.bincount(decided[decided >= 0], minlength=len(self.rules))
+        with self._lock:
+            self._evaluated += len(df)
+            self._matched += counts
+        return decided
+
+    def stats(self):
+        """Rows evaluated, rows decided by a rule and the short-circuit ratio"""
+        with self._lock:
+            evaluated = self._evaluated
+            matched = self._matched.copy()
+        total = int(matched.sum())
+        return {
+            'evaluated': evaluated,
+            'short_circuited': total,
+            'short_circuit_ratio': round(total / evaluated, 4) if evaluated else 0.0,
+            'by_rule': {rule.name: int(n) for rule, n in zip(self.rules, matched)},
+        }
+
+
+def load_rules(path=None):
+    """
+    RuleEngine from RULES_PATH (default rules.json), or None unless
+    RULES_ENABLED=true and the file exists
+    """
+    if os.getenv('RULES_ENABLED', 'false').lower() not in ('1', 'true', 'yes'):
+        return None
+    path = path or os.getenv('RULES_PATH', DEFAULT_RULES_PATH)
+    if not os.path.exists(path):
+        return None
+    return RuleEngine.from_file(path)
@@ -1,9 +1,19 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+"""
+ML scoring service
+
+Importing this module is cheap: Flask, pandas, sklearn and the model are
+only pulled in by create_app() (or on the first predict_fraud() call).
+create_app() loads the model, then runs a few synthetic batches through
+it before the service reports ready:
+
+    /livez   process is up (liveness)
+    /readyz  model loaded and warmed up (readiness)
+    /health  backwards compatible model-loaded check
+"""
+from contextlib import contextmanager
 import logging
-import joblib
-import pandas as pd
-import numpy as np
+import threading
+import time
 import os
 import sys
 
@@ -14,13 +24,6 @@ ml_model_dir = os.path.join(parent_dir, 'ml_model')
 sys.path.insert(0, ml_model_dir)  # Add ml_model directory to path
 sys.path.insert(0, parent_dir)
 
-# Now import the feature engineering module
-import feature_engineering
-
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)
-
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,159 +31,474 @@ logger = logging.getLogger(__name__)
 # Global variables for model and feature engineer
 model = None
 feature_engineer = None
+# Pre-filter rules deciding obvious cases before the model (None = off)
+rules = None
+# Set when the model is wrapped in a two-stage Cascade (CASCADE_ENABLED)
+cascade = None
+models_loaded = False
+warmed_up = False
+load_error = None
+# time.monotonic() of the last failed load; ensure_models() waits
+# MODEL_LOAD_RETRY_SECONDS before trying again
+load_failed_at = None
+
+# Seconds spent in each startup stage (imports, model_load, warm_up, ...)
+startup_timings = {}
+started_at = time.time()
+
+# Per-minute/per-hour counts of everything scored by this process
+trend = None
+
+# Optional challenger scoring a sample of traffic off the request path
+shadow = None
+
+_load_lock = threading.Lock()
+
+WARMUP_BATCHES = int(os.getenv('ML_WARMUP_BATCHES', 3))
+WARMUP_BATCH_SIZE = int(os.getenv('ML_WARMUP_BATCH_SIZE', 64))
+MODEL_LOAD_RETRY_SECONDS = float(os.getenv('ML_MODEL_LOAD_RETRY_SECONDS', 30))
+
+@contextmanager
+def _timed(stage):
+    """Add the elapsed time of a block to startup_timings[stage]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[stage] = round(startup_timings.get(stage, 0) + time.perf_counter() - start, 4)
 
 def load_models():
-    """Load ML model and feature engineer"""
-    global model, feature_engineer
-    
+    """Load ML model, feature engineer and pre-filter rules"""
+    global model, feature_engineer, rules, cascade, models_loaded, load_error, load_failed_at
+
     try:
         model_path = os.path.join(parent_dir, 'ml_model', 'fraud_model.pkl')
         fe_path = os.path.join(parent_dir, 'ml_model', 'feature_engineer.pkl')
-        
+
         logger.info(f"Loading model from: {model_path}")
         logger.info(f"Loading feature engineer from: {fe_path}")
-        
+
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Model file not found: {model_path}")
         if not os.path.exists(fe_path):
             raise FileNotFoundError(f"Feature engineer file not found: {fe_path}")
-        
+
+        with _timed('model_imports'):
+            import joblib
+            # Unpickling the feature engineer needs its module importable
+            import feature_engineering  # noqa: F401
+
         # Load model
-        model = joblib.load(model_path)
-        
+        with _timed('model_load'):
+            model = joblib.load(model_path)
+
         # Load feature engineer
-        feature_engineer = joblib.load(fe_path)
-        
+        with _timed('feature_engineer_load'):
+            feature_engineer = joblib.load(fe_path)
+
+        # A cheap stage-one model clears most rows before the forest
+        stage1_path = os.getenv('CASCADE_STAGE1_PATH', os.path.join(parent_dir, 'ml_model', 'cascade_stage1.pkl'))
+        if os.getenv('CASCADE_ENABLED', 'false').lower() in ('1', 'true', 'yes') and os.path.exists(stage1_path):
+            with _timed('cascade_load'):
+                from cascade import Cascade
+                cascade = Cascade(joblib.load(stage1_path), model)
+                model = cascade
+            logger.info(f"✓ Cascade enabled (clear threshold {cascade.clear_threshold:.4f})")
+
+        with _timed('rules_load'):
+            from rules import load_rules
+            rules = load_rules()
+        if rules is not None:
+            logger.info(f"✓ {len(rules)} pre-filter rules loaded")
+
+        models_loaded = True
+        load_error = None
+        load_failed_at = None
         logger.info("✓ Models loaded successfully")
         return True
     except Exception as e:
+        load_error = str(e)
+        load_failed_at = time.monotonic()
         logger.error(f"Failed to load models: {e}")
         import traceback
         logger.error(traceback.format_exc())
         return False
 
+def _load_retry_due():
+    return load_failed_at is None or time.monotonic() - load_failed_at >= MODEL_LOAD_RETRY_SECONDS
+
+def ensure_models(wait=True):
+    """
+    Load the models once, on first use
+
+    After a failed load, calls within ML_MODEL_LOAD_RETRY_SECONDS return
+    False straight away (load_error keeps the reason) instead of retrying
+    and logging the traceback on every request. With wait=False a call
+    that finds another thread loading returns False instead of waiting.
+    """
+    if not models_loaded and _load_retry_due():
+        if not _load_lock.acquire(blocking=wait):
+            return models_loaded
+        try:
+            if not models_loaded and _load_retry_due():
+                load_models()
+        finally:
+            _load_lock.release()
+    return models_loaded
+
+def synthetic_transactions(n, seed=0):
+    """Plausible random transactions for warming up the model"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    encoder = feature_engineer.label_encoders.get('transaction_type') if feature_engineer else None
+    types = list(encoder.classes_) if encoder is not None else ['online']
+    amounts = rng.lognormal(4, 1.2, n)
+    hours = rng.integers(0, 24, n)
+    days = rng.integers(0, 7, n)
+    return [{
+        'transaction_id': f'WARMUP{i}',
+        'amount': float(amounts[i]),
+        'amount_log': float(np.log1p(amounts[i])),
+        'latitude': float(rng.uniform(25, 48)),
+        'longitude': float(rng.uniform(-122, -71)),
+        'hour': int(hours[i]),
+        'day_of_week': int(days[i]),
+        'is_weekend': int(days[i] >= 5),
+        'is_night': int(hours[i] < 6 or hours[i] >= 22),
+        'transaction_type': types[i % len(types)]
+    } for i in range(n)]
+
+def warm_up(batches=WARMUP_BATCHES, batch_size=WARMUP_BATCH_SIZE):
+    """
+    Run synthetic batches and single predictions through the model so the
+    first real requests do not pay for lazy initialisation
+    """
+    global warmed_up
+
+    if not models_loaded:
+        return False
+
+    import pandas as pd
+
+    with _timed('warm_up'):
+        for i in range(batches):
+            transactions = synthetic_transactions(batch_size, seed=i)
+            model.predict_proba(feature_engineer.transform(pd.DataFrame(transactions)))
+            predict_fraud(transactions[0])
+
+    warmed_up = True
+    logger.info(f"✓ Warm-up done ({batches} x {batch_size} synthetic transactions)")
+    return True
+
+REQUIRED_COLUMNS = [
+    'amount', 'amount_log', 'latitude', 'longitude',
+    'hour', 'day_of_week', 'is_weekend', 'is_night',
+    'transaction_type'
+]
+
 def preprocess_transaction(transaction):
     """Preprocess incoming transaction"""
+    import pandas as pd
+
     df = pd.DataFrame([transaction])
-    
-    required_cols = [
-        'amount', 'amount_log', 'latitude', 'longitude',
-        'hour', 'day_of_week', 'is_weekend', 'is_night',
-        'transaction_type'
-    ]
-    
-    for col in required_cols:
+
+    for col in REQUIRED_COLUMNS:
         if col not in df.columns:
             raise ValueError(f"Missing required column: {col}")
-    
+
     return df
 
 def predict_fraud(transaction):
     """Predict fraud for a transaction"""
+    from risk import FRAUD_THRESHOLD, risk_level
+
+    if not ensure_models():
+        raise Exception(f"Model not loaded: {load_error}")
+
     try:
         # Preprocess
         df = preprocess_transaction(transaction)
-        
-        # Transform features
-        X = feature_engineer.transform(df)
-        
-        # Predict
-        fraud_probability = model.predict_proba(X)[0][1]
-        is_fraud = int(fraud_probability > 0.5)
-        
-        # Risk level
-        if fraud_probability < 0.3:
-            risk_level = "LOW"
-        elif fraud_probability < 0.7:
-            risk_level = "MEDIUM"
+
+        # Obvious cases are decided by a rule without touching the model
+        decision_rule = None
+        decided = rules.evaluate(df)[0] if rules is not None else -1
+        if decided >= 0:
+            fraud_probability = rules.probabilities[decided]
+            decision_rule = rules.names[decided]
         else:
-            risk_level = "HIGH"
-        
+            # Transform features
+            X = feature_engineer.transform(df)
+
+            # Predict
+            fraud_probability = model.predict_proba(X)[0][1]
+        is_fraud = int(fraud_probability > FRAUD_THRESHOLD)
+
         return {
             'transaction_id': transaction.get('transaction_id', 'UNKNOWN'),
             'fraud_probability': float(fraud_probability),
             'is_fraud': bool(is_fraud),
-            'risk_level': risk_level
+            'risk_level': risk_level(fraud_probability),
+            'decision_rule': decision_rule
         }
-    
+
     except Exception as e:
         raise Exception(f"Prediction error: {str(e)}")
 
-# Load models on startup
-models_loaded = load_models()
+def predict_batch(transactions):
+    """
+    Predict fraud for a list of transactions
+
+    Rules are evaluated over the whole batch at once and only the rows no
+    rule decides are transformed and scored, in a single model call.
+    """
+    import numpy as np
+    import pandas as pd
+    from risk import FRAUD_THRESHOLD, risk_levels
+
+    if not ensure_models():
+        raise Exception(f"Model not loaded: {load_error}")
+    if not transactions:
+        return []
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    if models_loaded and model is not None:
-        return jsonify({
-            'status': 'healthy',
-            'service': 'ml-scoring-service',
-            'model_loaded': True
-        }), 200
-    else:
-        return jsonify({
-            'status': 'unhealthy',
-            'service': 'ml-scoring-service',
-            'model_loaded': False,
-            'error': 'Models failed to load'
-        }), 503
-
-@app.route('/predict', methods=['POST'])
-def predict():
-    """Predict fraud for a transaction"""
-    if not models_loaded:
-        return jsonify({'error': 'Model not loaded'}), 503
-    
     try:
-        transaction = request.get_json()
-        
-        if not transaction:
-            return jsonify({'error': 'No transaction data provided'}), 400
-        
-        result = predict_fraud(transaction)
-        
-        logger.info(f"Prediction: {result['transaction_id']} - "
-                   f"Fraud Probability: {result['fraud_probability']:.4f}")
-        
-        return jsonify(result), 200
-    
+        df = pd.DataFrame(transactions)
+        for col in REQUIRED_COLUMNS:
+            if col not in df.columns or df[col].isnull().any():
+                raise ValueError(f"Missing required column: {col}")
+
+        probabilities = np.zeros(len(df))
+        if rules is not None:
+            decided = rules.evaluate(df)
+            by_rule = decided >= 0
+            probabilities[by_rule] = rules.probabilities[decided[by_rule]]
+            # names[-1] is None, so undecided rows get no rule name
+            decision_rules = rules.names[decided]
+        else:
+            by_rule = np.zeros(len(df), dtype=bool)
+            decision_rules = [None] * len(df)
+
+        if not by_rule.all():
+            X = feature_engineer.transform(df[~by_rule])
+            probabilities[~by_rule] = model.predict_proba(X)[:, 1]
+
+        levels = risk_levels(probabilities)
+        return [{
+            'transaction_id': txn.get('transaction_id', 'UNKNOWN'),
+            'fraud_probability': float(probabilities[i]),
+            'is_fraud': bool(probabilities[i] > FRAUD_THRESHOLD),
+            'risk_level': str(levels[i]),
+            'decision_rule': decision_rules[i]
+        } for i, txn in enumerate(transactions)]
+
     except Exception as e:
-        logger.error(f"Prediction error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        raise Exception(f"Prediction error: {str(e)}")
 
-@app.route('/batch-predict', methods=['POST'])
-def batch_predict():
-    """Predict fraud for multiple transactions"""
-    if not models_loaded:
-        return jsonify({'error': 'Model not loaded'}), 503
-    
+def load_shadow():
+    """Start the challenger if SHADOW_MODEL_PATH is set"""
+    global shadow
+
+    if shadow is not None or not models_loaded:
+        return
     try:
-        transactions = request.get_json()
-        
-        if not isinstance(transactions, list):
-            return jsonify({'error': 'Expected list of transactions'}), 400
-        
-        results = []
-        for txn in transactions:
-            result = predict_fraud(txn)
-            results.append(result)
-        
-        return jsonify(results), 200
-    
+        from ml_service.shadow import load_shadow_scorer
+        with _timed('shadow_load'):
+            shadow = load_shadow_scorer(feature_engineer)
+        if shadow is not None:
+            logger.info(f"✓ Shadow model loaded (sample rate {shadow.sample_rate})")
     except Exception as e:
-        logger.error(f"Batch prediction error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        logger.error(f"Failed to load shadow model: {e}")
+
+def startup(warm=True):
+    """Load the models and warm them up, recording the time of each stage"""
+    with _timed('total'):
+        ensure_models()
+        load_shadow()
+        if warm:
+            warm_up()
+    logger.info(f"Startup timings (s): {startup_timings}")
+
+def create_app(load=True, warm=True, background=False):
+    """
+    Build the Flask app
+
+    Args:
+        load: load the models now (else the first /predict or
+            /batch-predict request loads them)
+        warm: run warm-up batches after loading
+        background: load and warm up in a thread, so /livez answers at once
+            and /readyz turns 200 when the model is ready
+    """
+    global trend
+
+    with _timed('imports'):
+        from flask import Flask, request, jsonify
+        from flask_cors import CORS
+        from ml_service.trend import TrendRollup, parse_time
+        from profiling import register_profiling
+
+    # Initialize Flask app
+    app = Flask(__name__)
+    CORS(app)
+
+    if trend is None:
+        trend = TrendRollup(
+            minutes=int(os.getenv('TREND_MINUTES', 1440)),
+            hours=int(os.getenv('TREND_HOURS', 720))
+        )
+
+    @app.route('/livez', methods=['GET'])
+    def livez():
+        """Liveness: the process is up and serving requests"""
+        return jsonify({'status': 'alive', 'uptime_seconds': round(time.time() - started_at, 1)}), 200
+
+    @app.route('/readyz', methods=['GET'])
+    def readyz():
+        """Readiness: model loaded and warmed up"""
+        ready = models_loaded and (warmed_up or not warm)
+        body = {
+            'status': 'ready' if ready else 'not ready',
+            'model_loaded': models_loaded,
+            'warmed_up': warmed_up,
+            'startup_timings': startup_timings
+        }
+        if load_error:
+            body['error'] = load_error
+        return jsonify(body), 200 if ready else 503
+
+    @app.route('/health', methods=['GET'])
+    def health_check():
+        """Health check endpoint"""
+        if models_loaded and model is not None:
+            return jsonify({
+                'status': 'healthy',
+                'service': 'ml-scoring-service',
+                'model_loaded': True,
+                'warmed_up': warmed_up
+            }), 200
+        else:
+            return jsonify({
+                'status': 'unhealthy',
+                'service': 'ml-scoring-service',
+                'model_loaded': False,
+                'error': 'Models failed to load'
+            }), 503
+
+    @app.route('/predict', methods=['POST'])
+    def predict():
+        """Predict fraud for a transaction"""
+        # Loads on first use; 503 while a background load is running
+        if not ensure_models(wait=False):
+            return jsonify({'error': f'Model not loaded: {load_error or "loading"}'}), 503
+
+        try:
+            transaction = request.get_json()
+
+            if not transaction:
+                return jsonify({'error': 'No transaction data provided'}), 400
+
+            start = time.perf_counter()
+            result = predict_fraud(transaction)
+            if shadow is not None:
+                shadow.submit([transaction], [result], time.perf_counter() - start)
+            trend.record([result])
+
+            logger.info(f"Prediction: {result['transaction_id']} - "
+                       f"Fraud Probability: {result['fraud_probability']:.4f}")
+
+            return jsonify(result), 200
+
+        except Exception as e:
+            logger.error(f"Prediction error: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/batch-predict', methods=['POST'])
+    def batch_predict():
+        """Predict fraud for multiple transactions"""
+        if not ensure_models(wait=False):
+            return jsonify({'error': f'Model not loaded: {load_error or "loading"}'}), 503
+
+        try:
+            transactions = request.get_json()
+
+            if not isinstance(transactions, list):
+                return jsonify({'error': 'Expected list of transactions'}), 400
+
+            start = time.perf_counter()
+            results = predict_batch(transactions)
+            if shadow is not None:
+                shadow.submit(transactions, results, time.perf_counter() - start)
+            trend.record(results)
+
+            return jsonify(results), 200
+
+        except Exception as e:
+            logger.error(f"Batch prediction error: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/rules', methods=['GET'])
+    def get_rules():
+        """Pre-filter rules and how many transactions they decided"""
+        if rules is None:
+            return jsonify({'enabled': False}), 200
+        return jsonify({
+            'enabled': True,
+            'rules': [{'name': r.name, 'fraud_probability': r.fraud_probability, 'when': r.when}
+                      for r in rules.rules],
+            'stats': rules.stats()
+        }), 200
+
+    @app.route('/cascade', methods=['GET'])
+    def get_cascade():
+        """Escalation rate of the two-stage cascade"""
+        if cascade is None:
+            return jsonify({'enabled': False}), 200
+        return jsonify(dict(cascade.stats(), enabled=True)), 200
+
+    @app.route('/shadow/report', methods=['GET'])
+    def shadow_report():
+        """Champion/challenger agreement and latency"""
+        if shadow is None:
+            return jsonify({'error': 'No shadow model configured (set SHADOW_MODEL_PATH)'}), 404
+        return jsonify(shadow.report()), 200
+
+    @app.route('/trend', methods=['GET'])
+    def get_trend():
+        """
+        Scored/fraud/risk-level counts per minute or hour, as columnar JSON
+
+        Query params: granularity (minute | hour), since/until (epoch seconds
+        or ISO timestamps), or buckets (the last N buckets, default 60)
+        """
+        try:
+            data = trend.query(
+                granularity=request.args.get('granularity', 'minute'),
+                since=parse_time(request.args.get('since')),
+                until=parse_time(request.args.get('until')),
+                buckets=request.args.get('buckets', 60, type=int)
+            )
+            return jsonify(data), 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    # Opt-in /admin/profile (PROFILING_ENABLED)
+    register_profiling(app)
+
+    if load and background:
+        threading.Thread(target=startup, kwargs={'warm': warm}, daemon=True, name='model-startup').start()
+    elif load:
+        startup(warm)
+
+    return app
 
 if __name__ == '__main__':
     print("=" * 60)
     print("🤖 ML SCORING SERVICE")
     print("=" * 60)
-    if models_loaded:
-        print("✓ ML Model loaded successfully")
-    else:
-        print("❌ Failed to load ML model")
-        print("   Check logs above for details")
+    app = create_app(background=True)
+    print(f"✓ Imports took {startup_timings.get('imports', 0):.2f}s; "
+          "loading and warming up the model in the background")
+    print("   /livez answers now, /readyz once the model is warm")
     print("✓ Service listening on container port 5000 (mapped to host 5002)")
     print("=" * 60)
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=False)
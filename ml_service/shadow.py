@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Shadow (champion/challenger) scoring
+
+A challenger model scores a sampled copy of live traffic in a background
+thread. The request path only does a non-blocking put on a bounded queue
+(and drops the sample when the queue is full), so responses never wait
+for the challenger. Every score pair is appended to a JSON-lines log:
+
+    {"ts": ..., "transaction_id": "TXN1", "champion": 0.91, "challenger": 0.87,
+     "champion_fraud": true, "challenger_fraud": true,
+     "champion_ms": 14.2, "challenger_ms": 3.1}
+
+champion_ms is the champion's whole request time divided by its
+transactions, so it includes parsing, rule short-circuits and the cascade;
+challenger_ms is the challenger's model time alone. Compare them as a
+rough guide, not as a like-for-like benchmark.
+
+Report from a log file:
+
+    python ml_service/shadow.py --log shadow_scores.jsonl
+"""
+from collections import deque
+import argparse
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, os.path.join(parent_dir, 'ml_model'))
+
+from risk import FRAUD_THRESHOLD
+
+LATENCY_WINDOW = 10000
+
+CHAMPION_LATENCY_NOTE = ('champion_ms is the per-item average of the whole request, including rule '
+                         'short-circuits; challenger_ms is model time only, so they are not directly comparable')
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(int(p / 100.0 * len(values)), len(values) - 1)], 3)
+
+
+def summarize_pairs(pairs):
+    """Agreement and latency report for an iterable of score pair records"""
+    total = agree = 0
+    abs_diff = 0.0
+    champion_ms, challenger_ms = [], []
+    for pair in pairs:
+        total += 1
+        agree += pair['champion_fraud'] == pair['challenger_fraud']
+        abs_diff += abs(pair['champion'] - pair['challenger'])
+        champion_ms.append(pair['champion_ms'])
+        challenger_ms.append(pair['challenger_ms'])
+    return {
+        'pairs': total,
+        'agreement_rate': round(agree / total, 4) if total else None,
+        'mean_abs_probability_diff': round(abs_diff / total, 4) if total else None,
+        'champion_latency_ms': {'p50': _percentile(champion_ms, 50), 'p99': _percentile(champion_ms, 99)},
+        'challenger_latency_ms': {'p50': _percentile(challenger_ms, 50), 'p99': _percentile(challenger_ms, 99)},
+        'latency_note': CHAMPION_LATENCY_NOTE,
+    }
+
+
+def read_log(path):
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ShadowScorer:
+    def __init__(self, model, feature_engineer, log_path='shadow_scores.jsonl',
+                 sample_rate=0.1, max_queue=1000):
+        """
+        Args:
+            model, feature_engineer: the challenger
+            sample_rate: fraction of scored transactions copied to the challenger
+            max_queue: pending requests; samples beyond it are dropped
+        """
+        self.model = model
+        self.feature_engineer = feature_engineer
+        self.log_path = log_path
+        self.sample_rate = sample_rate
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=LATENCY_WINDOW)
+        self._counts = {'sampled': 0, 'dropped': 0, 'scored': 0, 'errors': 0}
+
+        log_dir = os.path.dirname(os.path.abspath(log_path))
+        os.makedirs(log_dir, exist_ok=True)
+        self._log = open(log_path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, daemon=True, name='shadow-scorer')
+        self._thread.start()
+
+    def submit(self, transactions, results, champion_seconds):
+        """
+        Offer scored transactions to the challenger (never blocks)
+
+        Args:
+            transactions: the request's transactions
+            results: the champion's predictions, in the same order
+            champion_seconds: champion time for the whole request
+        """
+        if self.sample_rate <= 0 or not transactions:
+            return
+        per_item_ms = champion_seconds * 1000 / len(transactions)
+        picked = [(txn, res) for txn, res in zip(transactions, results)
+                  if self.sample_rate >= 1 or random.random() < self.sample_rate]
+        if not picked:
+            return
+        try:
+            self._queue.put_nowait((picked, per_item_ms))
+            with self._lock:
+                self._counts['sampled'] += len(picked)
+        except queue.Full:
+            with self._lock:
+                self._counts['dropped'] += len(picked)
+
+    def _score(self, picked, champion_ms):
+        import pandas as pd
+
+        start = time.perf_counter()
+        X = self.feature_engineer.transform(pd.DataFrame([txn for txn, _ in picked]))
+        probabilities = self.model.predict_proba(X)[:, 1]
+        challenger_ms = (time.perf_counter() - start) * 1000 / len(picked)
+
+        now = time.time()
+        pairs = []
+        for (txn, res), probability in zip(picked, probabilities):
+            pairs.append({
+                'ts': now,
+                'transaction_id': res.get('transaction_id', txn.get('transaction_id', 'UNKNOWN')),
+                'champion': round(float(res['fraud_probability']), 6),
+                'challenger': round(float(probability), 6),
+                'champion_fraud': bool(res['is_fraud']),
+                'challenger_fraud': bool(probability > FRAUD_THRESHOLD),
+                'champion_ms': round(champion_ms, 3),
+                'challenger_ms': round(challenger_ms, 3),
+            })
+        return pairs
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            try:
+                pairs = self._score(*item)
+                self._log.write(''.join(json.dumps(pair, separators=(',', ':')) + '\n' for pair in pairs))
+                self._log.flush()
+                with self._lock:
+                    self._recent.extend(pairs)
+                    self._counts['scored'] += len(pairs)
+            except Exception:
+                with self._lock:
+                    self._counts['errors'] += len(item[0])
+                logger.exception("Shadow scoring error")
+            finally:
+                self._queue.task_done()
+
+    def drain(self):
+        """Wait until every queued sample has been scored"""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(5)
+        self._log.close()
+
+    def report(self):
+        """Counts since start plus agreement and latency over the recent pairs"""
+        with self._lock:
+            recent = list(self._recent)
+            counts = dict(self._counts)
+        report = summarize_pairs(recent)
+        report.update(counts, queue_depth=self._queue.qsize(), sample_rate=self.sample_rate,
+                      log_path=self.log_path)
+        return report
+
+
+def load_shadow_scorer(champion_feature_engineer):
+    """
+    ShadowScorer configured from SHADOW_MODEL_PATH etc., or None when
+    no challenger is configured
+    """
+    model_path = os.getenv('SHADOW_MODEL_PATH')
+    if not model_path:
+        return None
+
+    import joblib
+
+    fe_path = os.getenv('SHADOW_FEATURE_ENGINEER_PATH')
+    return ShadowScorer(
+        joblib.load(model_path),
+        joblib.load(fe_path) if fe_path else champion_feature_engineer,
+        log_path=os.getenv('SHADOW_LOG', 'shadow_scores.jsonl'),
+        sample_rate=float(os.getenv('SHADOW_SAMPLE_RATE', 0.1)),
+        max_queue=int(os.getenv('SHADOW_QUEUE_MAX', 1000))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Champion/challenger report from a shadow score log')
+    parser.add_argument('--log', default=os.getenv('SHADOW_LOG', 'shadow_scores.jsonl'))
+    args = parser.parse_args()
+
+    report = summarize_pairs(read_log(args.log))
+    print("=" * 60)
+    print("🥊 SHADOW SCORING REPORT")
+    print("=" * 60)
+    if not report['pairs']:
+        print("No score pairs logged yet")
+        return
+    print(f"Pairs:            {report['pairs']}")
+    print(f"Agreement rate:   {report['agreement_rate'] * 100:.2f}%")
+    print(f"Mean |Δ prob|:    {report['mean_abs_probability_diff']:.4f}")
+    print(f"Champion ms:      p50={report['champion_latency_ms']['p50']} p99={report['champion_latency_ms']['p99']}")
+    print(f"Challenger ms:    p50={report['challenger_latency_ms']['p50']} p99={report['challenger_latency_ms']['p99']}")
+    print(f"Note: {report['latency_note']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Incrementally maintained fraud trend rollups
+
+Every scored transaction bumps a per-minute and a per-hour bucket; the
+buckets live in fixed-size ring arrays, so recording is O(1) and a trend
+query only slices the requested buckets. Queries return columnar JSON:
+
+    {"granularity": "minute", "start": 1706709600, "step": 60,
+     "scored": [...], "fraud": [...], "low": [...], "medium": [...], "high": [...]}
+
+where element i covers [start + i * step, start + (i + 1) * step).
+
+A rollup counts only what its own process scored and starts empty after a
+restart. Each ML service replica and the Spark job (on its metrics port)
+keep one; the web UI sums them into the fleet-wide /api/trend.
+"""
+from datetime import datetime
+import threading
+import time
+
+import numpy as np
+
+COUNTERS = ('scored', 'fraud', 'low', 'medium', 'high')
+RISK_COLUMNS = {'LOW': 2, 'MEDIUM': 3, 'HIGH': 4}
+MAX_QUERY_BUCKETS = 1440
+
+
+def parse_time(value):
+    """Epoch seconds from an epoch number or an ISO timestamp"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(value)).timestamp()
+
+
+class _Ring:
+    def __init__(self, step, slots):
+        self.step = step
+        self.slots = slots
+        self.counts = np.zeros((slots, len(COUNTERS)), dtype=np.int64)
+        # Bucket number held by each slot; -1 means empty
+        self.buckets = np.full(slots, -1, dtype=np.int64)
+
+    def add(self, bucket, counts):
+        slot = bucket % self.slots
+        if self.buckets[slot] != bucket:
+            self.buckets[slot] = bucket
+            self.counts[slot] = 0
+        self.counts[slot] += counts
+
+    def window(self, first, last):
+        """Counts for buckets first..last; buckets no longer held are zero"""
+        wanted = np.arange(first, last + 1, dtype=np.int64)
+        slots = wanted % self.slots
+        held = self.buckets[slots] == wanted
+        return np.where(held[:, None], self.counts[slots], 0)
+
+
+class TrendRollup:
+    def __init__(self, minutes=1440, hours=720):
+        """
+        Args:
+            minutes: per-minute buckets kept (default one day)
+            hours: per-hour buckets kept (default 30 days)
+        """
+        self._rings = {'minute': _Ring(60, minutes), 'hour': _Ring(3600, hours)}
+        self._lock = threading.Lock()
+
+    def record(self, results, now=None):
+        """Count a list of prediction results ({'is_fraud', 'risk_level'})"""
+        if not results:
+            return
+        risk_levels = {}
+        for result in results:
+            risk_levels[result.get('risk_level')] = risk_levels.get(result.get('risk_level'), 0) + 1
+        self.record_counts(len(results), sum(1 for r in results if r.get('is_fraud')), risk_levels, now)
+
+    def record_counts(self, scored, fraud, risk_levels, now=None):
+        """Count pre-aggregated results: totals plus {risk_level: n}"""
+        if not scored:
+            return
+        counts = np.zeros(len(COUNTERS), dtype=np.int64)
+        counts[0] = scored
+        counts[1] = fraud
+        for risk_level, n in risk_levels.items():
+            column = RISK_COLUMNS.get(risk_level)
+            if column:
+                counts[column] += n
+
+        now = time.time() if now is None else now
+        with self._lock:
+            for ring in self._rings.values():
+                ring.add(int(now // ring.step), counts)
+
+    def query(self, granularity='minute', since=None, until=None, buckets=60, now=None):
+        """
+        Columnar counts for [since, until), or the last `buckets` buckets
+
+        Raises:
+            ValueError: unknown granularity
+        """
+        if granularity not in self._rings:
+            raise ValueError(f"Unknown granularity: {granularity} (choose from {', '.join(self._rings)})")
+        ring = self._rings[granularity]
+        now = time.time() if now is None else now
+
+        last = int((until if until is not None else now) // ring.step)
+        if until is not None and until % ring.step == 0:
+            last -= 1
+        if since is not None:
+            first = int(since // ring.step)
+        else:
+            first = last - max(int(buckets), 1) + 1
+        first = max(first, last - MAX_QUERY_BUCKETS + 1)
+
+        with self._lock:
+            counts = ring.window(first, last) if last >= first else np.zeros((0, len(COUNTERS)), dtype=np.int64)
+
+        result = {'granularity': granularity, 'start': first * ring.step, 'step': ring.step}
+        for i, name in enumerate(COUNTERS):
+            result[name] = counts[:, i].tolist()
+        return result
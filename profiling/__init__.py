@@ -0,0 +1,7 @@
+"""
+On-demand sampling profiler for the Flask services
+"""
+from profiling.sampler import SamplingProfiler, collapse_stack
+from profiling.flask_hook import register_profiling, profiling_enabled
+
+__all__ = ['SamplingProfiler', 'collapse_stack', 'register_profiling', 'profiling_enabled']
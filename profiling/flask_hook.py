@@ -0,0 +1,103 @@
+"""
+Admin profiling endpoint for the Flask services
+
+Registered only when PROFILING_ENABLED is true, so a service that does not
+opt in has neither the route nor the request hooks:
+
+    GET /admin/profile?seconds=10
+        sample every thread for 10 seconds
+    GET /admin/profile?mode=requests&every=10&seconds=30
+        for 30 seconds, sample only the threads handling every 10th request
+
+Both block for the given time and return collapsed stacks as text/plain.
+"""
+import math
+import os
+import threading
+import time
+
+from profiling.sampler import SamplingProfiler
+
+MAX_SECONDS = 300
+
+
+def profiling_enabled():
+    return os.getenv('PROFILING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+
+def _profile_response(profiler):
+    from flask import Response
+
+    stats = profiler.stats()
+    return Response(profiler.collapsed(), mimetype='text/plain', headers={
+        'X-Profile-Samples': str(stats['samples']),
+        'X-Profile-Duration': str(stats['duration_seconds']),
+    })
+
+
+def register_profiling(app, enabled=None):
+    """Add /admin/profile to a Flask app if profiling is enabled"""
+    from flask import request, jsonify
+
+    if not (profiling_enabled() if enabled is None else enabled):
+        return False
+
+    busy = threading.Lock()
+    # While a per-request profile runs: {'profiler', 'every', 'seen'}
+    state = {'requests': None}
+    counter_lock = threading.Lock()
+
+    @app.before_request
+    def _profile_request_start():
+        active = state['requests']
+        if active is None:
+            return
+        profiler, every = active['profiler'], active['every']
+        with counter_lock:
+            active['seen'] += 1
+            pick = active['seen'] % every == 0
+        if pick:
+            request.environ['profiling.tracked'] = True
+            profiler.track(threading.get_ident())
+
+    @app.teardown_request
+    def _profile_request_end(exc=None):
+        active = state['requests']
+        if active is not None and request.environ.pop('profiling.tracked', False):
+            active['profiler'].untrack(threading.get_ident())
+
+    @app.route('/admin/profile', methods=['GET'])
+    def admin_profile():
+        """Sample for `seconds` and return collapsed stacks"""
+        try:
+            seconds = float(request.args.get('seconds', 10))
+            interval = float(request.args.get('interval', 0.005))
+            every = max(int(request.args.get('every', 1)), 1)
+        except ValueError:
+            return jsonify({'error': 'seconds, interval and every must be numbers'}), 400
+        if not (math.isfinite(seconds) and seconds > 0 and math.isfinite(interval)):
+            return jsonify({'error': 'seconds must be positive and interval finite'}), 400
+        seconds = min(seconds, MAX_SECONDS)
+        interval = max(interval, 0.001)
+        mode = request.args.get('mode', 'all')
+        if mode not in ('all', 'requests'):
+            return jsonify({'error': "mode must be 'all' or 'requests'"}), 400
+
+        if not busy.acquire(blocking=False):
+            return jsonify({'error': 'A profile is already running'}), 409
+        try:
+            if mode == 'requests':
+                profiler = SamplingProfiler(interval, threads=())
+                state['requests'] = {'profiler': profiler, 'every': every, 'seen': 0}
+            else:
+                # The thread serving this request only sleeps
+                profiler = SamplingProfiler(interval, exclude={threading.get_ident()})
+            profiler.start()
+            time.sleep(seconds)
+            profiler.stop()
+        finally:
+            state['requests'] = None
+            busy.release()
+        return _profile_response(profiler)
+
+    return True
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Open-loop load generator for the ML and alert services
+
+Unlike simulate_transactions.py (one request at a time), requests are
+fired on an arrival schedule regardless of how fast earlier ones complete,
+over a pooled aiohttp session:
+
+    python scripts/load_generator.py --target predict \\
+        --phase constant:100:30 --phase ramp:100:1000:60 --phase poisson:500:30
+
+Phase specs:
+    constant:RATE:SECONDS        evenly spaced arrivals
+    poisson:RATE:SECONDS         exponential inter-arrival times
+    ramp:START:END:SECONDS       rate grows linearly from START to END
+
+Latency is measured from each request's *scheduled* send time, not from
+when it actually went out, so time spent queued behind a slow server
+(waiting for a pooled connection or the event loop) is counted instead of
+silently omitted (coordinated-omission correction).
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+
+TARGETS = {
+    'predict': ('ML_SERVICE_URL', 'http://localhost:5000', '/predict'),
+    'batch-predict': ('ML_SERVICE_URL', 'http://localhost:5000', '/batch-predict'),
+    'alert': ('ALERT_SERVICE_URL', 'http://localhost:5001', '/alert'),
+}
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def parse_phase(spec):
+    """'ramp:100:1000:60' -> {'kind': 'ramp', 'rate': 100, 'rate_end': 1000, 'duration': 60}"""
+    parts = spec.split(':')
+    kind = parts[0]
+    phase = None
+    try:
+        if kind in ('constant', 'poisson') and len(parts) == 3:
+            phase = {'kind': kind, 'rate': float(parts[1]), 'rate_end': float(parts[1]),
+                     'duration': float(parts[2])}
+        elif kind == 'ramp' and len(parts) == 4:
+            phase = {'kind': kind, 'rate': float(parts[1]), 'rate_end': float(parts[2]),
+                     'duration': float(parts[3])}
+    except ValueError:
+        pass
+    if phase is None:
+        raise argparse.ArgumentTypeError(
+            f"Invalid phase '{spec}' (use constant:RATE:SECONDS, poisson:RATE:SECONDS or ramp:START:END:SECONDS)")
+
+    values = (phase['rate'], phase['rate_end'], phase['duration'])
+    if not all(math.isfinite(v) for v in values) or min(phase['rate'], phase['rate_end']) < 0:
+        raise argparse.ArgumentTypeError(f"Invalid phase '{spec}': rates must be finite and >= 0")
+    if phase['duration'] <= 0:
+        raise argparse.ArgumentTypeError(f"Invalid phase '{spec}': duration must be > 0 seconds")
+    return phase
+
+def arrival_times(phase, rng=None):
+    """
+    Scheduled send offsets (seconds from phase start) for a phase
+    """
+    rng = rng or random.Random()
+    kind, duration = phase['kind'], phase['duration']
+    rate, rate_end = phase['rate'], phase['rate_end']
+    offsets = []
+
+    if kind == 'constant':
+        if rate > 0:
+            offsets = [i / rate for i in range(int(rate * duration))]
+    elif kind == 'poisson':
+        t = rng.expovariate(rate) if rate > 0 else duration
+        while t < duration:
+            offsets.append(t)
+            t += rng.expovariate(rate)
+    elif kind == 'ramp':
+        # The n-th arrival is where the integral of the rate reaches n:
+        # rate * t + slope * t^2 / 2 = n
+        slope = (rate_end - rate) / duration if duration else 0.0
+        total = int(rate * duration + slope * duration ** 2 / 2)
+        for n in range(total):
+            if slope:
+                t = (-rate + math.sqrt(max(rate * rate + 2 * slope * n, 0.0))) / slope
+            else:
+                t = n / rate
+            offsets.append(t)
+    else:
+        raise ValueError(f"Unknown phase kind: {kind}")
+    return offsets
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    # Round off float error first: 99.9% of 1000 must be rank 999, not 1000
+    rank = max(int(math.ceil(round(p * len(sorted_values) / 100.0, 9))), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(name, phase, latencies, errors, elapsed):
+    """Per-phase report: counts, error rate, achieved rate and latency percentiles (ms)"""
+    latencies = sorted(latencies)
+    total = len(latencies)
+    report = {
+        'phase': name,
+        'schedule': phase,
+        'requests': total,
+        'errors': errors,
+        'error_rate': errors / total if total else 0.0,
+        'achieved_rps': total / elapsed if elapsed else 0.0,
+        'latency_ms': {f"p{p:g}": round(percentile(latencies, p) * 1000, 2) if latencies else None
+                       for p in PERCENTILES},
+    }
+    report['latency_ms']['max'] = round(latencies[-1] * 1000, 2) if latencies else None
+    return report
+
+
+def load_transactions(data_file, limit=None):
+    df = pd.read_csv(data_file)
+    if 'is_fraud' in df.columns:
+        df = df.drop(columns=['is_fraud'])
+    if limit:
+        df = df.head(limit)
+    return json.loads(df.to_json(orient='records'))
+
+
+class PayloadFactory:
+    """Request bodies for a target, cycling through the sample transactions"""
+
+    def __init__(self, target, transactions, batch_size=100):
+        self.target = target
+        self.transactions = transactions
+        self.batch_size = batch_size
+        self._i = 0
+
+    def __call__(self):
+        i = self._i
+        self._i += 1
+        n = len(self.transactions)
+        if self.target == 'batch-predict':
+            start = (i * self.batch_size) % n
+            return [self.transactions[(start + j) % n] for j in range(self.batch_size)]
+
+        transaction = dict(self.transactions[i % n])
+        if self.target == 'alert':
+            # Unique ids so the alert service does not drop them as duplicates
+            transaction['transaction_id'] = f"{transaction.get('transaction_id', 'TXN')}-LOAD{i}"
+            return {'transaction': transaction,
+                    'prediction': {'fraud_probability': 0.9, 'risk_level': 'HIGH', 'is_fraud': True}}
+        return transaction
+
+
+async def _send(session, url, payload, scheduled, latencies, counters, timeout):
+    import aiohttp
+    ok = False
+    try:
+        async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            await response.read()
+            ok = 200 <= response.status < 300
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass
+    # Measured from the scheduled time: queueing delay counts as latency
+    latencies.append(time.perf_counter() - scheduled)
+    if not ok:
+        counters['errors'] += 1
+
+
+async def run_phase(session, url, phase, payloads, timeout, rng):
+    offsets = arrival_times(phase, rng)
+    latencies = []
+    counters = {'errors': 0}
+    tasks = []
+
+    start = time.perf_counter()
+    for offset in offsets:
+        scheduled = start + offset
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(
+            _send(session, url, payloads(), scheduled, latencies, counters, timeout)))
+    if tasks:
+        await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    return latencies, counters['errors'], elapsed
+
+
+async def run_load(url, phases, payloads, connections=100, timeout=10.0, seed=None):
+    import aiohttp
+    rng = random.Random(seed)
+    reports = []
+    connector = aiohttp.TCPConnector(limit=connections)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        for i, phase in enumerate(phases, 1):
+            name = f"{i}:{phase['kind']}"
+            print(f"▶️  Phase {name} rate={phase['rate']:g}"
+                  f"{'->' + format(phase['rate_end'], 'g') if phase['kind'] == 'ramp' else ''}/s "
+                  f"for {phase['duration']:g}s")
+            latencies, errors, elapsed = await run_phase(session, url, phase, payloads, timeout, rng)
+            report = summarize(name, phase, latencies, errors, elapsed)
+            print_report(report)
+            reports.append(report)
+    return reports
+
+
+def print_report(report):
+    lat = report['latency_ms']
+    print(f"   requests={report['requests']} achieved={report['achieved_rps']:.1f}/s "
+          f"errors={report['errors']} ({report['error_rate'] * 100:.2f}%)")
+    print("   latency ms: " + ' '.join(f"{k}={v}" for k, v in lat.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Open-loop load generator')
+    parser.add_argument('--target', choices=sorted(TARGETS), default='predict')
+    parser.add_argument('--url', default=None, help='Override the target URL')
+    parser.add_argument('--phase', type=parse_phase, action='append', dest='phases',
+                        help='Arrival phase (repeatable), e.g. constant:100:30')
+    parser.add_argument('--file', default=os.path.join(parent_dir, 'data', 'sample_transactions.csv'),
+                        help='CSV file with transactions')
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help='Transactions per /batch-predict request')
+    parser.add_argument('--connections', type=int, default=100, help='Connection pool size')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Per-request timeout (seconds)')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for Poisson arrivals')
+    parser.add_argument('--output', default=None, help='Write the phase reports to this JSON file')
+    args = parser.parse_args()
+
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        print("❌ aiohttp is required: pip install aiohttp")
+        sys.exit(1)
+
+    phases = args.phases or [parse_phase('constant:50:10')]
+    env_var, default_base, path = TARGETS[args.target]
+    url = args.url or os.getenv(env_var, default_base).rstrip('/') + path
+    payloads = PayloadFactory(args.target, load_transactions(args.file), args.batch_size)
+
+    print("=" * 60)
+    print("🔥 LOAD GENERATOR (open loop)")
+    print("=" * 60)
+    print(f"Target: {url}")
+    print(f"Connections: {args.connections}")
+    print()
+
+    try:
+        reports = asyncio.run(run_load(url, phases, payloads, args.connections, args.timeout, args.seed))
+    except KeyboardInterrupt:
+        print("\n⚠️  Load test interrupted by user")
+        return
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'target': args.target, 'url': url, 'phases': reports}, f, indent=2)
+        print(f"\n✓ Report saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
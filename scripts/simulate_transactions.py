@@ -10,10 +10,29 @@ import time
 import requests
 from datetime import datetime
 
+def send_alert_batch(pending):
+    """
+    POST buffered alerts to /alerts/batch; returns the number created
+    """
+    response = requests.post(
+        'http://localhost:5001/alerts/batch',
+        json={'alerts': pending},
+        timeout=30
+    )
+    if response.status_code != 200:
+        print(f"     ❌ Alert batch failed: {response.status_code}")
+        return 0
+    result = response.json()
+    print(f"     ✓ Alert batch sent: {result['created']} created, {result['duplicate']} duplicate")
+    return result['created']
+
 def simulate_without_kafka(data_file='data/sample_transactions.csv', 
-                          delay=2.0, max_transactions=None):
+                          delay=2.0, max_transactions=None, alert_batch_size=1):
     """
     Simulate transactions by calling ML service directly
+    
+    With alert_batch_size > 1 alerts are buffered and sent to
+    /alerts/batch instead of one POST /alert each.
     """
     print("=" * 60)
     print("🎮 TRANSACTION SIMULATOR (Direct Mode)")
@@ -51,6 +70,7 @@ def simulate_without_kafka(data_file='data/sample_transactions.csv',
     
     fraud_count = 0
     total_count = 0
+    pending_alerts = []
     
     try:
         for _, row in df.iterrows():
@@ -91,7 +111,13 @@ def simulate_without_kafka(data_file='data/sample_transactions.csv',
                     print(f"     Risk Level: {result['risk_level']}")
                     
                     # Send alert if fraud detected
-                    if result['is_fraud'] and alert_service_running:
+                    if result['is_fraud'] and alert_service_running and alert_batch_size > 1:
+                        fraud_count += 1
+                        pending_alerts.append({'transaction': transaction, 'prediction': result})
+                        if len(pending_alerts) >= alert_batch_size:
+                            send_alert_batch(pending_alerts)
+                            pending_alerts = []
+                    elif result['is_fraud'] and alert_service_running:
                         fraud_count += 1
                         alert_response = requests.post(
                             'http://localhost:5001/alert',
@@ -117,6 +143,12 @@ def simulate_without_kafka(data_file='data/sample_transactions.csv',
     except KeyboardInterrupt:
         print("\n⚠️  Simulation interrupted by user")
     
+    if pending_alerts:
+        try:
+            send_alert_batch(pending_alerts)
+        except Exception as e:
+            print(f"❌ Error sending alert batch: {str(e)}")
+    
     print("\n" + "=" * 60)
     print("📊 SIMULATION SUMMARY")
     print("=" * 60)
@@ -135,11 +167,14 @@ if __name__ == "__main__":
                        help='Delay between transactions')
     parser.add_argument('--max', type=int, default=None,
                        help='Max transactions to simulate')
+    parser.add_argument('--alert-batch', type=int, default=1,
+                       help='Send alerts to /alerts/batch in groups of this size')
     
     args = parser.parse_args()
     
     simulate_without_kafka(
         data_file=args.file,
         delay=args.delay,
-        max_transactions=args.max
+        max_transactions=args.max,
+        alert_batch_size=args.alert_batch
     )
\ No newline at end of file
@@ -1 +0,0 @@
-Hello
@@ -0,0 +1,177 @@
+"""
+Streaming progress metrics for the Spark job
+
+A StreamingQueryListener (see spark_job.MetricsListener) hands every
+progress event to StreamingMetrics, which keeps the latest values, appends
+each event to a size-rotated JSON-lines log and serves them over HTTP:
+
+    GET /metrics       Prometheus text format
+    GET /metrics.json  latest progress summary plus recent history
+    GET /trend         fraud trend of the rows this job scored (when a
+                       TrendRollup is attached, see ml_service/trend.py)
+"""
+import json
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+def _number(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def summarize_progress(progress):
+    """
+    Flatten a StreamingQueryProgress JSON dict into the exported metrics
+    """
+    sources = progress.get('sources') or []
+    state = progress.get('stateOperators') or []
+
+    # Kafka sources report how far each partition's consumed offset is
+    # behind the latest available one
+    offsets_behind = sum(
+        _number((source.get('metrics') or {}).get('maxOffsetsBehindLatest'))
+        for source in sources
+    )
+
+    return {
+        'query_name': progress.get('name') or progress.get('id'),
+        'batch_id': progress.get('batchId'),
+        'timestamp': progress.get('timestamp'),
+        'num_input_rows': progress.get('numInputRows', 0),
+        'input_rows_per_second': _number(progress.get('inputRowsPerSecond')),
+        'processed_rows_per_second': _number(progress.get('processedRowsPerSecond')),
+        'duration_ms': dict(progress.get('durationMs') or {}),
+        'state_rows_total': sum(op.get('numRowsTotal', 0) for op in state),
+        'state_memory_bytes': sum(op.get('memoryUsedBytes', 0) for op in state),
+        'offsets_behind_latest': offsets_behind,
+        'end_offsets': [source.get('endOffset') for source in sources],
+        'latest_offsets': [source.get('latestOffset') for source in sources],
+    }
+
+
+class StreamingMetrics:
+    def __init__(self, log_file=None, max_bytes=10 * 1024 * 1024, backup_count=5, history=120, trend=None):
+        """
+        Thread-safe store of the latest streaming progress
+
+        Args:
+            log_file: JSON-lines progress log, rotated at max_bytes
+            history: number of recent summaries kept for /metrics.json
+            trend: TrendRollup served on /trend
+        """
+        self.trend = trend
+        self._lock = threading.Lock()
+        self._latest = None
+        self._history = deque(maxlen=history)
+        self._server = None
+
+        self._log = None
+        if log_file:
+            self._log = logging.getLogger(f"{__name__}.progress")
+            self._log.propagate = False
+            self._log.setLevel(logging.INFO)
+            handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self._log.addHandler(handler)
+
+    def record(self, progress):
+        """Store one progress event (the dict form of StreamingQueryProgress)"""
+        summary = summarize_progress(progress)
+        with self._lock:
+            self._latest = summary
+            self._history.append(summary)
+        if self._log:
+            self._log.info(json.dumps(summary))
+        return summary
+
+    def snapshot(self):
+        with self._lock:
+            return {'latest': self._latest, 'history': list(self._history)}
+
+    def prometheus(self):
+        """Latest values in Prometheus text exposition format"""
+        with self._lock:
+            latest = self._latest
+
+        if latest is None:
+            return ''
+
+        label = f'query="{latest["query_name"]}"'
+        lines = [
+            f'fraud_stream_batch_id{{{label}}} {latest["batch_id"]}',
+            f'fraud_stream_input_rows{{{label}}} {latest["num_input_rows"]}',
+            f'fraud_stream_input_rows_per_second{{{label}}} {latest["input_rows_per_second"]}',
+            f'fraud_stream_processed_rows_per_second{{{label}}} {latest["processed_rows_per_second"]}',
+            f'fraud_stream_state_rows{{{label}}} {latest["state_rows_total"]}',
+            f'fraud_stream_state_memory_bytes{{{label}}} {latest["state_memory_bytes"]}',
+            f'fraud_stream_offsets_behind_latest{{{label}}} {latest["offsets_behind_latest"]}',
+        ]
+        for phase, ms in sorted(latest['duration_ms'].items()):
+            lines.append(f'fraud_stream_batch_duration_ms{{{label},phase="{phase}"}} {ms}')
+        return '\n'.join(lines) + '\n'
+
+    def trend_response(self, query):
+        """(status, body) for a /trend query, same parameters as the ML service's"""
+        from ml_service.trend import parse_time
+
+        def arg(name):
+            return query.get(name, [None])[0]
+
+        try:
+            return 200, self.trend.query(
+                granularity=arg('granularity') or 'minute',
+                since=parse_time(arg('since')),
+                until=parse_time(arg('until')),
+                buckets=int(arg('buckets') or 60)
+            )
+        except ValueError as e:
+            return 400, {'error': str(e)}
+
+    def serve(self, port, host='0.0.0.0'):
+        """Serve /metrics, /metrics.json and /trend from a background thread"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                status = 200
+                if url.path == '/metrics':
+                    body = metrics.prometheus().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4'
+                elif url.path == '/metrics.json':
+                    body = json.dumps(metrics.snapshot()).encode('utf-8')
+                    content_type = 'application/json'
+                elif url.path == '/trend' and metrics.trend is not None:
+                    status, data = metrics.trend_response(parse_qs(url.query))
+                    body = json.dumps(data).encode('utf-8')
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True, name='stream-metrics')
+        thread.start()
+        logger.info(f"Streaming metrics on http://{host}:{port}/metrics")
+        return self._server
+
+    def shutdown(self):
+        if self._server:
+            self._server.shutdown()
@@ -0,0 +1,194 @@
+"""
+Scoring stage for the Spark streaming job
+
+This module is shipped to the executors with SparkContext.addPyFile, so
+its module-level state lives as long as the Python worker process. Spark
+reuses those processes across tasks and micro-batches
+(spark.python.worker.reuse), which lets the model be deserialized once per
+worker instead of once per partition of every batch.
+"""
+import os
+import logging
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from risk import FRAUD_THRESHOLD, risk_levels
+from rules import RuleEngine
+from cascade import Cascade
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = '/app/ml_model/fraud_model.pkl'
+DEFAULT_FE_PATH = '/app/ml_model/feature_engineer.pkl'
+DEFAULT_RULES_PATH = '/app/ml_model/rules.json'
+DEFAULT_STAGE1_PATH = '/app/ml_model/cascade_stage1.pkl'
+
+# risk_level of rows that could not be scored
+SCORING_ERROR_LEVEL = 'ERROR'
+
+# path -> (version, loaded object)
+_artifact_cache = {}
+
+
+def artifact_version(path):
+    """
+    Version key of an artifact on disk
+
+    Retraining rewrites the pickle, which changes its mtime/size; MODEL_VERSION
+    lets a deployment force a reload without touching the file.
+    """
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size, os.getenv('MODEL_VERSION', ''))
+
+
+def load_artifact(path):
+    """
+    Load a joblib artifact, reusing the copy cached in this worker process
+    until the file (or MODEL_VERSION) changes
+    """
+    cached = _artifact_cache.get(path)
+    try:
+        version = artifact_version(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        obj = joblib.load(path)
+    except Exception:
+        # A retrain may be rewriting the file; keep scoring with the old copy
+        if cached is not None:
+            logger.warning(f"Reload of {path} failed, using cached artifact", exc_info=True)
+            return cached[1]
+        raise
+
+    _artifact_cache[path] = (version, obj)
+    logger.info(f"Loaded artifact {path}")
+    return obj
+
+
+def load_models():
+    """
+    Return the cached (model, feature engineer) pair
+
+    With CASCADE_ENABLED the model is a Cascade that only sends rows its
+    stage-one model cannot clear to the forest.
+    """
+    model = load_artifact(os.getenv('MODEL_PATH', DEFAULT_MODEL_PATH))
+    fe = load_artifact(os.getenv('FE_PATH', DEFAULT_FE_PATH))
+    # Spark already runs one task per core; a forest fanning out over all
+    # cores in every task would oversubscribe the executor
+    if getattr(model, 'n_jobs', None) not in (None, 1):
+        model.n_jobs = 1
+
+    if os.getenv('CASCADE_ENABLED', 'false').lower() in ('1', 'true', 'yes'):
+        stage1_path = os.getenv('CASCADE_STAGE1_PATH', DEFAULT_STAGE1_PATH)
+        if os.path.exists(stage1_path):
+            model = Cascade(load_artifact(stage1_path), model)
+    return model, fe
+
+
+def load_rules():
+    """
+    Cached pre-filter RuleEngine, or None unless RULES_ENABLED=true and the
+    rules file exists
+    """
+    if os.getenv('RULES_ENABLED', 'false').lower() not in ('1', 'true', 'yes'):
+        return None
+    path = os.getenv('RULES_PATH', DEFAULT_RULES_PATH)
+    if not os.path.exists(path):
+        return None
+
+    cached = _artifact_cache.get(path)
+    version = artifact_version(path)
+    if cached is None or cached[0] != version:
+        cached = (version, RuleEngine.from_file(path))
+        _artifact_cache[path] = cached
+        logger.info(f"Loaded rules {path}")
+    return cached[1]
+
+
+def score_frame(pdf, model, fe, rules=None):
+    """
+    Append fraud_probability, is_fraud, risk_level and decision_rule to a batch
+
+    Rows decided by a pre-filter rule skip the model; the rest are
+    transformed and scored in one call.
+    """
+    probs = np.zeros(len(pdf))
+    if rules is not None:
+        decided = rules.evaluate(pdf)
+        by_rule = decided >= 0
+        probs[by_rule] = rules.probabilities[decided[by_rule]]
+        decision_rule = rules.names[decided]
+    else:
+        by_rule = np.zeros(len(pdf), dtype=bool)
+        decision_rule = None
+
+    if not by_rule.all():
+        X = fe.transform(pdf[~by_rule])
+        probs[~by_rule] = model.predict_proba(X)[:, 1]
+
+    pdf['fraud_probability'] = probs
+    pdf['is_fraud'] = (probs > FRAUD_THRESHOLD).astype(int)
+    pdf['risk_level'] = risk_levels(probs)
+    pdf['decision_rule'] = decision_rule
+    return pdf
+
+
+def mark_scoring_error(pdf, error):
+    """
+    Prediction columns for rows that could not be scored: a null
+    probability, risk level ERROR and the exception in scoring_error
+    """
+    pdf['fraud_probability'] = np.nan
+    pdf['is_fraud'] = 0
+    pdf['risk_level'] = SCORING_ERROR_LEVEL
+    pdf['decision_rule'] = None
+    pdf['scoring_error'] = error
+    return pdf
+
+
+def score_rows(pdf, model, fe, rules=None):
+    """
+    Score a batch that failed as a whole one row at a time, so only the
+    rows that fail on their own are marked with mark_scoring_error
+    """
+    frames = []
+    for i in range(len(pdf)):
+        row = pdf.iloc[i:i + 1].copy()
+        try:
+            row = score_frame(row, model, fe, rules)
+            row['scoring_error'] = None
+        except Exception as e:
+            row = mark_scoring_error(row, repr(e))
+        frames.append(row)
+    return pd.concat(frames)
+
+
+def predict_iter(iterator):
+    """
+    mapInPandas function scoring each Arrow batch of a partition
+
+    A batch that fails to score is logged and retried row by row; rows
+    that still fail keep flowing with risk_level ERROR and a scoring_error
+    instead of being reported as LOW.
+    """
+    model, fe = load_models()
+    rules = load_rules()
+
+    for pdf in iterator:
+        if pdf.empty:
+            yield pdf
+            continue
+
+        try:
+            pdf = score_frame(pdf, model, fe, rules)
+            pdf['scoring_error'] = None
+        except Exception:
+            logger.exception(f"Scoring failed for a batch of {len(pdf)} rows, scoring row by row")
+            pdf = score_rows(pdf, model, fe, rules)
+            failed = int(pdf['scoring_error'].notna().sum())
+            if failed:
+                logger.error(f"{failed} of {len(pdf)} rows could not be scored (risk_level {SCORING_ERROR_LEVEL})")
+
+        yield pdf
@@ -1,8 +1,32 @@
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import from_json, col, to_json, struct
-from pyspark.sql.types import StructType, StructField, StringType, DoubleType, IntegerType
+from pyspark.sql.functions import from_json, col, to_json, struct, coalesce, current_timestamp, expr, lit
+from pyspark.sql.types import (
+    StructType, StructField, StringType, DoubleType, IntegerType, LongType, ArrayType
+)
+from pyspark.sql.streaming import StreamingQueryListener
+from pyspark.sql.streaming.state import GroupStateTimeout
 import os
+import sys
 import json
+import urllib.request
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+
+# feature_engineer.pkl and the scoring module need the ml_model modules
+ml_model_dir = os.getenv('ML_MODEL_DIR', os.path.join(parent_dir, 'ml_model'))
+sys.path.insert(0, ml_model_dir)
+sys.path.insert(0, current_dir)
+# ml_service.trend: the driver keeps a trend rollup of everything it scores
+sys.path.insert(0, parent_dir)
+
+import scoring
+import velocity
+from metrics import StreamingMetrics
+from streaming_config import resolve_streaming_config, resolve_velocity_config
+from ml_service.trend import TrendRollup
+
+KAFKA_PACKAGE = "org.apache.spark:spark-sql-kafka-0-10_2.12:3.4.1"
 
 
 # Define schema for incoming transactions
@@ -18,91 +42,306 @@ transaction_schema = StructType([
     StructField("transaction_type", StringType(), True),
     StructField("amount_log", DoubleType(), True),
     StructField("from_account", StringType(), True),
-    StructField("to_account", StringType(), True)
+    StructField("to_account", StringType(), True),
+    StructField("user_id", StringType(), True),
+    StructField("merchant_id", StringType(), True)
 ])
 
+prediction_fields = [
+    StructField('fraud_probability', DoubleType(), True),
+    StructField('is_fraud', IntegerType(), True),
+    StructField('risk_level', StringType(), True),
+    StructField('decision_rule', StringType(), True),
+    # Set (with risk_level ERROR) on rows the scoring stage failed on
+    StructField('scoring_error', StringType(), True)
+]
 
-def start_spark_streaming():
-    print("=" * 60)
-    print("⚡ STARTING SPARK STREAMING JOB")
-    print("=" * 60)
+velocity_fields = [
+    StructField('velocity_txn_count', LongType(), True),
+    StructField('velocity_amount_sum', DoubleType(), True),
+    StructField('velocity_distinct_counterparties', LongType(), True)
+]
+
+# Recent events of one account, kept in the state store
+velocity_state_schema = StructType([
+    StructField('times', ArrayType(LongType()), True),
+    StructField('amounts', ArrayType(DoubleType()), True),
+    StructField('counterparties', ArrayType(StringType()), True)
+])
+
+
+def with_prediction_fields(schema):
+    """Output schema of the scoring stage for a given input schema"""
+    return StructType(schema.fields + prediction_fields)
+
+
+# Output schema (transaction fields plus prediction fields)
+prediction_schema = with_prediction_fields(transaction_schema)
 
-    kafka_broker = os.getenv('KAFKA_BROKER', 'kafka:9092')
-    checkpoint_dir = os.getenv('CHECKPOINT_DIR', '/app/checkpoints')
 
-    spark = SparkSession.builder \
-        .appName("FraudDetectionStreaming") \
-        .config("spark.jars.packages", "org.apache.spark:spark-sql-kafka-0-10_2.12:3.4.1") \
-        .getOrCreate()
+def create_spark_session(app_name="FraudDetectionStreaming", streaming_config=None, packages=KAFKA_PACKAGE):
+    """
+    Create the Spark session and ship the scoring modules to the executors
+    """
+    builder = SparkSession.builder.appName(app_name)
+    if packages:
+        builder = builder.config("spark.jars.packages", packages)
 
+    arrow_batch = (streaming_config or {}).get('arrow_max_records_per_batch')
+    if arrow_batch:
+        builder = builder.config("spark.sql.execution.arrow.maxRecordsPerBatch", str(arrow_batch))
+
+    # RocksDB keeps large velocity state off the JVM heap
+    if os.getenv('STATE_STORE_PROVIDER', '').lower() == 'rocksdb':
+        builder = builder.config(
+            "spark.sql.streaming.stateStore.providerClass",
+            "org.apache.spark.sql.execution.streaming.state.RocksDBStateStoreProvider"
+        )
+
+    spark = builder.getOrCreate()
     spark.sparkContext.setLogLevel("WARN")
 
-    print("\n✓ Spark session created")
-    print("✓ Connecting to Kafka...")
+    # Shipping the scoring module (and what the pickles reference) lets its
+    # model cache survive across batches in each Python worker
+    spark.sparkContext.addPyFile(scoring.__file__)
+    spark.sparkContext.addPyFile(velocity.__file__)
+    for module in ('feature_engineering.py', 'geo_index.py', 'risk.py', 'rules.py', 'cascade.py'):
+        path = os.path.join(ml_model_dir, module)
+        if os.path.exists(path):
+            spark.sparkContext.addPyFile(path)
 
-    raw = spark.readStream.format("kafka") \
-        .option("kafka.bootstrap.servers", kafka_broker) \
-        .option("subscribe", "transactions") \
-        .option("startingOffsets", os.getenv('STARTING_OFFSETS', 'latest')) \
-        .load()
+    return spark
 
-    transactions = raw.select(from_json(col("value").cast("string"), transaction_schema).alias("data")).select("data.*")
 
-    print("✓ Stream configured")
+def add_velocity_features(transactions, config):
+    """
+    Join per-account velocity signals onto each transaction
+
+    The account is from_account (falling back to user_id) and the
+    counterparty to_account (falling back to merchant_id). ``transactions``
+    must carry an ``event_time`` timestamp column.
+
+    The stateful operator drops rows behind the watermark, so late rows
+    skip it and are scored with null velocity columns instead. The
+    watermark trails the newest event time by the watermark delay, and
+    event times are Kafka record timestamps (not ahead of the clock), so
+    any row newer than now minus the delay is never behind the watermark;
+    older rows take the bypass.
+    """
+    on_time = col("event_time") >= current_timestamp() - expr(f"INTERVAL {config['watermark']}")
+
+    keyed = transactions.filter(on_time) \
+        .withWatermark("event_time", config['watermark']) \
+        .withColumn("velocity_account", coalesce(col("from_account"), col("user_id"))) \
+        .withColumn("velocity_counterparty", coalesce(col("to_account"), col("merchant_id")))
+
+    output_schema = StructType(transactions.schema.fields + velocity_fields)
+
+    windowed = keyed.groupBy("velocity_account").applyInPandasWithState(
+        velocity.velocity_state_func(config['window_seconds'], config['max_events']),
+        outputStructType=output_schema,
+        stateStructType=velocity_state_schema,
+        outputMode="append",
+        timeoutConf=GroupStateTimeout.EventTimeTimeout
+    )
+
+    late = transactions.filter(~on_time).select(
+        "*", *[lit(None).cast(field.dataType).alias(field.name) for field in velocity_fields]
+    )
+    return windowed.unionByName(late)
+
+
+class MetricsListener(StreamingQueryListener):
+    """Forwards every query progress event to StreamingMetrics"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
 
-    # Define output schema (append prediction fields)
-    output_schema = StructType(transaction_schema.fields + [
-        StructField('fraud_probability', DoubleType(), True),
-        StructField('is_fraud', IntegerType(), True),
-        StructField('risk_level', StringType(), True)
-    ])
+    def onQueryStarted(self, event):
+        pass
 
-    def predict_iter(iterator):
-        import joblib
-        import pandas as pd
+    def onQueryProgress(self, event):
+        self.metrics.record(json.loads(event.progress.json))
 
-        model_path = os.getenv('MODEL_PATH', '/app/ml_model/fraud_model.pkl')
-        fe_path = os.getenv('FE_PATH', '/app/ml_model/feature_engineer.pkl')
+    def onQueryIdle(self, event):
+        pass
 
-        model = joblib.load(model_path)
-        fe = joblib.load(fe_path)
+    def onQueryTerminated(self, event):
+        pass
 
-        for pdf in iterator:
-            if pdf.empty:
-                yield pdf
-                continue
 
-            try:
-                X = fe.transform(pdf)
-                probs = model.predict_proba(X)[:, 1]
-                is_fraud = (probs > 0.5).astype(int)
-                risk = pd.cut(probs, bins=[-1, 0.3, 0.7, 1.0], labels=['LOW', 'MEDIUM', 'HIGH'])
+def start_metrics(spark):
+    """
+    Register the progress listener and start the metrics endpoint
 
-                pdf['fraud_probability'] = probs
-                pdf['is_fraud'] = is_fraud
-                pdf['risk_level'] = risk.astype(str)
-            except Exception:
-                pdf['fraud_probability'] = 0.0
-                pdf['is_fraud'] = 0
-                pdf['risk_level'] = 'LOW'
+    METRICS_PORT (default 9108, 0 disables the endpoint), METRICS_LOG
+    (rolling JSON-lines file, empty disables it), METRICS_LOG_MAX_BYTES.
+    The endpoint also serves /trend from a TrendRollup that the batch
+    writer feeds (TREND_MINUTES, TREND_HOURS).
+    """
+    log_file = os.getenv('METRICS_LOG', '/app/metrics/streaming_progress.jsonl')
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
 
-            yield pdf
+    metrics = StreamingMetrics(
+        log_file=log_file or None,
+        max_bytes=int(os.getenv('METRICS_LOG_MAX_BYTES', 10 * 1024 * 1024)),
+        trend=TrendRollup(
+            minutes=int(os.getenv('TREND_MINUTES', 1440)),
+            hours=int(os.getenv('TREND_HOURS', 720))
+        )
+    )
+    spark.streams.addListener(MetricsListener(metrics))
 
-    result = transactions.mapInPandas(predict_iter, schema=output_schema)
+    port = int(os.getenv('METRICS_PORT', 9108))
+    if port:
+        metrics.serve(port)
+        print(f"✓ Metrics on http://0.0.0.0:{port}/metrics")
+    return metrics
 
-    out = result.selectExpr("CAST(transaction_id AS STRING) AS key", "to_json(struct(*)) AS value")
 
-    query = out.writeStream \
-        .format("kafka") \
+def post_alert_batches(url, records, chunk_size=1000, timeout=30):
+    """
+    POST {transaction, prediction} records to the alert service's
+    /alerts/batch endpoint in chunks; returns the number of alerts created
+    """
+    created = 0
+    for i in range(0, len(records), chunk_size):
+        body = json.dumps({'alerts': records[i:i + chunk_size]}).encode('utf-8')
+        req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            created += json.loads(response.read())['created']
+    return created
+
+
+def make_batch_writer(kafka_broker, predictions_topic, alerts_topic, alert_threshold,
+                      alert_sink='kafka', alert_batch_url=None, trend=None):
+    """
+    foreachBatch function writing each scored micro-batch once
+
+    Predictions go to ``predictions_topic``. Rows with fraud_probability at
+    or above ``alert_threshold`` are deduplicated by transaction_id and
+    written in the same pass to ``alerts_topic`` as ``{transaction,
+    prediction}`` records (the body of the alert service's POST /alert),
+    keyed by transaction_id. A replayed batch carries the same keys, and
+    the alert store skips transaction_ids it already holds.
+
+    With ``alert_sink='http'`` the alerts are collected on the driver and
+    posted to ``alert_batch_url`` (POST /alerts/batch) instead.
+
+    Each batch's counts per risk level are added to ``trend`` (a
+    TrendRollup) on the driver; a replayed batch is counted again.
+    """
+    prediction_cols = [f.name for f in prediction_fields]
+
+    def write_batch(batch_df, batch_id):
+        batch_df.persist()
+        try:
+            batch_df.selectExpr("CAST(transaction_id AS STRING) AS key", "to_json(struct(*)) AS value") \
+                .write \
+                .format("kafka") \
+                .option("kafka.bootstrap.servers", kafka_broker) \
+                .option("topic", predictions_topic) \
+                .save()
+
+            if trend is not None:
+                risk_levels = {}
+                fraud = 0
+                for row in batch_df.groupBy("risk_level", "is_fraud").count().collect():
+                    risk_levels[row['risk_level']] = risk_levels.get(row['risk_level'], 0) + row['count']
+                    fraud += row['count'] if row['is_fraud'] else 0
+                trend.record_counts(sum(risk_levels.values()), fraud, risk_levels)
+
+            transaction_cols = [c for c in batch_df.columns if c not in prediction_cols]
+            alerts = batch_df \
+                .filter(col("fraud_probability") >= alert_threshold) \
+                .dropDuplicates(["transaction_id"]) \
+                .select(
+                    col("transaction_id").cast("string").alias("key"),
+                    to_json(struct(
+                        struct(*transaction_cols).alias("transaction"),
+                        struct(*prediction_cols).alias("prediction")
+                    )).alias("value")
+                )
+
+            if alert_sink == 'http':
+                records = [json.loads(row.value) for row in alerts.select("value").collect()]
+                if records:
+                    post_alert_batches(alert_batch_url, records)
+            else:
+                alerts.write \
+                    .format("kafka") \
+                    .option("kafka.bootstrap.servers", kafka_broker) \
+                    .option("topic", alerts_topic) \
+                    .save()
+        finally:
+            batch_df.unpersist()
+
+    return write_batch
+
+
+def start_spark_streaming():
+    print("=" * 60)
+    print("⚡ STARTING SPARK STREAMING JOB")
+    print("=" * 60)
+
+    kafka_broker = os.getenv('KAFKA_BROKER', 'kafka:9092')
+    checkpoint_dir = os.getenv('CHECKPOINT_DIR', '/app/checkpoints')
+    predictions_topic = os.getenv('PREDICTIONS_TOPIC', 'predictions')
+    alerts_topic = os.getenv('ALERTS_TOPIC', 'fraud-alerts')
+    alert_threshold = float(os.getenv('ALERT_THRESHOLD', 0.7))
+    alert_sink = os.getenv('ALERT_SINK', 'kafka')
+    alert_batch_url = os.getenv('ALERT_BATCH_URL', 'http://alert_service:5001/alerts/batch')
+    config = resolve_streaming_config()
+    velocity_config = resolve_velocity_config()
+
+    spark = create_spark_session(streaming_config=config)
+    metrics = start_metrics(spark)
+
+    print("\n✓ Spark session created")
+    print(f"✓ Preset: {config['preset']} (trigger: {config['trigger_interval'] or 'as fast as possible'}, "
+          f"maxOffsetsPerTrigger: {config['max_offsets_per_trigger'] or 'unlimited'}, "
+          f"arrow batch: {config['arrow_max_records_per_batch'] or 'default'})")
+    print("✓ Connecting to Kafka...")
+
+    reader = spark.readStream.format("kafka") \
         .option("kafka.bootstrap.servers", kafka_broker) \
-        .option("topic", os.getenv('PREDICTIONS_TOPIC', 'predictions')) \
+        .option("subscribe", "transactions") \
+        .option("startingOffsets", os.getenv('STARTING_OFFSETS', 'latest'))
+    if config['max_offsets_per_trigger']:
+        reader = reader.option("maxOffsetsPerTrigger", config['max_offsets_per_trigger'])
+    raw = reader.load()
+
+    # The Kafka record timestamp is the event time of the velocity windows
+    transactions = raw.select(
+        from_json(col("value").cast("string"), transaction_schema).alias("data"),
+        col("timestamp").alias("event_time")
+    ).select("data.*", "event_time")
+
+    if velocity_config['enabled']:
+        transactions = add_velocity_features(transactions, velocity_config)
+        print(f"✓ Velocity window: {velocity_config['window_seconds']}s "
+              f"(watermark: {velocity_config['watermark']}, max events/account: {velocity_config['max_events']})")
+
+    print("✓ Stream configured")
+
+    result = transactions.mapInPandas(scoring.predict_iter, schema=with_prediction_fields(transactions.schema))
+
+    writer = result.writeStream \
+        .queryName("fraud_scoring") \
+        .foreachBatch(make_batch_writer(kafka_broker, predictions_topic, alerts_topic, alert_threshold,
+                                        alert_sink, alert_batch_url, metrics.trend)) \
         .option("checkpointLocation", checkpoint_dir) \
-        .outputMode("append") \
-        .start()
+        .outputMode("append")
+    if config['trigger_interval']:
+        writer = writer.trigger(processingTime=config['trigger_interval'])
+    query = writer.start()
 
-    print("\n🚀 Streaming to Kafka 'predictions' topic...")
+    alert_target = alert_batch_url if alert_sink == 'http' else f"'{alerts_topic}'"
+    print(f"\n🚀 Streaming to Kafka '{predictions_topic}' topic "
+          f"(alerts >= {alert_threshold} to {alert_target})...")
     query.awaitTermination()
 
 
 if __name__ == '__main__':
-    start_spark_streaming()
\ No newline at end of file
+    start_spark_streaming()
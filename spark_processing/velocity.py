@@ -0,0 +1,132 @@
+"""
+Per-account velocity signals for the Spark scoring stream
+
+For every transaction we compute, over the sliding window ending at its
+event time, how many transactions its account made, their total amount and
+how many distinct counterparties they went to. The recent events of each
+account are kept in streaming state (applyInPandasWithState), so the
+signals are joined onto each transaction before scoring.
+
+State stays bounded: events older than the window are pruned, each account
+keeps at most ``max_events`` entries, and an account's state is dropped
+once the watermark passes the end of its last window.
+"""
+from collections import Counter, deque
+
+import numpy as np
+import pandas as pd
+
+VELOCITY_COLUMNS = [
+    'velocity_txn_count',
+    'velocity_amount_sum',
+    'velocity_distinct_counterparties',
+]
+
+
+def to_epoch_ms(timestamps):
+    """Event times as integer epoch milliseconds"""
+    ts = pd.to_datetime(timestamps, utc=True)
+    return ((ts - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(milliseconds=1)).to_numpy(dtype=np.int64)
+
+
+def compute_velocity(history, times_ms, amounts, counterparties, window_ms, max_events):
+    """
+    Velocity signals for a batch of one account's transactions
+
+    Events are assumed to arrive roughly in event-time order (the watermark
+    bounds how late they can be); window eviction works from the oldest end.
+
+    Args:
+        history: (times, amounts, counterparties) sequences of earlier events
+        times_ms, amounts, counterparties: arrays for the new transactions
+        window_ms: sliding window length
+        max_events: cap on events retained per account
+
+    Returns:
+        (counts, sums, distinct, new_history) where the first three align
+        with the input rows and new_history has the same layout as history
+    """
+    events = deque(zip(*history))
+    total = sum(e[1] for e in events)
+    parties = Counter(e[2] for e in events if e[2] is not None)
+
+    def evict():
+        nonlocal total
+        _, amount, party = events.popleft()
+        total -= amount
+        if party is not None:
+            parties[party] -= 1
+            if not parties[party]:
+                del parties[party]
+
+    n = len(times_ms)
+    counts = np.zeros(n, dtype=np.int64)
+    sums = np.zeros(n, dtype=np.float64)
+    distinct = np.zeros(n, dtype=np.int64)
+
+    # Walk the batch in event-time order; results go back to input positions
+    for i in np.argsort(times_ms, kind='stable'):
+        t = int(times_ms[i])
+        cutoff = t - window_ms
+        while events and (events[0][0] <= cutoff or len(events) >= max_events):
+            evict()
+
+        amount = float(amounts[i])
+        party = counterparties[i]
+        events.append((t, amount, party))
+        total += amount
+        if party is not None:
+            parties[party] += 1
+
+        counts[i] = len(events)
+        sums[i] = total
+        distinct[i] = len(parties)
+
+    new_history = (
+        [e[0] for e in events],
+        [e[1] for e in events],
+        [e[2] for e in events],
+    )
+    return counts, sums, distinct, new_history
+
+
+def velocity_state_func(window_seconds, max_events, account_col='velocity_account',
+                        counterparty_col='velocity_counterparty', time_col='event_time'):
+    """
+    Build the applyInPandasWithState function enriching transactions with
+    VELOCITY_COLUMNS
+    """
+    window_ms = int(window_seconds * 1000)
+
+    def update(key, pdf_iter, state):
+        if state.hasTimedOut:
+            # The watermark passed the end of this account's last window
+            state.remove()
+            return
+
+        history = state.get if state.exists else ([], [], [])
+
+        for pdf in pdf_iter:
+            if pdf.empty:
+                continue
+
+            times_ms = to_epoch_ms(pdf[time_col])
+            counterparties = pdf[counterparty_col].where(pdf[counterparty_col].notna(), None).tolist()
+            counts, sums, distinct, history = compute_velocity(
+                history, times_ms, pdf['amount'].fillna(0.0).to_numpy(),
+                counterparties, window_ms, max_events
+            )
+
+            pdf = pdf.drop(columns=[account_col, counterparty_col])
+            pdf['velocity_txn_count'] = counts
+            pdf['velocity_amount_sum'] = sums
+            pdf['velocity_distinct_counterparties'] = distinct
+            yield pdf
+
+        if len(history[0]):
+            state.update(history)
+            # Must lie beyond the current watermark, even for late events
+            timeout = max(max(history[0]) + window_ms, state.getCurrentWatermarkMs() + 1)
+            state.setTimeoutTimestamp(timeout)
+
+    return update
@@ -2,17 +2,23 @@ import sys
 sys.path.append('../alert_service')
 
 import pytest
-from notifier import AlertNotifier
+from notifier import AlertNotifier, UnsupportedStoreError
+from alert_log import SegmentedAlertLog
+from writer import AlertWriter, AlertQueueFull
+from coalescer import AlertCoalescer
+import compaction
+from broadcaster import AlertBroadcaster
+from alert_consumer import AlertTopicConsumer
+import threading
+import json
 import os
 
 @pytest.fixture
-def notifier():
-    test_log_file = 'test_fraud_alerts.json'
+def notifier(tmp_path):
+    test_log_file = str(tmp_path / 'test_fraud_alerts.json')
     notifier = AlertNotifier(log_file=test_log_file)
     yield notifier
-    # Cleanup
-    if os.path.exists(test_log_file):
-        os.remove(test_log_file)
+    notifier.close()
 
 @pytest.fixture
 def sample_alert_data():
@@ -63,7 +69,7 @@ def test_alert_summary(notifier, sample_alert_data):
     # Send alerts with different risk levels
     for risk in ['HIGH', 'MEDIUM', 'LOW']:
         prediction['risk_level'] = risk
-        notifier.send_alert(transaction, prediction)
+        notifier.send_alert(dict(transaction, transaction_id=f'TEST_{risk}'), prediction)
     
     summary = notifier.get_alert_summary()
     assert summary['total_alerts'] == 3
@@ -71,5 +77,503 @@ def test_alert_summary(notifier, sample_alert_data):
     assert summary['medium_risk'] == 1
     assert summary['low_risk'] == 1
 
+def test_send_alerts_bulk_is_idempotent(notifier, sample_alert_data):
+    """Bulk alerts are stored once per transaction_id"""
+    transaction, prediction = sample_alert_data
+    items = [
+        {'transaction': dict(transaction, transaction_id=f'BULK{i:03d}'), 'prediction': prediction}
+        for i in range(3)
+    ]
+    
+    results = notifier.send_alerts(items)
+    assert all(r is not None for r in results)
+    
+    # Replaying the batch plus one new alert only stores the new one
+    replay = items + [{'transaction': dict(transaction, transaction_id='BULK999'), 'prediction': prediction}]
+    results = notifier.send_alerts(replay)
+    assert [r is not None for r in results] == [False, False, False, True]
+    assert notifier.get_alert_summary()['total_alerts'] == 4
+
+@pytest.mark.parametrize('store', ['log', 'sqlite'])
+def test_replayed_batch_is_not_stored_twice_after_restart(tmp_path, monkeypatch, sample_alert_data, store):
+    """The store rejects replays the dedupe window no longer remembers"""
+    monkeypatch.setenv('ALERT_DEDUPE_WINDOW', '1')
+    transaction, prediction = sample_alert_data
+    log_file = str(tmp_path / 'alerts.json')
+    items = [{'transaction': dict(transaction, transaction_id=f'R{i}'), 'prediction': prediction}
+             for i in range(3)]
+    
+    notifier = AlertNotifier(log_file=log_file, store=store)
+    notifier.send_alerts(items)
+    notifier.close()
+    
+    fresh = AlertNotifier(log_file=log_file, store=store)
+    assert fresh.send_alerts(items) == [None, None, None]
+    assert fresh.send_alert(items[0]['transaction'], prediction)['duplicate'] is True
+    # Straight to the store, bypassing the notifier's checks
+    fresh.store.append([{'alert_id': 'X', 'transaction_id': 'R1'}])
+    fresh.close()
+    
+    reopened = AlertNotifier(log_file=log_file, store=store)
+    assert sorted(a['transaction_id'] for a in reopened.store.iter_alerts()) == ['R0', 'R1', 'R2']
+    assert reopened.get_alert_summary()['total_alerts'] == 3
+    reopened.close()
+
+def test_sqlite_unique_index_dedupes_old_databases(tmp_path):
+    """Databases from before the unique index keep the first copy of each transaction"""
+    import sqlite3
+    from sqlite_store import SQLiteAlertStore
+    
+    db_path = str(tmp_path / 'alerts.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE alerts (id INTEGER PRIMARY KEY AUTOINCREMENT, alert_id TEXT, timestamp TEXT, '
+                 'transaction_id TEXT, user_id TEXT, merchant_id TEXT, amount REAL, fraud_probability REAL, '
+                 'risk_level TEXT, payload TEXT NOT NULL)')
+    for alert_id, transaction_id in (('A1', 'T1'), ('A2', 'T1'), ('A3', 'T2')):
+        conn.execute('INSERT INTO alerts (alert_id, transaction_id, payload) VALUES (?, ?, ?)',
+                     (alert_id, transaction_id, json.dumps({'alert_id': alert_id, 'transaction_id': transaction_id})))
+    conn.commit()
+    conn.close()
+    
+    store = SQLiteAlertStore(db_path)
+    assert [a['alert_id'] for a in store.iter_alerts()] == ['A1', 'A3']
+    assert store.existing_ids(['T1', 'T3']) == {'T1'}
+    store.close()
+
+def test_counters_rebuilt_from_log(tmp_path, sample_alert_data):
+    """Ring buffer and counters survive a restart"""
+    transaction, prediction = sample_alert_data
+    log_file = str(tmp_path / 'alerts.json')
+    notifier = AlertNotifier(log_file=log_file)
+    for i, risk in enumerate(['HIGH', 'HIGH', 'LOW']):
+        notifier.send_alert(dict(transaction, transaction_id=f'T{i}'), dict(prediction, risk_level=risk))
+    notifier.close()
+    
+    reopened = AlertNotifier(log_file=log_file)
+    summary = reopened.get_alert_summary()
+    assert (summary['total_alerts'], summary['high_risk'], summary['low_risk']) == (3, 2, 1)
+    assert [a['transaction_id'] for a in reopened.get_recent_alerts(limit=2)] == ['T1', 'T2']
+    assert sum(h['alerts'] for h in reopened.get_hourly_counts()) == 3
+    reopened.close()
+
+def test_sqlite_query_filters_and_pages(tmp_path, sample_alert_data):
+    """SQLite store filters by user and pages newest first"""
+    transaction, prediction = sample_alert_data
+    notifier = AlertNotifier(log_file=str(tmp_path / 'alerts.json'), store='sqlite')
+    items = [
+        {'transaction': dict(transaction, transaction_id=f'Q{i:03d}', user_id=f'U{i % 2}'), 'prediction': prediction}
+        for i in range(10)
+    ]
+    notifier.send_alerts(items)
+    notifier.flush()
+    
+    page, cursor = notifier.query_alerts(user_id='U0', limit=3)
+    assert [a['transaction_id'] for a in page] == ['Q008', 'Q006', 'Q004']
+    page, cursor = notifier.query_alerts(user_id='U0', limit=3, cursor=cursor)
+    assert [a['transaction_id'] for a in page] == ['Q002', 'Q000']
+    assert cursor is None
+    assert notifier.get_alert_summary()['total_alerts'] == 10
+    with pytest.raises(UnsupportedStoreError):
+        notifier.get_history()
+    notifier.close()
+
+def test_query_needs_sqlite_store(notifier):
+    """The segment log store rejects filtered queries with a clear error"""
+    with pytest.raises(UnsupportedStoreError):
+        notifier.query_alerts(user_id='U1')
+
+def test_sqlite_pool_is_bounded_across_threads(tmp_path):
+    """Short-lived request threads reuse pooled connections"""
+    from sqlite_store import SQLiteAlertStore
+    store = SQLiteAlertStore(str(tmp_path / 'alerts.db'), pool_size=2)
+    store.append([{'alert_id': 'A1', 'transaction_id': 'T1', 'risk_level': 'HIGH'}])
+    
+    threads = [threading.Thread(target=store.query, kwargs={'risk_level': 'HIGH'}) for _ in range(50)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert len(store._connections) <= 2
+    assert store.count() == 1
+    store.close()
+
+def test_sqlite_counters_rebuilt_without_decoding(tmp_path, monkeypatch, sample_alert_data):
+    """SQLite startup counts with SQL and decodes only the newest rows"""
+    from sqlite_store import SQLiteAlertStore
+    transaction, prediction = sample_alert_data
+    log_file = str(tmp_path / 'alerts.json')
+    monkeypatch.setenv('ALERT_COALESCE_WINDOW', '60')
+    notifier = AlertNotifier(log_file=log_file, store='sqlite')
+    for i, risk in enumerate(['HIGH', 'HIGH', 'LOW']):
+        notifier.send_alert(dict(transaction, transaction_id=f'S{i}', user_id=f'U{i}'), dict(prediction, risk_level=risk))
+    # Absorbed into U0's incident
+    notifier.send_alert(dict(transaction, transaction_id='S3', user_id='U0'), dict(prediction, risk_level='MEDIUM'))
+    notifier.close()
+    monkeypatch.delenv('ALERT_COALESCE_WINDOW')
+    
+    monkeypatch.setattr(SQLiteAlertStore, 'iter_alerts', None)
+    monkeypatch.setenv('ALERT_RECENT_BUFFER', '2')
+    reopened = AlertNotifier(log_file=log_file, store='sqlite')
+    summary = reopened.get_alert_summary()
+    assert (summary['total_alerts'], summary['high_risk'], summary['medium_risk'], summary['low_risk']) == (4, 2, 1, 1)
+    assert sum(h['alerts'] for h in reopened.get_hourly_counts()) == 4
+    assert [a['transaction_id'] for a in reopened.get_recent_alerts(limit=2)][0] == 'S2'
+    items = [{'transaction': dict(transaction, transaction_id='S0'), 'prediction': prediction}]
+    assert reopened.send_alerts(items) == [None]
+    reopened.close()
+
+def test_batch_endpoint_reports_per_item_status(tmp_path, monkeypatch, sample_alert_data):
+    """POST /alerts/batch stores valid items once and flags the rest"""
+    monkeypatch.setenv('ALERT_LOG_FILE', str(tmp_path / 'alerts.json'))
+    sys.modules.pop('alert_app', None)
+    import alert_app
+    client = alert_app.app.test_client()
+    
+    transaction, prediction = sample_alert_data
+    body = {'alerts': [
+        {'transaction': dict(transaction, transaction_id='B1'), 'prediction': prediction},
+        {'transaction': dict(transaction, transaction_id='B1'), 'prediction': prediction},
+        {'transaction': {'transaction_id': 'B2'}, 'prediction': prediction},
+        {'transaction': dict(transaction, transaction_id='B3'), 'prediction': prediction},
+    ]}
+    response = client.post('/alerts/batch', json=body)
+    data = response.get_json()
+    
+    assert response.status_code == 200
+    assert [r['status'] for r in data['results']] == ['created', 'duplicate', 'invalid', 'created']
+    assert (data['created'], data['duplicate'], data['invalid']) == (2, 1, 1)
+    assert client.get('/alerts/summary').get_json()['total_alerts'] == 2
+    alert_app.notifier.close()
+
+class BlockingStore:
+    """Store whose first append waits until released"""
+    def __init__(self):
+        self.alerts = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+    
+    def append(self, alerts, fsync=None):
+        self.entered.set()
+        self.release.wait(5)
+        self.alerts.extend(alerts)
+
+def test_writer_backpressure_policies(tmp_path):
+    """A full queue rejects or spills, and close drains everything"""
+    store = BlockingStore()
+    writer = AlertWriter(store, max_queue=1, policy='reject')
+    writer.submit([{'transaction_id': 'A'}])
+    store.entered.wait(5)
+    writer.submit([{'transaction_id': 'B'}])
+    with pytest.raises(AlertQueueFull):
+        writer.submit([{'transaction_id': 'C'}])
+    store.release.set()
+    writer.close()
+    assert [a['transaction_id'] for a in store.alerts] == ['A', 'B']
+    
+    store = BlockingStore()
+    writer = AlertWriter(store, max_queue=1, policy='spill', spill_path=str(tmp_path / 'spill.jsonl'))
+    writer.submit([{'transaction_id': 'A'}])
+    store.entered.wait(5)
+    writer.submit([{'transaction_id': 'B'}])
+    writer.submit([{'transaction_id': 'C'}])
+    assert writer.stats['spilled'] == 1
+    store.release.set()
+    writer.close()
+    assert [a['transaction_id'] for a in store.alerts] == ['A', 'B', 'C']
+    assert not (tmp_path / 'spill.jsonl').exists()
+
+class FlakyStore:
+    def __init__(self, failures):
+        self.failures = failures
+        self.alerts = []
+    
+    def append(self, alerts, fsync=None):
+        if self.failures:
+            self.failures -= 1
+            raise IOError('disk unavailable')
+        self.alerts.extend(alerts)
+
+def test_writer_retries_then_spills_failed_writes(tmp_path):
+    """Failed writes are retried, then spilled and replayed instead of dropped"""
+    store = FlakyStore(failures=1)
+    writer = AlertWriter(store, write_retries=2, retry_backoff=0)
+    writer.submit([{'transaction_id': 'A'}])
+    writer.flush()
+    assert store.alerts == [{'transaction_id': 'A'}]
+    assert writer.stats['retries'] == 1 and writer.stats['errors'] == 0
+    writer.close()
+    
+    spill = tmp_path / 'spill.jsonl'
+    store = FlakyStore(failures=2)
+    writer = AlertWriter(store, write_retries=0, retry_backoff=0, spill_path=str(spill))
+    writer.submit([{'transaction_id': 'B'}])
+    writer.flush()
+    assert writer.stats['spilled'] == 1
+    writer.close()
+    assert store.alerts == [{'transaction_id': 'B'}]
+    assert not spill.exists()
+
+def test_blocked_enqueue_does_not_hold_notifier_lock(tmp_path):
+    """Reads keep working while a block-policy submit waits for queue room"""
+    notifier = AlertNotifier(log_file=str(tmp_path / 'alerts.json'), async_writes=False)
+    store = BlockingStore()
+    notifier.writer = AlertWriter(store, max_queue=1, policy='block', block_timeout=5)
+    transaction = {'user_id': 'U1', 'merchant_id': 'M1', 'amount': 10.0}
+    prediction = {'fraud_probability': 0.9, 'risk_level': 'HIGH'}
+    
+    notifier.send_alert(dict(transaction, transaction_id='A'), prediction)
+    store.entered.wait(5)
+    notifier.send_alert(dict(transaction, transaction_id='B'), prediction)
+    blocked = threading.Thread(target=notifier.send_alert,
+                               args=(dict(transaction, transaction_id='C'), prediction))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+    
+    acquired = notifier._lock.acquire(timeout=1)
+    assert acquired
+    notifier._lock.release()
+    assert notifier.get_alert_summary()['total_alerts'] == 2
+    
+    store.release.set()
+    blocked.join(5)
+    notifier.close()
+    assert [a['transaction_id'] for a in store.alerts] == ['A', 'B', 'C']
+
+def test_coalescer_merges_bursts_per_user():
+    """Alerts for one user within the window become one incident"""
+    coalescer = AlertCoalescer(window_seconds=60, max_open=2)
+    
+    def alert(i, user, amount, prob, risk):
+        return {'alert_id': f'A{i}', 'transaction_id': f'T{i}', 'timestamp': f'2024-01-01T00:00:0{i}',
+                'user_id': user, 'merchant_id': 'M1', 'amount': amount,
+                'fraud_probability': prob, 'risk_level': risk}
+    
+    assert coalescer.add(alert(1, 'U1', 100.0, 0.6, 'MEDIUM'), now=0) == (None, [])
+    incident_id, closed = coalescer.add(alert(2, 'U1', 50.0, 0.9, 'HIGH'), now=10)
+    assert incident_id is not None and closed == []
+    coalescer.add(alert(3, 'U1', 25.0, 0.7, 'HIGH'), now=20)
+    
+    # A single-alert incident closes without a record
+    coalescer.add(alert(4, 'U2', 10.0, 0.8, 'HIGH'), now=30)
+    _, closed = coalescer.add(alert(5, 'U3', 10.0, 0.8, 'HIGH'), now=61)
+    assert len(closed) == 1
+    incident = closed[0]
+    assert incident['alert_id'] == incident_id
+    assert (incident['count'], incident['total_amount'], incident['max_probability']) == (3, 175.0, 0.9)
+    assert incident['amount'] == 75.0 and incident['absorbed_risk_levels'] == {'HIGH': 2}
+    assert incident['risk_level'] == 'HIGH'
+    assert incident['transaction_ids'] == ['T1', 'T2', 'T3']
+    assert len(coalescer) == 2
+    
+    # Alerts without a user are stored one by one, never merged
+    for i, user in enumerate([None, 'UNKNOWN', 'UNKNOWN', '']):
+        assert coalescer.add(alert(6 + i, user, 10.0, 0.8, 'HIGH'), now=62) == (None, [])
+    assert len(coalescer) == 2
+
+def test_notifier_coalesces_send_alert(tmp_path, monkeypatch, sample_alert_data):
+    """Only the first alert and the closing incident are stored"""
+    monkeypatch.setenv('ALERT_COALESCE_WINDOW', '60')
+    transaction, prediction = sample_alert_data
+    notifier = AlertNotifier(log_file=str(tmp_path / 'alerts.json'))
+    results = [notifier.send_alert(dict(transaction, transaction_id=f'C{i}'), prediction) for i in range(4)]
+    assert [('coalesced_into' in r) for r in results] == [False, True, True, True]
+    assert notifier.get_alert_summary()['total_alerts'] == 1
+    notifier.close()
+    
+    stored = list(notifier.store.iter_alerts())
+    assert len(stored) == 2
+    assert stored[1]['type'] == 'incident' and stored[1]['count'] == 4
+    # The first alert plus the three absorbed ones, each counted once
+    summary = notifier.get_alert_summary()
+    assert (summary['total_alerts'], summary['high_risk']) == (4, 4)
+    
+    reopened = AlertNotifier(log_file=str(tmp_path / 'alerts.json'))
+    assert reopened.get_alert_summary()['total_alerts'] == 4
+    reopened.close()
+    
+    # Transactions without a user_id (e.g. dashboard tests) are never merged
+    anonymous = {k: v for k, v in transaction.items() if k != 'user_id'}
+    notifier = AlertNotifier(log_file=str(tmp_path / 'anonymous.json'))
+    results = [notifier.send_alert(dict(anonymous, transaction_id=f'N{i}'), prediction) for i in range(3)]
+    assert not any('coalesced_into' in r for r in results)
+    assert notifier.get_alert_summary()['total_alerts'] == 3
+    notifier.close()
+
+def test_compaction_archives_and_rolls_up(tmp_path, monkeypatch):
+    """Compacted segments move to archives; summary and history still see them"""
+    log_dir = tmp_path / 'alerts'
+    log = SegmentedAlertLog(str(log_dir), max_segment_bytes=1, fsync_policy='never')
+    for i, (hour, risk) in enumerate([('10', 'HIGH'), ('10', 'LOW'), ('11', 'HIGH'), ('12', 'MEDIUM')]):
+        log.append([{'transaction_id': f'T{i}', 'timestamp': f'2024-01-31T{hour}:00:00',
+                     'user_id': 'U1', 'merchant_id': 'M1', 'risk_level': risk}])
+    log.close()
+    
+    report = compaction.compact(str(log_dir))
+    assert (report['segments'], report['alerts']) == (3, 3)
+    assert len(log.segments()) == 1
+    
+    rollup = compaction.load_rollups(str(log_dir))[0]
+    assert rollup['total'] == 3 and rollup['risk_levels'] == {'HIGH': 2, 'LOW': 1}
+    assert rollup['hours']['10']['total'] == 2 and rollup['users'] == {'U1': 3}
+    
+    # Only the hour=11 partition is opened for this range
+    assert len(compaction.archive_partitions(str(log_dir), '2024-01-31T11:00:00', '2024-01-31T11:30:00')) == 1
+    
+    # Rerunning is a no-op
+    assert compaction.compact(str(log_dir))['segments'] == 0
+    
+    monkeypatch.setenv('ALERT_LOG_DIR', str(log_dir))
+    notifier = AlertNotifier(log_file=str(tmp_path / 'alerts.json'))
+    summary = notifier.get_alert_summary()
+    assert (summary['total_alerts'], summary['high_risk'], summary['medium_risk']) == (4, 2, 1)
+    assert notifier.get_daily_counts() == [{'date': '2024-01-31', 'alerts': 4}]
+    history = notifier.get_history(since='2024-01-31T10:30:00', until='2024-01-31T13:00:00')
+    assert [a['transaction_id'] for a in history] == ['T2', 'T3']
+    notifier.close()
+
+def test_restart_after_compaction_keeps_recent_and_dedupe(tmp_path, monkeypatch, sample_alert_data):
+    """Recent alerts and transaction_id dedupe survive compaction and a restart"""
+    transaction, prediction = sample_alert_data
+    monkeypatch.setenv('ALERT_SEGMENT_MAX_BYTES', '1')
+    log_file = str(tmp_path / 'alerts.json')
+    notifier = AlertNotifier(log_file=log_file, async_writes=False)
+    for i in range(4):
+        notifier.send_alert(dict(transaction, transaction_id=f'C{i}'), prediction)
+    notifier.close()
+    
+    log_dir = str(tmp_path / 'alerts')
+    assert compaction.compact(log_dir)['segments'] == 3
+    
+    reopened = AlertNotifier(log_file=log_file)
+    assert [a['transaction_id'] for a in reopened.get_recent_alerts(limit=4)] == ['C0', 'C1', 'C2', 'C3']
+    items = [{'transaction': dict(transaction, transaction_id='C0'), 'prediction': prediction}]
+    assert reopened.send_alerts(items) == [None]
+    assert reopened.get_alert_summary()['total_alerts'] == 4
+    assert len(reopened.get_history()) == 4
+    reopened.close()
+
+def test_stream_resumes_from_last_event_id(notifier, sample_alert_data):
+    """Stored alerts are broadcast and a reconnect replays only what was missed"""
+    transaction, prediction = sample_alert_data
+    broadcaster = notifier.broadcaster
+    stream = broadcaster.stream(snapshot=lambda: notifier.stream_snapshot(limit=5), heartbeat=0.01)
+    assert next(stream).startswith('retry:')
+    assert 'event: snapshot' in next(stream)
+    
+    notifier.send_alert(dict(transaction, transaction_id='S1'), prediction)
+    first_id = broadcaster.last_event_id
+    notifier.send_alerts([{'transaction': dict(transaction, transaction_id='S2'), 'prediction': prediction}])
+    
+    chunk = next(stream)
+    assert chunk.count('event: alerts') == 2 and '"total_alerts":2' in chunk
+    stream.close()
+    assert broadcaster.clients == 0
+    
+    missed = broadcaster.events_after(first_id)
+    assert len(missed) == 1 and '"S2"' in missed[0][2]
+    assert broadcaster.events_after('otherboot-1') is None
+    
+    small = AlertBroadcaster(history=2)
+    for i in range(5):
+        small.publish('alerts', {'i': i})
+    assert small.events_after(f'{small.boot_id}-1') is None
+    assert len(small.events_after(f'{small.boot_id}-3')) == 2
+
+def test_legacy_json_is_migrated_once(tmp_path, sample_alert_data):
+    """An existing JSON-array log is imported into the segment log"""
+    transaction, prediction = sample_alert_data
+    legacy = tmp_path / 'fraud_alerts.json'
+    legacy.write_text(json.dumps([
+        {'transaction_id': 'OLD001', 'risk_level': 'HIGH'},
+        {'transaction_id': 'OLD002', 'risk_level': 'LOW'}
+    ]))
+    
+    notifier = AlertNotifier(log_file=str(legacy))
+    assert not legacy.exists()
+    assert notifier.get_alert_summary()['total_alerts'] == 2
+    
+    # Migrated ids take part in dedupe
+    results = notifier.send_alerts([{'transaction': dict(transaction, transaction_id='OLD001'), 'prediction': prediction}])
+    assert results == [None]
+    notifier.close()
+    
+    # Reopening does not import again
+    reopened = AlertNotifier(log_file=str(legacy))
+    assert reopened.get_alert_summary()['total_alerts'] == 2
+    reopened.close()
+
+def test_segment_log_rolls_and_survives_torn_write(tmp_path):
+    """Segments roll by size and a torn last line is skipped"""
+    log = SegmentedAlertLog(str(tmp_path / 'alerts'), max_segment_bytes=200, fsync_policy='never')
+    for i in range(20):
+        log.append([{'transaction_id': f'T{i:03d}', 'pad': 'x' * 40}])
+    assert len(log.segments()) > 1
+    log.close()
+    
+    with open(log.segments()[-1], 'ab') as f:
+        f.write(b'{"transaction_id": "TORN')
+    
+    log = SegmentedAlertLog(str(tmp_path / 'alerts'), max_segment_bytes=200, fsync_policy='never')
+    log.append([{'transaction_id': 'T999'}])
+    ids = [a['transaction_id'] for a in log.iter_alerts()]
+    assert ids == [f'T{i:03d}' for i in range(20)] + ['T999']
+    log.close()
+
 if __name__ == "__main__":
-    pytest.main([__file__, '-v'])
\ No newline at end of file
+    pytest.main([__file__, '-v'])
+class FakeRecord:
+    def __init__(self, value):
+        self.value = value
+
+class FakeConsumer:
+    """Broker error on the first poll, then one batch, then nothing"""
+    def __init__(self, items):
+        self.polls = [RuntimeError('broker unavailable'), {'tp': [FakeRecord(i) for i in items]}]
+        self.commits = 0
+        self.closed = False
+    
+    def poll(self, timeout_ms=None, max_records=None):
+        if not self.polls:
+            return {}
+        result = self.polls.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    def commit(self):
+        self.commits += 1
+    
+    def close(self):
+        self.closed = True
+
+def test_topic_consumer_survives_bad_records(tmp_path, sample_alert_data):
+    """A bad record is dead-lettered and broker errors are retried"""
+    transaction, prediction = sample_alert_data
+    notifier = AlertNotifier(log_file=str(tmp_path / 'alerts.json'))
+    items = [
+        {'transaction': dict(transaction, transaction_id='K1'), 'prediction': prediction},
+        {'prediction': prediction},
+        {'transaction': dict(transaction, transaction_id='K2'), 'prediction': prediction},
+    ]
+    fake = FakeConsumer(items)
+    consumer = AlertTopicConsumer(notifier, retry_backoff=0.01)
+    consumer._create_consumer = lambda: fake
+    consumer.start()
+    
+    for _ in range(200):
+        if fake.commits:
+            break
+        threading.Event().wait(0.01)
+    assert consumer.is_alive()
+    consumer.stop()
+    consumer.join(5)
+    
+    assert fake.commits == 1 and fake.closed
+    assert consumer.stats['errors'] == 1
+    assert consumer.stats['created'] == 2 and consumer.stats['dead_lettered'] == 1
+    with open(consumer.dead_letter_path) as f:
+        assert json.loads(f.readline())['record'] == {'prediction': prediction}
+    assert {a['transaction_id'] for a in notifier.get_recent_alerts()} == {'K1', 'K2'}
+    notifier.close()
@@ -0,0 +1,43 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import random
+import argparse
+import pytest
+from load_generator import parse_phase, arrival_times, percentile, summarize
+
+def test_parse_phase():
+    assert parse_phase('constant:100:30') == {'kind': 'constant', 'rate': 100.0, 'rate_end': 100.0, 'duration': 30.0}
+    assert parse_phase('ramp:10:50:20')['rate_end'] == 50.0
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_phase('ramp:10:20')
+    for spec in ('constant:-1:10', 'poisson:10:0', 'ramp:10:-5:10', 'ramp:-1:5:10', 'constant:10:-3', 'poisson:nan:10'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_phase(spec)
+
+def test_arrival_schedules():
+    constant = arrival_times(parse_phase('constant:10:2'))
+    assert len(constant) == 20
+    assert constant[1] - constant[0] == pytest.approx(0.1)
+    
+    poisson = arrival_times(parse_phase('poisson:1000:5'), random.Random(0))
+    assert abs(len(poisson) - 5000) < 300
+    assert all(0 <= t < 5 for t in poisson)
+    
+    # Ramp 0 -> 100/s over 10s: 500 arrivals, twice as dense at the end
+    ramp = arrival_times(parse_phase('ramp:0:100:10'))
+    assert len(ramp) == 500
+    assert ramp == sorted(ramp)
+    assert sum(t < 5 for t in ramp) == pytest.approx(125, abs=2)
+
+def test_percentiles():
+    values = [i / 1000 for i in range(1, 1001)]
+    assert percentile(values, 50) == 0.5
+    assert percentile(values, 99.9) == 0.999
+    assert percentile([], 50) is None
+    
+    report = summarize('1:constant', {}, values, errors=10, elapsed=10.0)
+    assert report['error_rate'] == 0.01
+    assert report['latency_ms']['p99'] == 990.0
+    assert report['latency_ms']['max'] == 1000.0
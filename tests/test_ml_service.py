@@ -3,7 +3,10 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 import pytest
+from ml_service import app as ml_app
 from ml_service.app import predict_fraud, preprocess_transaction
+from ml_service.trend import TrendRollup
+from ml_service.shadow import ShadowScorer, read_log
 
 @pytest.fixture
 def sample_model():
@@ -55,5 +58,222 @@ def test_missing_field(sample_model):
     with pytest.raises(Exception):
         predict_fraud(incomplete_transaction)
 
+def test_liveness_and_readiness():
+    """/livez answers before the model is loaded; /readyz only once warm"""
+    app = ml_app.create_app(load=False)
+    client = app.test_client()
+    
+    assert client.get('/livez').status_code == 200
+    if not ml_app.warmed_up:
+        assert client.get('/readyz').status_code == 503
+    
+    ml_app.startup()
+    response = client.get('/readyz')
+    if ml_app.models_loaded:
+        assert response.status_code == 200
+        assert response.get_json()['warmed_up'] is True
+        assert 'model_load' in response.get_json()['startup_timings']
+    else:
+        # Expected if model files don't exist yet
+        assert response.status_code == 503
+
+def test_failed_model_load_is_not_retried_per_request(monkeypatch):
+    """After a failed load, requests fail fast until the retry interval passes"""
+    calls = []
+    
+    def failing_load():
+        calls.append(1)
+        ml_app.load_error = 'missing model'
+        ml_app.load_failed_at = ml_app.time.monotonic()
+        return False
+    
+    monkeypatch.setattr(ml_app, 'models_loaded', False)
+    monkeypatch.setattr(ml_app, 'load_error', None)
+    monkeypatch.setattr(ml_app, 'load_failed_at', None)
+    monkeypatch.setattr(ml_app, 'load_models', failing_load)
+    monkeypatch.setattr(ml_app, 'MODEL_LOAD_RETRY_SECONDS', 60)
+    
+    assert ml_app.ensure_models() is False
+    with pytest.raises(Exception, match='missing model'):
+        ml_app.predict_fraud({'transaction_id': 'T1'})
+    assert len(calls) == 1
+    
+    monkeypatch.setattr(ml_app, 'load_failed_at', ml_app.time.monotonic() - 61)
+    ml_app.ensure_models()
+    assert len(calls) == 2
+
+def test_lazy_app_loads_models_on_first_request(monkeypatch):
+    """create_app(load=False) loads the models from the first /predict"""
+    calls = []
+    
+    def failing_load():
+        calls.append(1)
+        ml_app.load_error = 'boom'
+        ml_app.load_failed_at = ml_app.time.monotonic()
+        return False
+    
+    monkeypatch.setattr(ml_app, 'models_loaded', False)
+    monkeypatch.setattr(ml_app, 'load_error', None)
+    monkeypatch.setattr(ml_app, 'load_failed_at', None)
+    monkeypatch.setattr(ml_app, 'load_models', failing_load)
+    client = ml_app.create_app(load=False).test_client()
+    
+    response = client.post('/predict', json={'transaction_id': 'T1'})
+    assert response.status_code == 503 and 'boom' in response.get_json()['error']
+    assert client.post('/batch-predict', json=[]).status_code == 503
+    assert len(calls) == 1
+
+def test_batch_prediction_matches_single(sample_transaction, monkeypatch):
+    """Batch scoring (rules + one model call) agrees with the per-row path"""
+    from rules import RuleEngine
+    
+    small = dict(sample_transaction, transaction_id='SMALL', amount=12.0, amount_log=2.56,
+                 transaction_type='in-store')
+    try:
+        predict_fraud(sample_transaction)
+    except Exception as e:
+        # Expected if model files don't exist yet
+        assert 'Model' in str(e)
+        return
+    
+    monkeypatch.setattr(ml_app, 'rules', RuleEngine.from_file())
+    singles = [predict_fraud(t) for t in (sample_transaction, small)]
+    assert ml_app.predict_batch([sample_transaction, small]) == singles
+    assert singles[0]['decision_rule'] is None
+    assert singles[1]['decision_rule'] == 'tiny_in_store_daytime'
+    with pytest.raises(Exception):
+        ml_app.predict_batch([{'transaction_id': 'X', 'amount': 1.0}])
+
+def test_cascade_escalates_uncleared_rows():
+    """Stage one clears rows below its threshold; only the rest reach the forest"""
+    import numpy as np
+    from cascade import Cascade, calibrate_threshold
+    
+    # 10 positives: with target recall 0.8, two may fall below the threshold
+    probabilities = np.array([0.05, 0.1, 0.2] + [0.1, 0.15, 0.3, 0.35, 0.4, 0.45, 0.5, 0.6, 0.7, 0.8])
+    y = np.array([0, 0, 0] + [1] * 10)
+    assert calibrate_threshold(probabilities, y, target_recall=0.8) == 0.3
+    assert calibrate_threshold(probabilities, y, target_recall=0.1) == 0.5
+    
+    class Stage1:
+        def predict_proba(self, X):
+            return np.column_stack([1 - X[:, 0], X[:, 0]])
+    
+    class Forest:
+        n_jobs = 4
+        def predict_proba(self, X):
+            self.rows = len(X)
+            return np.column_stack([np.full(len(X), 0.1), np.full(len(X), 0.9)])
+    
+    forest = Forest()
+    cascade = Cascade({'model': Stage1(), 'clear_threshold': 0.3}, forest)
+    X = np.array([[0.05], [0.5], [0.2], [0.3]])
+    
+    assert cascade.predict_proba(X)[:, 1].tolist() == [0.05, 0.9, 0.2, 0.9]
+    assert forest.rows == 2
+    assert cascade.stats()['escalation_rate'] == 0.5
+    assert cascade.n_jobs == 4
+    
+    # Cleared rows stay LOW even when the clear threshold is above 0.3
+    from risk import risk_levels
+    lenient = Cascade({'model': Stage1(), 'clear_threshold': 0.5}, forest)
+    cleared = lenient.predict_proba(np.array([[0.45]]))[:, 1]
+    assert cleared[0] < 0.3 and risk_levels(cleared).tolist() == ['LOW']
+    
+    import copy
+    assert copy.copy(cascade).clear_threshold == 0.3
+
+def test_geo_index_lookup_and_features():
+    """Grid rates rise around a fraud hotspot; training lookups are leave-one-out"""
+    import numpy as np
+    import pandas as pd
+    from geo_index import GeoRiskIndex
+    from feature_engineering import FeatureEngineer, GEO_FEATURES
+    
+    rng = np.random.default_rng(0)
+    lat = np.concatenate([rng.uniform(-60, 60, 2000), rng.uniform(40, 41, 100)])
+    lon = np.concatenate([rng.uniform(-150, 150, 2000), rng.uniform(-74, -73, 100)])
+    y = np.concatenate([np.zeros(2000), np.ones(100)])
+    index = GeoRiskIndex.build(lat, lon, y, cell_degrees=2.0, radius=1, strength=5)
+    
+    rates, counts = index.lookup([40.5, -30.0, np.nan], [-73.5, 100.0, 0.0])
+    assert rates[0] > 0.5 > rates[1]
+    assert counts[0] >= 100 and counts[2] == 0 and rates[2] == index.prior
+    
+    # A training row does not see its own label: alone in its area, it gets the prior
+    small = GeoRiskIndex.build([10.0, -50.0, -50.0, -50.0], [10.0, -100.0, -100.0, -100.0], [1, 0, 0, 0], strength=5)
+    assert small.lookup([10.0], [10.0])[0][0] == pytest.approx(0.375)
+    assert small.lookup_training([10.0], [10.0], [1])[0][0] == pytest.approx(small.prior)
+    
+    df = pd.DataFrame({'amount': 50.0, 'amount_log': 3.9, 'latitude': lat, 'longitude': lon,
+                       'hour': 12, 'day_of_week': 1, 'is_weekend': 0, 'is_night': 0,
+                       'transaction_type': 'online', 'is_fraud': y})
+    fe = FeatureEngineer(geo_index=index)
+    X, _ = fe.fit_transform(df)
+    assert fe.feature_columns[-2:] == GEO_FEATURES
+    assert fe.transform(df.head(5)).shape == (5, X.shape[1])
+    
+    # Pickles from before the geo index have no geo_index attribute
+    old = FeatureEngineer()
+    old.fit_transform(df)
+    del old.__dict__['geo_index']
+    assert old.transform(df.head(5)).shape == (5, X.shape[1] - 2)
+
+def test_trend_rollup_buckets():
+    """Scored results land in minute and hour buckets; old slots read as zero"""
+    trend = TrendRollup(minutes=3, hours=2)
+    fraud = {'is_fraud': True, 'risk_level': 'HIGH'}
+    normal = {'is_fraud': False, 'risk_level': 'LOW'}
+    
+    trend.record([fraud, normal, normal], now=60)
+    trend.record([fraud], now=150)
+    # Pre-aggregated counts, as the Spark job records each micro-batch
+    trend.record_counts(2, 1, {'HIGH': 1, 'LOW': 1}, now=170)
+    
+    minutes = trend.query('minute', since=60, until=180, now=170)
+    assert (minutes['start'], minutes['step']) == (60, 60)
+    assert minutes['scored'] == [3, 3]
+    assert minutes['fraud'] == [1, 2]
+    assert minutes['low'] == [2, 1]
+    
+    # Minute 4 reuses the slot of minute 1
+    trend.record([normal], now=240)
+    assert trend.query('minute', buckets=4, now=240)['scored'] == [0, 3, 0, 1]
+    
+    hours = trend.query('hour', buckets=1, now=240)
+    assert hours['scored'] == [7] and hours['high'] == [3]
+    
+    with pytest.raises(ValueError):
+        trend.query('week')
+
+def test_shadow_scorer_logs_pairs(tmp_path):
+    """Sampled transactions are scored by the challenger off the request path"""
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'data'))
+    from generate_data import generate_transactions
+    from feature_engineering import FeatureEngineer
+    from sklearn.linear_model import LogisticRegression
+    
+    df = generate_transactions(n_samples=500)
+    fe = FeatureEngineer()
+    X, y = fe.fit_transform(df)
+    challenger = LogisticRegression().fit(X, y)
+    
+    log_path = str(tmp_path / 'shadow.jsonl')
+    shadow = ShadowScorer(challenger, fe, log_path=log_path, sample_rate=1.0, max_queue=10)
+    transactions = df.drop(columns=['is_fraud']).head(20).to_dict('records')
+    results = [{'transaction_id': t['transaction_id'], 'fraud_probability': 0.1, 'is_fraud': False}
+               for t in transactions]
+    shadow.submit(transactions, results, champion_seconds=0.02)
+    shadow.drain()
+    
+    report = shadow.report()
+    assert report['pairs'] == report['scored'] == 20
+    assert 0 <= report['agreement_rate'] <= 1
+    assert report['champion_latency_ms']['p50'] == 1.0
+    shadow.close()
+    
+    pairs = list(read_log(log_path))
+    assert [p['transaction_id'] for p in pairs] == [t['transaction_id'] for t in transactions]
+
 if __name__ == "__main__":
     pytest.main([__file__, '-v'])
\ No newline at end of file
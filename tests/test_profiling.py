@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import threading
+import time
+from flask import Flask
+from profiling import SamplingProfiler, register_profiling
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_sampler_collapses_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    worker.start()
+    
+    profiler = SamplingProfiler(interval=0.001, threads={worker.ident}).start()
+    time.sleep(0.2)
+    profiler.stop()
+    stop.set()
+    worker.join()
+    
+    lines = profiler.collapsed().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(' ', 1)
+    assert stack.endswith('test_profiling.py:busy_loop')
+    assert int(count) > 0
+    assert profiler.stats()['samples'] > 10
+
+def test_admin_profile_endpoint():
+    app = Flask(__name__)
+    
+    @app.route('/work')
+    def work():
+        end = time.perf_counter() + 0.05
+        while time.perf_counter() < end:
+            pass
+        return 'ok'
+    
+    assert register_profiling(Flask('off'), enabled=False) is False
+    assert register_profiling(app, enabled=True) is True
+    client = app.test_client()
+    
+    result = {}
+    profile = threading.Thread(target=lambda: result.update(
+        response=client.get('/admin/profile?mode=requests&every=2&seconds=0.5&interval=0.002')))
+    profile.start()
+    time.sleep(0.05)
+    for _ in range(4):
+        app.test_client().get('/work')
+    profile.join()
+    
+    response = result['response']
+    assert response.status_code == 200
+    assert 'test_profiling.py:work' in response.get_data(as_text=True)
+    assert client.get('/admin/profile?seconds=x').status_code == 400
+    for seconds in ('0', '-5', 'nan', 'inf'):
+        assert client.get(f'/admin/profile?seconds={seconds}').status_code == 400
+    assert client.get('/admin/profile?seconds=1&interval=nan').status_code == 400
@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+from kafka_streaming.scoring_workers import ScoringWorker, assign_partitions
+
+def test_assign_partitions_covers_all():
+    """Every partition is owned by exactly one worker"""
+    subsets = assign_partitions(range(8), 3)
+    assert len(subsets) == 3
+    owned = sorted(p for subset in subsets for p in subset)
+    assert owned == list(range(8))
+
+def test_assign_partitions_caps_workers():
+    """No idle workers when there are fewer partitions than workers"""
+    subsets = assign_partitions([0, 1], 4)
+    assert subsets == [[0], [1]]
+
+def test_user_state_is_per_user():
+    """Running totals accumulate per user and evict the least recent"""
+    worker = ScoringWorker(0, [0], max_tracked_users=2)
+    counts, totals = worker.update_user_state(['U1', 'U2', 'U1'], [10.0, 5.0, 20.0])
+    assert list(counts) == [1, 1, 2]
+    assert list(totals) == [10.0, 5.0, 30.0]
+
+    worker.update_user_state(['U3'], [1.0])
+    assert 'U2' not in worker.user_state
+    assert 'U1' in worker.user_state
+
+def test_bad_record_is_dead_lettered(tmp_path):
+    """A failing batch is rescored record by record; only the bad one is dropped"""
+    import json
+    import numpy as np
+    
+    class Features:
+        def transform(self, df):
+            if df['transaction_type'].eq('unseen').any():
+                raise ValueError("y contains previously unseen labels: 'unseen'")
+            return df[['amount']].to_numpy()
+    
+    class Model:
+        def predict_proba(self, X):
+            return np.column_stack([np.full(len(X), 0.9), np.full(len(X), 0.1)])
+    
+    dead_letter = tmp_path / 'dead.jsonl'
+    worker = ScoringWorker(0, [0], dead_letter_path=str(dead_letter))
+    worker.model, worker.feature_engineer = Model(), Features()
+    batch = [
+        {'transaction_id': 'T1', 'user_id': 'U1', 'amount': 10.0, 'transaction_type': 'online'},
+        {'transaction_id': 'T2', 'user_id': 'U1', 'amount': 20.0, 'transaction_type': 'unseen'},
+        {'transaction_id': 'T3', 'user_id': 'U1', 'amount': 30.0, 'transaction_type': 'online'},
+    ]
+    
+    results = worker.score_records(batch)
+    assert [r['transaction_id'] for r in results] == ['T1', 'T3']
+    assert [r['user_txn_count'] for r in results] == [1, 2]
+    assert worker.stats == {'scored': 2, 'dead_lettered': 1, 'errors': 0}
+    lines = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+    assert [line['record']['transaction_id'] for line in lines] == ['T2']
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-v'])
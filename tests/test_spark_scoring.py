@@ -0,0 +1,176 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'ml_model'))
+
+import pytest
+import joblib
+from spark_processing import scoring
+from spark_processing.streaming_config import resolve_streaming_config
+from spark_processing.velocity import compute_velocity
+from spark_processing.metrics import StreamingMetrics
+from risk import risk_level, risk_levels
+from rules import RuleEngine
+import pandas as pd
+import numpy as np
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = str(tmp_path / 'artifact.pkl')
+    joblib.dump({'version': 1}, path)
+    scoring._artifact_cache.clear()
+    yield path
+    scoring._artifact_cache.clear()
+
+def test_artifact_loaded_once(artifact):
+    """Repeated loads reuse the cached object"""
+    first = scoring.load_artifact(artifact)
+    second = scoring.load_artifact(artifact)
+    assert first is second
+
+def test_artifact_reloaded_when_file_changes(artifact):
+    """Rewriting the artifact invalidates the cache"""
+    first = scoring.load_artifact(artifact)
+    joblib.dump({'version': 2, 'padding': 'x' * 100}, artifact)
+    second = scoring.load_artifact(artifact)
+    assert second['version'] == 2
+    assert first is not second
+
+def test_artifact_reloaded_when_version_changes(artifact, monkeypatch):
+    """MODEL_VERSION forces a reload without touching the file"""
+    first = scoring.load_artifact(artifact)
+    monkeypatch.setenv('MODEL_VERSION', 'v2')
+    second = scoring.load_artifact(artifact)
+    assert first is not second
+
+RULES = [
+    {'name': 'huge', 'fraud_probability': 1.0, 'when': [['amount', '>=', 10000]]},
+    {'name': 'tiny_in_store', 'fraud_probability': 0.0,
+     'when': [['transaction_type', 'in', ['in-store']], ['amount', '<', 25]]},
+]
+
+def test_rules_first_match_wins():
+    engine = RuleEngine(RULES + [{'name': 'any', 'fraud_probability': 0.5, 'when': [['amount', '>', 0]]}])
+    df = pd.DataFrame({'amount': [20000.0, 10.0, 10.0, 500.0],
+                       'transaction_type': ['in-store', 'in-store', 'online', 'online']})
+    assert engine.evaluate(df).tolist() == [0, 1, 2, 2]
+    
+    stats = engine.stats()
+    assert stats['short_circuit_ratio'] == 1.0
+    assert stats['by_rule'] == {'huge': 1, 'tiny_in_store': 1, 'any': 2}
+    
+    with pytest.raises(ValueError):
+        RuleEngine([{'name': 'bad', 'fraud_probability': 0.0, 'when': [['amount', '~', 1]]}])
+
+def test_score_frame_skips_model_for_rule_rows():
+    class Model:
+        def predict_proba(self, X):
+            self.rows = len(X)
+            return np.column_stack([np.full(len(X), 0.4), np.full(len(X), 0.6)])
+    
+    class Features:
+        def transform(self, df):
+            return df[['amount']].to_numpy()
+    
+    model = Model()
+    df = pd.DataFrame({'amount': [20000.0, 10.0, 300.0],
+                       'transaction_type': ['online', 'in-store', 'online']})
+    scored = scoring.score_frame(df, model, Features(), RuleEngine(RULES))
+    
+    assert model.rows == 1
+    assert scored['fraud_probability'].tolist() == [1.0, 0.0, 0.6]
+    assert scored['risk_level'].tolist() == ['HIGH', 'LOW', 'MEDIUM']
+    assert scored['decision_rule'].tolist()[:2] == ['huge', 'tiny_in_store']
+    assert pd.isna(scored['decision_rule'].iloc[2])
+
+def test_predict_iter_marks_rows_that_fail_to_score(monkeypatch):
+    """A failing batch is rescored row by row; only the bad rows are marked ERROR"""
+    class Model:
+        def predict_proba(self, X):
+            return np.column_stack([1 - X[:, 0] / 1000, X[:, 0] / 1000])
+    
+    class Features:
+        def transform(self, df):
+            if df['amount'].isna().any():
+                raise ValueError('missing amount')
+            return df[['amount']].to_numpy()
+    
+    monkeypatch.setattr(scoring, 'load_models', lambda: (Model(), Features()))
+    monkeypatch.setattr(scoring, 'load_rules', lambda: None)
+    df = pd.DataFrame({'amount': [800.0, np.nan, 100.0]})
+    scored = next(scoring.predict_iter(iter([df])))
+    
+    assert scored['risk_level'].tolist() == ['HIGH', scoring.SCORING_ERROR_LEVEL, 'LOW']
+    assert scored['fraud_probability'].iloc[0] == 0.8
+    assert np.isnan(scored['fraud_probability'].iloc[1])
+    assert 'missing amount' in scored['scoring_error'].iloc[1]
+    assert scored['scoring_error'].iloc[[0, 2]].isna().all()
+
+def test_risk_levels_match_scalar():
+    """Vectorized labels agree with the per-transaction thresholds"""
+    probs = [0.0, 0.29, 0.3, 0.5, 0.69, 0.7, 1.0]
+    assert list(risk_levels(probs)) == [risk_level(p) for p in probs]
+    assert list(risk_levels(probs)) == ['LOW', 'LOW', 'MEDIUM', 'MEDIUM', 'MEDIUM', 'HIGH', 'HIGH']
+
+def test_streaming_preset_with_override():
+    """Environment variables override single preset values"""
+    config = resolve_streaming_config(env={
+        'SPARK_PRESET': 'high-throughput',
+        'MAX_OFFSETS_PER_TRIGGER': '5000'
+    })
+    assert config['preset'] == 'high-throughput'
+    assert config['max_offsets_per_trigger'] == 5000
+    assert config['trigger_interval'] == '10 seconds'
+
+def test_unknown_streaming_preset():
+    with pytest.raises(ValueError):
+        resolve_streaming_config(preset='turbo', env={})
+
+def test_velocity_window():
+    """Counts, sums and distinct counterparties over the sliding window"""
+    history = ([0], [100.0], ['M1'])
+    times = [60000, 120000, 400000]
+    counts, sums, distinct, new_history = compute_velocity(
+        history, times, [10.0, 20.0, 5.0], ['M1', 'M2', 'M2'],
+        window_ms=300000, max_events=100
+    )
+    assert list(counts) == [2, 3, 2]
+    assert list(sums) == [110.0, 130.0, 25.0]
+    assert list(distinct) == [1, 2, 1]
+    # Events more than 5 minutes before the last one fell out of the window
+    assert new_history[0] == [120000, 400000]
+
+def test_velocity_state_is_capped():
+    """No account keeps more than max_events events"""
+    times = list(range(0, 10000, 1000))
+    counts, _, _, new_history = compute_velocity(
+        ([], [], []), times, [1.0] * 10, ['M1'] * 10,
+        window_ms=300000, max_events=3
+    )
+    assert counts.max() == 3
+    assert len(new_history[0]) == 3
+
+def test_streaming_metrics_from_progress(tmp_path):
+    """Progress events become Prometheus metrics and rolling log lines"""
+    log_file = tmp_path / 'progress.jsonl'
+    metrics = StreamingMetrics(log_file=str(log_file))
+    metrics.record({
+        'name': 'fraud_scoring',
+        'batchId': 7,
+        'numInputRows': 500,
+        'inputRowsPerSecond': 250.0,
+        'processedRowsPerSecond': 1000.0,
+        'durationMs': {'addBatch': 400, 'triggerExecution': 500},
+        'stateOperators': [{'numRowsTotal': 42, 'memoryUsedBytes': 2048}],
+        'sources': [{'metrics': {'maxOffsetsBehindLatest': '120'}}]
+    })
+
+    text = metrics.prometheus()
+    assert 'fraud_stream_processed_rows_per_second{query="fraud_scoring"} 1000.0' in text
+    assert 'fraud_stream_offsets_behind_latest{query="fraud_scoring"} 120.0' in text
+    assert 'phase="addBatch"} 400' in text
+    assert metrics.snapshot()['latest']['state_rows_total'] == 42
+    assert len(log_file.read_text().splitlines()) == 1
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,95 @@
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'web_ui'))
+
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from status_monitor import StatusMonitor
+from fleet_trend import merge_trends
+import json
+
+class HealthHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200 if self.path == '/health' else 503)
+        self.end_headers()
+    
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def health_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), HealthHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+def test_status_monitor_serves_cached_probes(health_server):
+    """Probes run on refresh; snapshots are served from the cache"""
+    monitor = StatusMonitor({
+        'up': f"{health_server}/health",
+        'down': f"{health_server}/broken",
+        'unreachable': 'http://127.0.0.1:9/health'
+    }, interval=60, timeout=1)
+    
+    before = monitor.snapshot()
+    assert before['stale'] and before['services']['up']['status'] == 'unknown'
+    
+    monitor.refresh()
+    snapshot = monitor.snapshot()
+    assert not snapshot['stale']
+    assert snapshot['services']['up']['status'] == 'online'
+    assert snapshot['services']['down']['status'] == 'offline'
+    assert snapshot['services']['unreachable']['status'] == 'offline'
+    monitor.stop()
+
+def test_merge_trends_sums_aligned_buckets():
+    """Counts are summed per bucket, whatever each source's first bucket"""
+    a = {'granularity': 'minute', 'start': 120, 'step': 60,
+         'scored': [1, 2], 'fraud': [0, 1], 'low': [1, 1], 'medium': [0, 0], 'high': [0, 1]}
+    b = {'granularity': 'minute', 'start': 180, 'step': 60,
+         'scored': [5, 7], 'fraud': [1, 0], 'low': [4, 7], 'medium': [0, 0], 'high': [1, 0]}
+    merged = merge_trends([a, b])
+    assert (merged['start'], merged['step']) == (120, 60)
+    assert merged['scored'] == [1, 7, 7]
+    assert merged['high'] == [0, 2, 0]
+    with pytest.raises(ValueError):
+        merge_trends([a, dict(b, step=3600)])
+
+class TrendHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps({'granularity': 'minute', 'start': 60, 'step': 60, 'scored': [self.server.scored],
+                           'fraud': [0], 'low': [self.server.scored], 'medium': [0], 'high': [0]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+def test_api_trend_sums_all_sources(monkeypatch):
+    """/api/trend adds up every replica and skips unreachable ones"""
+    import app as web_app
+    servers = []
+    for scored in (3, 4):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), TrendHandler)
+        server.scored = scored
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    
+    sources = [f"http://127.0.0.1:{s.server_address[1]}/trend" for s in servers] + ['http://127.0.0.1:9/trend']
+    monkeypatch.setattr(web_app, 'TREND_SOURCES', sources)
+    monkeypatch.setattr(web_app, 'trend_cache', {})
+    response = web_app.app.test_client().get('/api/trend?buckets=1')
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data['scored'] == [7]
+    assert data['sources'] == {'queried': 3, 'responded': 2}
+    # Concurrent fetches reuse connections instead of overflowing a small pool
+    assert web_app.trend_session.get_adapter(sources[0])._pool_maxsize == web_app.TREND_WORKERS
+    for server in servers:
+        server.shutdown()
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-v'])
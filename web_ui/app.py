@@ -1,34 +1,118 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, render_template, jsonify, request
 from flask_cors import CORS
+from status_monitor import StatusMonitor
+from fleet_trend import expand_sources, merge_trends
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 import requests
+import threading
+import time
 import os
 
 app = Flask(__name__)
 CORS(app)
 
+# Downstream health is probed in the background; requests read the cache
+status_monitor = StatusMonitor(
+    {
+        'ml_service': os.getenv('ML_SERVICE_HEALTH_URL', 'http://localhost:5000/health'),
+        'alert_service': os.getenv('ALERT_SERVICE_HEALTH_URL', 'http://localhost:5001/health'),
+    },
+    interval=float(os.getenv('STATUS_REFRESH_INTERVAL', 5)),
+    timeout=float(os.getenv('STATUS_TIMEOUT', 2))
+).start()
+
+# Fleet-wide trend: every source (ML service replicas, the Spark job's
+# metrics port) is queried and the counts summed; TREND_FANOUT queries each
+# address a source's host resolves to. Responses are cached briefly so
+# dashboards share one round of upstream calls.
+TREND_URL = os.getenv('ML_SERVICE_TREND_URL', 'http://localhost:5000/trend')
+TREND_SOURCES = [url.strip() for url in os.getenv('TREND_SOURCES', TREND_URL).split(',') if url.strip()]
+TREND_FANOUT = os.getenv('TREND_FANOUT', 'false').lower() in ('1', 'true', 'yes')
+TREND_CACHE_TTL = float(os.getenv('TREND_CACHE_TTL', 5))
+TREND_WORKERS = int(os.getenv('TREND_WORKERS', 8))
+trend_pool = ThreadPoolExecutor(max_workers=TREND_WORKERS, thread_name_prefix='trend')
+# Own session: the status monitor's pool only holds one connection per
+# probed service, and concurrent trend fetches would overflow it
+trend_session = requests.Session()
+trend_adapter = HTTPAdapter(pool_connections=TREND_WORKERS, pool_maxsize=TREND_WORKERS)
+trend_session.mount('http://', trend_adapter)
+trend_session.mount('https://', trend_adapter)
+TREND_PARAMS = ('granularity', 'since', 'until', 'buckets')
+trend_cache = {}
+trend_cache_lock = threading.Lock()
+
 # Routes
 @app.route('/')
 def index():
     """Main dashboard"""
     return render_template('index.html')
 
+@app.route('/api/status')
+def status():
+    """Cached status of all downstream services, with its age"""
+    return jsonify(status_monitor.snapshot())
+
+def fetch_trend(url, params):
+    """(status, body) from one trend source, or None when it is unreachable"""
+    try:
+        response = trend_session.get(url, params=params, timeout=status_monitor.timeout)
+        return response.status_code, response.json()
+    except Exception:
+        return None
+
+@app.route('/api/trend')
+def trend():
+    """
+    Fleet-wide fraud trend (columnar JSON), summed over TREND_SOURCES and
+    cached for TREND_CACHE_TTL seconds
+    """
+    params = tuple((key, request.args[key]) for key in TREND_PARAMS if key in request.args)
+    now = time.time()
+    with trend_cache_lock:
+        cached = trend_cache.get(params)
+    if cached and now - cached[0] < TREND_CACHE_TTL:
+        return jsonify(cached[1]), cached[2]
+    
+    # One shared end time so every source returns the same buckets
+    query = dict(params)
+    query.setdefault('until', str(now))
+    sources = expand_sources(TREND_SOURCES, fanout=TREND_FANOUT)
+    responses = list(trend_pool.map(lambda url: fetch_trend(url, query), sources))
+    ok = [r[1] for r in responses if r and r[0] == 200]
+    
+    if ok:
+        try:
+            merged = merge_trends(ok)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 502
+        merged['sources'] = {'queried': len(sources), 'responded': len(ok)}
+        entry = (now, merged, 200)
+    elif any(responses):
+        # Every source rejected the query (e.g. an unknown granularity)
+        status, body = next(r for r in responses if r)
+        entry = (now, body, status)
+    else:
+        if cached:
+            return jsonify(cached[1]), cached[2]
+        return jsonify({'error': 'Trend unavailable: no source responded'}), 503
+    
+    with trend_cache_lock:
+        # Drop expired entries so distinct query strings cannot pile up
+        for key in [k for k, v in trend_cache.items() if now - v[0] >= TREND_CACHE_TTL]:
+            del trend_cache[key]
+        trend_cache[params] = entry
+    return jsonify(entry[1]), entry[2]
+
 @app.route('/api/ml-status')
 def ml_status():
     """Check ML service status"""
-    try:
-        response = requests.get('http://localhost:5000/health', timeout=2)
-        return jsonify({'status': 'online' if response.ok else 'offline'})
-    except:
-        return jsonify({'status': 'offline'})
+    return jsonify({'status': status_monitor.snapshot()['services']['ml_service']['status']})
 
 @app.route('/api/alert-status')
 def alert_status():
     """Check alert service status"""
-    try:
-        response = requests.get('http://localhost:5001/health', timeout=2)
-        return jsonify({'status': 'online' if response.ok else 'offline'})
-    except:
-        return jsonify({'status': 'offline'})
+    return jsonify({'status': status_monitor.snapshot()['services']['alert_service']['status']})
 
 if __name__ == '__main__':
     print("=" * 60)
@@ -40,4 +124,5 @@ if __name__ == '__main__':
     print("  - ML Service: http://localhost:5000")
     print("  - Alert Service: http://localhost:5001")
     print("=" * 60)
-    app.run(host='0.0.0.0', port=8000, debug=True)
+    # The reloader runs the module twice, which would start a second StatusMonitor
+    app.run(host='0.0.0.0', port=8000, debug=True, use_reloader=False)
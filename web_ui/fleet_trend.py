@@ -0,0 +1,66 @@
+"""
+Fleet-wide fraud trend
+
+Every ML service replica and the Spark job keep their own trend rollup
+(see ml_service/trend.py), covering only what that process scored since
+it started. The dashboard's /api/trend asks all of them for the same
+window and sums the columns. Buckets are aligned on multiples of the step
+in epoch time, so equal starts mean equal buckets.
+"""
+import socket
+from urllib.parse import urlsplit, urlunsplit
+
+COUNTERS = ('scored', 'fraud', 'low', 'medium', 'high')
+
+
+def expand_sources(urls, fanout=False):
+    """
+    Trend URLs to query
+
+    With fanout, a URL whose host resolves to several IPv4 addresses (a
+    Kubernetes headless Service lists every ready pod) is queried once per
+    address.
+    """
+    expanded = []
+    for url in urls:
+        parts = urlsplit(url)
+        addresses = []
+        if fanout:
+            try:
+                infos = socket.getaddrinfo(parts.hostname, parts.port, socket.AF_INET, socket.SOCK_STREAM)
+                addresses = sorted({info[4][0] for info in infos})
+            except socket.gaierror:
+                pass
+        if len(addresses) <= 1:
+            expanded.append(url)
+            continue
+        for address in addresses:
+            netloc = f"{address}:{parts.port}" if parts.port else address
+            expanded.append(urlunsplit(parts._replace(netloc=netloc)))
+    return expanded
+
+
+def merge_trends(results):
+    """
+    Sum columnar trend responses bucket by bucket
+
+    Raises:
+        ValueError: the responses use different bucket sizes
+    """
+    if not results:
+        return None
+    step = results[0]['step']
+    if any(r['step'] != step for r in results):
+        raise ValueError("Trend sources returned different bucket sizes")
+
+    start = min(r['start'] for r in results)
+    end = max(r['start'] + len(r['scored']) * step for r in results)
+    merged = {'granularity': results[0]['granularity'], 'start': start, 'step': step}
+    for name in COUNTERS:
+        column = [0] * int((end - start) // step)
+        for r in results:
+            offset = int((r['start'] - start) // step)
+            for i, value in enumerate(r.get(name, [])):
+                column[offset + i] += value
+        merged[name] = column
+    return merged
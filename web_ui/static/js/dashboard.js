@@ -12,6 +12,12 @@ let fraudTrend = {
 
 let chart = null;
 
+// Alert stream state
+const ALERT_STREAM_URL = 'http://localhost:5001/alerts/stream';
+let alertStream = null;
+let lastAlertEventId = null;
+let recentAlerts = [];
+
 // Initialize Dashboard
 document.addEventListener('DOMContentLoaded', function() {
     console.log('Dashboard initialized');
@@ -20,48 +26,44 @@ document.addEventListener('DOMContentLoaded', function() {
     checkServices();
     setInterval(checkServices, 5000);
     
-    // Load recent alerts
-    loadRecentAlerts();
-    setInterval(loadRecentAlerts, 10000);
+    // Recent alerts and alert service status are pushed over SSE
+    connectAlertStream();
     
-    // Initialize chart
+    // Initialize chart from the server-side trend
     initChart();
+    loadTrend();
+    setInterval(loadTrend, 30000);
     
     // Setup test form
     document.getElementById('test-form').addEventListener('submit', testTransaction);
 });
 
-// Check Service Health
+// Check Service Health (cached by the dashboard server, never probes the ML service directly)
 async function checkServices() {
+    const mlStatus = document.getElementById('ml-status');
     try {
-        const mlResponse = await fetch('http://localhost:5002/health');
-        const mlStatus = document.getElementById('ml-status');
-        if (mlResponse.ok) {
-            mlStatus.className = 'badge bg-success me-2';
-            mlStatus.textContent = 'ML Service: ●';
+        const response = await fetch('/api/status');
+        const status = await response.json();
+        const online = status.services.ml_service.status === 'online';
+        if (status.stale) {
+            mlStatus.className = 'badge bg-warning me-2';
         } else {
-            mlStatus.className = 'badge bg-danger me-2';
-            mlStatus.textContent = 'ML Service: ●';
+            mlStatus.className = online ? 'badge bg-success me-2' : 'badge bg-danger me-2';
         }
+        mlStatus.textContent = 'ML Service: ●';
+        mlStatus.title = status.updated_at ? `Checked ${status.age_seconds}s ago` : 'Not checked yet';
     } catch (error) {
-        document.getElementById('ml-status').className = 'badge bg-danger me-2';
-    }
-    
-    try {
-        const alertResponse = await fetch('http://localhost:5001/health');
-        const alertStatus = document.getElementById('alert-status');
-        if (alertResponse.ok) {
-            alertStatus.className = 'badge bg-success';
-            alertStatus.textContent = 'Alert Service: ●';
-        } else {
-            alertStatus.className = 'badge bg-danger';
-            alertStatus.textContent = 'Alert Service: ●';
-        }
-    } catch (error) {
-        document.getElementById('alert-status').className = 'badge bg-danger';
+        mlStatus.className = 'badge bg-danger me-2';
     }
 }
 
+// Alert service status follows the stream connection
+function setAlertStatus(online) {
+    const alertStatus = document.getElementById('alert-status');
+    alertStatus.className = online ? 'badge bg-success' : 'badge bg-danger';
+    alertStatus.textContent = 'Alert Service: ●';
+}
+
 // Test Transaction
 async function testTransaction(event) {
     event.preventDefault();
@@ -113,6 +115,7 @@ async function testTransaction(event) {
         
         // Update stats
         updateStats(result.is_fraud);
+        loadTrend();
         
     } catch (error) {
         document.getElementById('test-result').innerHTML = `
@@ -176,9 +179,6 @@ function updateStats(isFraud) {
         ? ((stats.fraudCount / stats.totalTransactions) * 100).toFixed(1) 
         : 0;
     document.getElementById('fraud-rate').textContent = fraudRate + '%';
-    
-    // Update chart
-    updateChart(isFraud);
 }
 
 // Initialize Chart
@@ -194,6 +194,7 @@ function initChart() {
                 borderColor: 'rgb(220, 53, 69)',
                 backgroundColor: 'rgba(220, 53, 69, 0.1)',
                 tension: 0.4,
+                spanGaps: true,
                 fill: true
             }]
         },
@@ -219,47 +220,81 @@ function initChart() {
     });
 }
 
-// Update Chart
-function updateChart(isFraud) {
-    const now = new Date().toLocaleTimeString();
-    fraudTrend.labels.push(now);
-    
-    const currentRate = stats.totalTransactions > 0 
-        ? ((stats.fraudCount / stats.totalTransactions) * 100).toFixed(1)
-        : 0;
-    fraudTrend.data.push(parseFloat(currentRate));
-    
-    // Keep only last 20 data points
-    if (fraudTrend.labels.length > 20) {
-        fraudTrend.labels.shift();
-        fraudTrend.data.shift();
-    }
-    
-    chart.update();
-}
-
-// Load Recent Alerts
-async function loadRecentAlerts() {
+// Load Trend (per-minute counts across all scoring, last hour)
+async function loadTrend() {
     try {
-        const response = await fetch('http://localhost:5001/alerts/recent?limit=5');
-        const alerts = await response.json();
-        
-        const alertsDiv = document.getElementById('recent-alerts');
-        
-        if (alerts.length === 0) {
-            alertsDiv.innerHTML = '<p class="text-muted text-center">No alerts yet</p>';
+        const response = await fetch('/api/trend?granularity=minute&buckets=60');
+        if (!response.ok) {
             return;
         }
+        const trend = await response.json();
         
-        alertsDiv.innerHTML = alerts.map(alert => `
-            <div class="alert-item">
-                <strong>${alert.transaction_id}</strong><br>
-                <small>Amount: $${alert.amount.toFixed(2)}</small><br>
-                <small>Risk: ${alert.risk_level} (${(alert.fraud_probability * 100).toFixed(1)}%)</small>
-            </div>
-        `).join('');
+        fraudTrend.labels = trend.scored.map((_, i) =>
+            new Date((trend.start + i * trend.step) * 1000).toLocaleTimeString([], {hour: '2-digit', minute: '2-digit'}));
+        fraudTrend.data = trend.scored.map((scored, i) =>
+            scored > 0 ? parseFloat(((trend.fraud[i] / scored) * 100).toFixed(1)) : null);
         
+        chart.data.labels = fraudTrend.labels;
+        chart.data.datasets[0].data = fraudTrend.data;
+        chart.update();
     } catch (error) {
-        console.error('Error loading alerts:', error);
+        console.error('Error loading trend:', error);
+    }
+}
+
+// Alert Stream
+function connectAlertStream() {
+    // EventSource resends Last-Event-ID on its own reconnects; after a
+    // manual reconnect we pass it as a query parameter instead
+    const url = lastAlertEventId
+        ? `${ALERT_STREAM_URL}?last_event_id=${encodeURIComponent(lastAlertEventId)}`
+        : ALERT_STREAM_URL;
+    alertStream = new EventSource(url);
+    
+    alertStream.onopen = () => setAlertStatus(true);
+    
+    alertStream.addEventListener('snapshot', (event) => {
+        lastAlertEventId = event.lastEventId;
+        const snapshot = JSON.parse(event.data);
+        recentAlerts = snapshot.alerts.slice().reverse();
+        renderRecentAlerts();
+    });
+    
+    alertStream.addEventListener('alerts', (event) => {
+        lastAlertEventId = event.lastEventId;
+        const update = JSON.parse(event.data);
+        const known = new Set(recentAlerts.map(alert => alert.alert_id));
+        update.alerts
+            .filter(alert => !known.has(alert.alert_id))
+            .forEach(alert => recentAlerts.unshift(alert));
+        recentAlerts = recentAlerts.slice(0, 5);
+        renderRecentAlerts();
+    });
+    
+    alertStream.onerror = () => {
+        setAlertStatus(false);
+        // CLOSED means the browser gave up (e.g. a 503); retry ourselves
+        if (alertStream.readyState === EventSource.CLOSED) {
+            alertStream.close();
+            setTimeout(connectAlertStream, 5000);
+        }
+    };
+}
+
+// Render Recent Alerts
+function renderRecentAlerts() {
+    const alertsDiv = document.getElementById('recent-alerts');
+    
+    if (recentAlerts.length === 0) {
+        alertsDiv.innerHTML = '<p class="text-muted text-center">No alerts yet</p>';
+        return;
     }
+    
+    alertsDiv.innerHTML = recentAlerts.slice(0, 5).map(alert => `
+        <div class="alert-item">
+            <strong>${alert.transaction_id}</strong><br>
+            <small>Amount: $${alert.amount.toFixed(2)}</small><br>
+            <small>Risk: ${alert.risk_level} (${(alert.fraud_probability * 100).toFixed(1)}%)</small>
+        </div>
+    `).join('');
 }
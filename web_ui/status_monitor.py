@@ -0,0 +1,97 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+class StatusMonitor:
+    def __init__(self, services, interval=5.0, timeout=2.0, stale_after=None):
+        """
+        Background health checker for downstream services
+
+        Probes every service's health URL concurrently through one pooled
+        requests.Session every `interval` seconds and keeps the last result,
+        so status requests are answered from memory and never wait on (or
+        add load to) the services themselves.
+
+        Args:
+            services: dict of name -> health URL
+            stale_after: age in seconds after which the cached result is
+                flagged stale (default 3 * interval)
+        """
+        self.services = dict(services)
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after or 3 * interval
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.services), pool_maxsize=len(self.services))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=len(self.services), thread_name_prefix='status-probe')
+
+        self._lock = threading.Lock()
+        self._results = {name: {'status': 'unknown', 'checked_at': None} for name in self.services}
+        self._updated_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _probe(self, url):
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            return {
+                'status': 'online' if response.ok else 'offline',
+                'http_status': response.status_code,
+                'latency_ms': round((time.perf_counter() - start) * 1000, 1),
+            }
+        except requests.RequestException as e:
+            return {'status': 'offline', 'error': type(e).__name__}
+
+    def refresh(self):
+        """Probe all services once (concurrently) and cache the results"""
+        futures = {name: self._executor.submit(self._probe, url) for name, url in self.services.items()}
+        checked_at = time.time()
+        results = {}
+        for name, future in futures.items():
+            results[name] = dict(future.result(), checked_at=datetime.fromtimestamp(checked_at).isoformat())
+        with self._lock:
+            self._results = results
+            self._updated_at = checked_at
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Status refresh error: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name='status-monitor')
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(self.timeout + 1)
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def snapshot(self):
+        """Cached status of every service plus its age"""
+        with self._lock:
+            results = {name: dict(result) for name, result in self._results.items()}
+            updated_at = self._updated_at
+
+        age = time.time() - updated_at if updated_at else None
+        return {
+            'services': results,
+            'updated_at': datetime.fromtimestamp(updated_at).isoformat() if updated_at else None,
+            'age_seconds': round(age, 2) if age is not None else None,
+            'stale': age is None or age > self.stale_after,
+        }